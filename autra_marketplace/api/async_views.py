@@ -0,0 +1,214 @@
+"""
+Native async versions of the catalog read endpoints.
+
+With CATALOG_ASYNC_VIEWS on (see api/urls.py) these replace the DRF views
+for list, detail, reviews, facets, top and trending, with identical responses. Under
+ASGI a request then stays on the event loop instead of holding a worker
+thread for the whole view; under WSGI they would only add overhead.
+
+Independent lookups (an agent, its reviews and its versions) are awaited
+together with asyncio.gather(). Django's async ORM still runs a request's
+queries one at a time on a single thread, so what overlaps is the waiting
+on cache reads and query dispatch, not the SQL itself.
+"""
+
+import asyncio
+import functools
+
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from autra.cache import aget_or_compute
+from marketplace.facets import afacet_counts, normalize_filters
+from marketplace.models import Agent
+from marketplace.rankings import top_rated_agents, trending_agents
+from marketplace.reviews import areview_feed
+from marketplace.utils import RANKINGS_CACHE_NAMESPACE, TRENDING_CACHE_NAMESPACE
+
+from .conditional import add_validators, agent_stamps_queryset, alist_validators, detail_validators, not_modified
+from .pagination import CatalogPagination
+from .renderers import FastJSONRenderer
+from .serializers import (
+    AgentDetailSerializer,
+    AgentListSerializer,
+    ReviewSerializer,
+    TopRatedAgentSerializer,
+    TrendingAgentSerializer,
+)
+from .views import (
+    catalog_queryset,
+    embedded_data,
+    filter_listing,
+    parse_includes,
+    recent_versions,
+    requested_fields,
+    review_limit,
+    top_params,
+    trending_params,
+)
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json')
+
+
+def api_view(view):
+    """GET-only async view that reports errors the way DRF does"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return json_response({'detail': f'Method "{request.method}" not allowed.'}, 405)
+        try:
+            return await view(request, *args, **kwargs)
+        except serializers.ValidationError as exc:
+            return json_response(exc.detail, 400)
+        except NotFound as exc:
+            return json_response({'detail': exc.detail}, 404)
+    return wrapper
+
+
+async def fetch(queryset):
+    return [obj async for obj in queryset]
+
+
+async def nothing():
+    return None
+
+
+def page_params(request):
+    """(page, page_size) parsed the way CatalogPagination does"""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        requested = int(request.GET[CatalogPagination.page_size_query_param])
+        if requested > 0:
+            page_size = min(requested, CatalogPagination.max_page_size)
+    except (KeyError, ValueError):
+        pass
+    try:
+        page = int(request.GET.get(CatalogPagination.page_query_param, 1))
+    except ValueError:
+        raise NotFound('Invalid page.')
+    if page < 1:
+        raise NotFound('Invalid page.')
+    return page, page_size
+
+
+def page_links(request, page, page_size, count):
+    url = request.build_absolute_uri()
+    param = CatalogPagination.page_query_param
+    next_link = replace_query_param(url, param, page + 1) if page * page_size < count else None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, param)
+    else:
+        previous_link = replace_query_param(url, param, page - 1)
+    return next_link, previous_link
+
+
+@api_view
+async def agent_list(request):
+    fields = requested_fields(AgentListSerializer, request.GET)
+    etag, last_modified = await alist_validators(request)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    page, page_size = page_params(request)
+    queryset = filter_listing(catalog_queryset(AgentListSerializer, fields), request.GET)
+    offset = (page - 1) * page_size
+    count, agents = await asyncio.gather(
+        queryset.acount(), fetch(queryset[offset:offset + page_size])
+    )
+    if not agents and page > 1:
+        raise NotFound('Invalid page.')
+
+    next_link, previous_link = page_links(request, page, page_size, count)
+    return add_validators(json_response({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': AgentListSerializer(
+            agents, many=True, context={'request': request, 'fields': fields}
+        ).data,
+    }), etag, last_modified)
+
+
+@api_view
+async def agent_detail(request, slug):
+    fields = requested_fields(AgentDetailSerializer, request.GET)
+    includes = parse_includes(request.GET)
+    stamps = await agent_stamps_queryset(slug).afirst()
+    if stamps is None:
+        raise NotFound()
+    etag, last_modified = detail_validators(request, stamps)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    agent_id = stamps[0]
+    try:
+        agent, reviews_page, versions = await asyncio.gather(
+            catalog_queryset(AgentDetailSerializer, fields).aget(pk=agent_id),
+            areview_feed(agent_id) if 'reviews' in includes else nothing(),
+            fetch(recent_versions(agent_id)) if 'versions' in includes else nothing(),
+        )
+    except Agent.DoesNotExist:
+        raise NotFound()
+
+    data = AgentDetailSerializer(agent, context={'request': request, 'fields': fields}).data
+    data.update(embedded_data(reviews_page, versions))
+    return add_validators(json_response(data), etag, last_modified)
+
+
+@api_view
+async def agent_reviews(request, slug):
+    agent_id = await Agent.objects.filter(slug=slug, is_active=True).values_list('id', flat=True).afirst()
+    if agent_id is None:
+        raise NotFound()
+    limit = review_limit(request.GET)
+    try:
+        reviews, next_cursor = await areview_feed(agent_id, request.GET.get('cursor'), limit)
+    except ValueError:
+        raise serializers.ValidationError({'cursor': 'Invalid cursor or limit.'})
+    return json_response({
+        'next': next_cursor,
+        'results': ReviewSerializer(reviews, many=True).data,
+    })
+
+
+@api_view
+async def agent_facets(request):
+    return json_response(await afacet_counts(normalize_filters(request.GET)))
+
+
+@api_view
+async def agent_top(request):
+    dimension, category, min_reviews, limit = top_params(request.GET)
+
+    async def compute():
+        agents = await fetch(top_rated_agents(dimension, category, min_reviews, limit))
+        return TopRatedAgentSerializer(agents, many=True).data
+
+    results = await aget_or_compute(
+        f'top:{dimension}:{category}:{min_reviews}:{limit}',
+        compute,
+        namespace=RANKINGS_CACHE_NAMESPACE,
+    )
+    return json_response({'dimension': dimension, 'results': results})
+
+
+@api_view
+async def agent_trending(request):
+    category, limit = trending_params(request.GET)
+
+    async def compute():
+        return TrendingAgentSerializer(await fetch(trending_agents(category, limit)), many=True).data
+
+    results = await aget_or_compute(f'trending:{category}:{limit}', compute, namespace=TRENDING_CACHE_NAMESPACE)
+    return json_response({'results': results})
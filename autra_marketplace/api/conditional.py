@@ -0,0 +1,132 @@
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from marketplace.facets import normalize_filters
+from marketplace.models import Agent, AgentVersion, Review
+from marketplace.utils import acategory_stamp, category_stamp
+
+
+def _latest(queryset, column):
+    return Subquery(
+        queryset.filter(agent=OuterRef('pk')).order_by()
+        .values('agent').annotate(value=Max(column)).values('value')[:1]
+    )
+
+
+def _count(queryset):
+    return Subquery(
+        queryset.filter(agent=OuterRef('pk')).order_by()
+        .values('agent').annotate(value=Count('pk')).values('value')[:1]
+    )
+
+
+def agent_stamps_queryset(slug):
+    return (
+        Agent.objects.filter(slug=slug, is_active=True)
+        .annotate(
+            latest_version=_latest(AgentVersion.objects, 'release_date'),
+            version_count=_count(AgentVersion.objects),
+            latest_review=_latest(Review.objects, 'updated_at'),
+            review_count=_count(Review.objects),
+        )
+        .values_list('id', 'updated_at', 'latest_version', 'version_count', 'latest_review', 'review_count')
+    )
+
+
+def agent_detail_stamps(slug):
+    """
+    Change stamps for one agent in a single indexed query.
+
+    Counts are included next to the latest timestamps so that deleting a
+    version or review also changes the validators. Returns (id, *stamps),
+    or None for an unknown or inactive agent.
+    """
+    return agent_stamps_queryset(slug).first()
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def listing_category(request):
+    """The category whose stamp covers a listing, or None for the whole catalog"""
+    # Only a single-category listing can rely on that category's stamp
+    categories = normalize_filters(request.GET).get('category', ())
+    return categories[0] if len(categories) == 1 else None
+
+
+def list_validators(request):
+    """ETag and Last-Modified for a catalog listing, from the category stamps"""
+    stamp = category_stamp(listing_category(request))
+    return make_etag(stamp, request.get_full_path()), stamp // 1_000_000_000
+
+
+async def alist_validators(request):
+    """Async list_validators(); the stamp is read without blocking the event loop"""
+    stamp = await acategory_stamp(listing_category(request))
+    return make_etag(stamp, request.get_full_path()), stamp // 1_000_000_000
+
+
+def detail_validators(request, stamps):
+    """ETag and Last-Modified for an agent page, from agent_detail_stamps()"""
+    if stamps is None:
+        return None, None
+    _, updated_at, latest_version, _, latest_review, _ = stamps
+    last_modified = max(stamp for stamp in (updated_at, latest_version, latest_review) if stamp)
+    return make_etag(
+        *stamps, request.GET.get('fields', ''), request.GET.get('include', '')
+    ), int(last_modified.timestamp())
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response if the client's copy is current, else None"""
+    if etag is None:
+        return None
+    return add_validators(
+        get_conditional_response(request, etag=etag, last_modified=last_modified),
+        etag, last_modified,
+    )
+
+
+def add_validators(response, etag, last_modified):
+    if response is not None and etag is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for read-only viewsets.
+
+    Validators come from cheap change stamps, and a matching If-None-Match
+    or If-Modified-Since returns 304 before the queryset is evaluated or
+    anything is serialized.
+    """
+
+    def list_validators(self, request):
+        return list_validators(request)
+
+    def detail_validators(self, request, slug):
+        return detail_validators(request, agent_detail_stamps(slug))
+
+    def _conditional(self, request, etag, last_modified, render):
+        return not_modified(request, etag, last_modified) or add_validators(render(), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.list_validators(request)
+        return self._conditional(
+            request, etag, last_modified,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.detail_validators(request, kwargs[self.lookup_field])
+        return self._conditional(
+            request, etag, last_modified,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,133 @@
+"""
+Precomputed homepage payload.
+
+The homepage combines featured agents, the best-rated and trending agents
+of every category and the overall trending list: a couple of dozen queries
+if done per request. build_snapshot() runs them once, renders the JSON and
+stores the bytes with one cache set() in the shared tier, which replaces
+the previous snapshot atomically, so readers see the old payload or the
+new one and never a mix. Serving it is a single cache read with no
+database access; a per-process copy would lag behind every rebuild, so
+the snapshot skips the local tier.
+
+Each snapshot remembers the versions of the cache namespaces it was built
+from. refresh_snapshot(), run by beat every HOMEPAGE_REFRESH_SECONDS,
+rebuilds once an agent, review or trending change has bumped one of them,
+or when the snapshot is older than HOMEPAGE_SNAPSHOT_MAX_AGE.
+
+If the snapshot is evicted or the cache restarts, each process keeps
+serving the last snapshot it read until beat has built a new one. Only a
+process that has never read one builds it inline, one at a time.
+"""
+
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from autra.cache import namespace_version, shared_cache
+from marketplace.models import Agent
+from marketplace.rankings import top_rated_agents, trending_agents
+from marketplace.utils import CATALOG_CACHE_NAMESPACE, RANKINGS_CACHE_NAMESPACE, TRENDING_CACHE_NAMESPACE
+
+from .conditional import make_etag
+from .renderers import FastJSONRenderer
+from .serializers import AgentListSerializer, TopRatedAgentSerializer, TrendingAgentSerializer
+
+SNAPSHOT_KEY = 'homepage:snapshot'
+BUILD_LOCK_KEY = 'homepage:building'
+BUILD_LOCK_TIMEOUT = 60
+# Seconds a client waits before retrying while the first snapshot is built
+BUILD_RETRY_AFTER = 5
+SOURCE_NAMESPACES = (CATALOG_CACHE_NAMESPACE, RANKINGS_CACHE_NAMESPACE, TRENDING_CACHE_NAMESPACE)
+
+FEATURED_LIMIT = 12
+TRENDING_LIMIT = 10
+PER_CATEGORY_LIMIT = 5
+
+# The snapshot this process served last, for when the cache has lost it
+_last_snapshot = None
+
+
+def source_versions():
+    return {namespace: namespace_version(namespace) for namespace in SOURCE_NAMESPACES}
+
+
+def homepage_payload():
+    featured = (
+        Agent.objects.filter(is_active=True, is_featured=True)
+        .select_related('developer')
+        .order_by('-times_hired', 'id')[:FEATURED_LIMIT]
+    )
+    return {
+        'generated_at': timezone.now(),
+        'featured': AgentListSerializer(featured, many=True).data,
+        'trending': TrendingAgentSerializer(trending_agents(limit=TRENDING_LIMIT), many=True).data,
+        'categories': [
+            {
+                'category': category,
+                'name': name,
+                'top_rated': TopRatedAgentSerializer(
+                    top_rated_agents(category=category, limit=PER_CATEGORY_LIMIT), many=True
+                ).data,
+                'trending': TrendingAgentSerializer(
+                    trending_agents(category, PER_CATEGORY_LIMIT), many=True
+                ).data,
+            }
+            for category, name in Agent.CATEGORY_CHOICES
+        ],
+    }
+
+
+def build_snapshot():
+    """Query, render and store a new snapshot; returns it"""
+    # Read the versions first, so a change made during the build triggers another
+    versions = source_versions()
+    body = FastJSONRenderer().render(homepage_payload())
+    snapshot = {
+        'body': body,
+        'etag': make_etag(body),
+        'built_at': time.time(),
+        'versions': versions,
+    }
+    shared_cache().set(SNAPSHOT_KEY, snapshot, None)
+    return snapshot
+
+
+def is_current(snapshot):
+    return (
+        snapshot['versions'] == source_versions()
+        and time.time() - snapshot['built_at'] < settings.HOMEPAGE_SNAPSHOT_MAX_AGE
+    )
+
+
+def refresh_snapshot():
+    """
+    Rebuild the snapshot if its sources changed or it has aged out.
+
+    Returns the new snapshot, or None when the stored one is current or
+    another process is already building.
+    """
+    cache = shared_cache()
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is not None and is_current(snapshot):
+        return None
+    if not cache.add(BUILD_LOCK_KEY, 1, BUILD_LOCK_TIMEOUT):
+        return None
+    try:
+        return build_snapshot()
+    finally:
+        cache.delete(BUILD_LOCK_KEY)
+
+
+def homepage_snapshot():
+    """
+    The stored snapshot, or the last one this process served if the cache
+    has lost it. With neither, one process builds it while the others get
+    None until it is stored.
+    """
+    global _last_snapshot
+    snapshot = shared_cache().get(SNAPSHOT_KEY) or _last_snapshot or refresh_snapshot()
+    if snapshot is not None:
+        _last_snapshot = snapshot
+    return snapshot
@@ -0,0 +1,363 @@
+"""
+HTTP load generator for the catalog API.
+
+Worker threads each hold a keep-alive connection and replay a weighted
+mix of user flows in a closed loop for a fixed duration. Every request
+is timed, and the results are summarised as throughput, latency
+percentiles and a log-scale histogram, overall and per endpoint.
+
+``manage.py loadtest`` boots the app under gunicorn (WSGI) or uvicorn
+(ASGI) and drives it with this module.
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.utils.crypto import get_random_string
+
+from marketplace.models import REVIEW_DIMENSIONS, Agent, Review
+
+# Upper bounds of the histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+DEFAULT_MIX = {'browse': 40, 'detail': 30, 'search': 20, 'purchase': 10}
+
+SERVER_COMMANDS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'autra.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'autra.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--no-access-log', '--log-level', 'warning',
+    ],
+}
+SERVER_PACKAGES = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}
+
+
+@dataclass
+class Dataset:
+    """What the flows pick from: popular agents first, like real traffic"""
+    slugs: list
+    slug_weights: list
+    categories: list
+    review_ids: list
+    pages: int = 1
+    sessions: list = field(default_factory=list)
+
+
+def load_dataset(users=50, agents=2000):
+    """
+    Read agent slugs, review ids and categories from the database, and log
+    in up to `users` buyers by creating sessions directly, so the load test
+    never pays for password hashing.
+    """
+    top = list(
+        Agent.objects.filter(is_active=True)
+        .order_by('-times_hired', 'id')
+        .values_list('slug', 'times_hired')[:agents]
+    )
+    if not top:
+        raise LookupError('No active agents; run seed_benchmark first')
+    review_ids = list(
+        Review.objects.filter(reported=False, agent__is_active=True)
+        .order_by('-id')
+        .values_list('id', flat=True)[:5000]
+    )
+    categories = list(
+        Agent.objects.filter(is_active=True).order_by().values_list('category', flat=True).distinct()
+    )
+
+    sessions = []
+    buyers = get_user_model().objects.filter(user_type='business', is_active=True).order_by('id')[:users]
+    for user in buyers:
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        sessions.append(session.session_key)
+
+    return Dataset(
+        slugs=[slug for slug, _ in top],
+        slug_weights=[hired + 1 for _, hired in top],
+        categories=categories,
+        review_ids=review_ids,
+        pages=max(1, -(-Agent.objects.filter(is_active=True).count() // settings.REST_FRAMEWORK['PAGE_SIZE'])),
+        sessions=sessions,
+    )
+
+
+class Session:
+    """One simulated client: a keep-alive connection plus optional login cookies"""
+
+    def __init__(self, base_url, record, session_key=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.record = record
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        self.headers = {'Host': f'localhost:{self.port}', 'Accept': 'application/json'}
+        if session_key:
+            # The CSRF middleware accepts an unmasked secret that matches the cookie
+            csrf = get_random_string(32)
+            self.headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf}'
+            self.headers['X-CSRFToken'] = csrf
+
+    def request(self, label, method, path, params=None, body=None):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+            if response.will_close:
+                self.connection.close()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            data, status = b'', 0
+        self.record(label, status, started, time.perf_counter())
+        return status, data
+
+    def get_json(self, label, path, params=None):
+        status, data = self.request(label, 'GET', path, params)
+        return json.loads(data) if status == 200 else None
+
+    def close(self):
+        self.connection.close()
+
+
+def browse(session, data, rng):
+    """Catalog pages, mostly the first few, then the facet sidebar"""
+    page = min(int(rng.paretovariate(1.2)), data.pages)
+    session.request('catalog list', 'GET', '/api/agents/', {'page': page})
+    session.request('facets', 'GET', '/api/agents/facets/')
+
+
+def detail(session, data, rng):
+    """An agent page and its reviews (separately or embedded), popular agents most often"""
+    slug = rng.choices(data.slugs, weights=data.slug_weights)[0]
+    if rng.random() < 0.5:
+        session.request('detail+include', 'GET', f'/api/agents/{slug}/', {'include': 'reviews,versions'})
+        return
+    session.request('agent detail', 'GET', f'/api/agents/{slug}/')
+    feed = session.get_json('agent reviews', f'/api/agents/{slug}/reviews/')
+    if feed and feed.get('next') and rng.random() < 0.3:
+        session.request('agent reviews', 'GET', f'/api/agents/{slug}/reviews/', {'cursor': feed['next']})
+
+
+def search(session, data, rng):
+    """Narrowing the catalog with filters, then the rankings for that category"""
+    category = rng.choice(data.categories)
+    filters = {'category': category}
+    if rng.random() < 0.5:
+        filters['pricing_model'] = rng.choice(('monthly', 'one_time', 'usage,freemium'))
+    session.request('filtered list', 'GET', '/api/agents/', filters)
+    session.request('facets', 'GET', '/api/agents/facets/', filters)
+    session.request('top rated', 'GET', '/api/agents/top/', {
+        'dimension': rng.choice(REVIEW_DIMENSIONS), 'category': category, 'min_reviews': 1,
+    })
+
+
+def purchase(session, data, rng):
+    """
+    A signed-in buyer comparing agents before buying: detail pages, a bulk
+    lookup of the shortlist and a helpful vote. There is no checkout
+    endpoint in the API yet, so the vote stands in for the write.
+    """
+    shortlist = rng.choices(data.slugs, weights=data.slug_weights, k=rng.randint(2, 6))
+    session.request('agent detail', 'GET', f'/api/agents/{shortlist[0]}/')
+    session.request('bulk lookup', 'POST', '/api/agents/bulk/', body={'slugs': shortlist})
+    if data.review_ids:
+        session.request('helpful vote', 'POST', f'/api/reviews/{rng.choice(data.review_ids)}/helpful/')
+
+
+FLOWS = {'browse': browse, 'detail': detail, 'search': search, 'purchase': purchase}
+
+
+class Recorder:
+    """Thread-safe collector of (label, status, latency) samples after warmup"""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.samples = defaultdict(list)
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, label, status, started, finished):
+        if started < self.measure_from:
+            return
+        with self.lock:
+            self.samples[label].append((finished - started) * 1000)
+            self.statuses[status] += 1
+
+
+def run_load(base_url, data, mix=None, concurrency=16, duration=30, warmup=5, seed=0):
+    """Drive base_url with `concurrency` clients and return a summary dict"""
+    mix = mix or DEFAULT_MIX
+    flows = [FLOWS[name] for name in mix]
+    weights = list(mix.values())
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    recorder = Recorder(measure_from)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session_key = data.sessions[index % len(data.sessions)] if data.sessions else None
+        session = Session(base_url, recorder, session_key)
+        try:
+            while time.perf_counter() < deadline:
+                rng.choices(flows, weights=weights)[0](session, data, rng)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(recorder, time.perf_counter() - measure_from)
+
+
+def summarize(recorder, elapsed):
+    everything = sorted(latency for samples in recorder.samples.values() for latency in samples)
+    endpoints = {label: latency_stats(sorted(samples), elapsed) for label, samples in recorder.samples.items()}
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'overall': latency_stats(everything, elapsed),
+        'endpoints': dict(sorted(endpoints.items())),
+        'statuses': {str(status): count for status, count in sorted(recorder.statuses.items())},
+        'histogram': histogram(everything),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def latency_stats(sorted_values, elapsed):
+    return {
+        'requests': len(sorted_values),
+        'rps': round(len(sorted_values) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(sorted_values), 2) if sorted_values else None,
+        'p50_ms': percentile(sorted_values, 0.50),
+        'p90_ms': percentile(sorted_values, 0.90),
+        'p99_ms': percentile(sorted_values, 0.99),
+        'p999_ms': percentile(sorted_values, 0.999),
+        'max_ms': round(sorted_values[-1], 2) if sorted_values else None,
+    }
+
+
+def histogram(sorted_values):
+    """Request counts per latency bucket, keyed by the bucket's upper bound"""
+    counts = Counter()
+    bucket = 0
+    for value in sorted_values:
+        while value > HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return [
+        {'le_ms': None if bound == float('inf') else bound, 'count': counts[index]}
+        for index, bound in enumerate(HISTOGRAM_BOUNDS)
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, project_dir, port, workers=4, env=None, timeout=60):
+    """
+    Boot autra/wsgi.py under gunicorn or autra/asgi.py under uvicorn and
+    wait until it answers. Returns the server process.
+    """
+    if find_spec(SERVER_PACKAGES[kind]) is None:
+        raise RuntimeError(f'{SERVER_PACKAGES[kind]} is required for the {kind} server; pip install {SERVER_PACKAGES[kind]}')
+    process = subprocess.Popen(
+        SERVER_COMMANDS[kind](port, workers),
+        cwd=project_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited during startup:\n{process.stderr.read().decode()}')
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', '/api/agents/?page_size=1', headers={'Host': f'localhost:{port}'})
+            if connection.getresponse().status == 200:
+                return process
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'Server did not answer within {timeout}s')
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of a process and all its descendants, in MB (Linux only)"""
+    children = defaultdict(list)
+    rss_kb = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name may contain spaces; fields resume after ')'
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entry}/status') as status:
+                rss_kb[int(entry)] = next(
+                    (int(line.split()[1]) for line in status if line.startswith('VmRSS:')), 0
+                )
+        except (OSError, IndexError, ValueError):
+            continue
+        children[ppid].append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += rss_kb.get(current, 0)
+        pending.extend(children.get(current, ()))
+    return total / 1024
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
@@ -0,0 +1,46 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import RequestFactory, override_settings
+
+from api.views import AgentViewSet
+
+SCENARIOS = [
+    ('list, all fields', '/api/agents/', {}),
+    ('list, sparse', '/api/agents/', {'fields': 'slug,name,price,average_rating'}),
+    ('list, sparse + developer', '/api/agents/', {'fields': 'slug,name,price,developer'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Time catalog API pages end to end (query, serialize, render) against the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    @override_settings(DEBUG=True)
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        view = AgentViewSet.as_view({'get': 'list'})
+        iterations = options['iterations']
+
+        self.stdout.write(f'{"scenario":<28} {"median ms":>10} {"p95 ms":>8} {"queries":>8} {"bytes":>8}')
+        for label, path, params in SCENARIOS:
+            params = {**params, 'page_size': options['page_size']}
+            timings = []
+            for _ in range(iterations):
+                request = factory.get(path, params, HTTP_HOST='localhost')
+                reset_queries()
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{label:<28} {statistics.median(timings):>10.2f} '
+                f'{timings[int(len(timings) * 0.95) - 1]:>8.2f} '
+                f'{len(connection.queries):>8} {len(response.content):>8}'
+            )
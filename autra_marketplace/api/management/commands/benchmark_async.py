@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import (
+    free_port,
+    load_dataset,
+    process_tree_rss_mb,
+    run_load,
+    start_server,
+    stop_server,
+)
+
+# (server, CATALOG_ASYNC_VIEWS) for each stack being compared
+STACKS = {
+    'sync-wsgi': ('wsgi', False),
+    'sync-asgi': ('asgi', False),
+    'async-asgi': ('asgi', True),
+}
+READ_MIX = {'browse': 40, 'detail': 40, 'search': 20}
+
+
+class Command(BaseCommand):
+    help = 'Compare sync views under WSGI, sync under ASGI and async under ASGI at rising concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stacks', default=','.join(STACKS),
+                            help=f'Comma-separated, from: {", ".join(STACKS)}')
+        parser.add_argument('--concurrency', default='4,16,64',
+                            help='Comma-separated client counts to step through')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--duration', type=float, default=15, help='Measured seconds per step')
+        parser.add_argument('--warmup', type=float, default=3)
+        parser.add_argument('--output', help='Write the results as JSON')
+
+    def handle(self, *args, **options):
+        stacks = [name.strip() for name in options['stacks'].split(',') if name.strip()]
+        unknown = set(stacks) - set(STACKS)
+        if unknown:
+            raise CommandError(f'Unknown stacks: {", ".join(sorted(unknown))}')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated integers')
+        try:
+            data = load_dataset(users=0)
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        results = {}
+        self.stdout.write(
+            f'{"stack":<12} {"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} '
+            f'{"errors":>7} {"peak RSS MB":>12}'
+        )
+        for name in stacks:
+            results[name] = self.run_stack(name, levels, data, options)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+    def run_stack(self, name, levels, data, options):
+        server, async_views = STACKS[name]
+        env = {**os.environ, 'CATALOG_ASYNC_VIEWS': str(async_views)}
+        port = free_port()
+        try:
+            process = start_server(server, Path(settings.BASE_DIR).parent, port, options['workers'], env)
+        except RuntimeError as exc:
+            raise CommandError(f'{name}: {exc}')
+
+        steps = []
+        try:
+            for clients in levels:
+                sampler = RSSSampler(process.pid)
+                sampler.start()
+                try:
+                    result = run_load(
+                        f'http://127.0.0.1:{port}', data, READ_MIX, clients,
+                        options['duration'], options['warmup'],
+                    )
+                finally:
+                    sampler.stop()
+                overall = result['overall']
+                errors = sum(count for status, count in result['statuses'].items() if not status.startswith(('2', '3')))
+                step = {
+                    'clients': clients,
+                    'rps': overall['rps'],
+                    'p50_ms': overall['p50_ms'],
+                    'p99_ms': overall['p99_ms'],
+                    'errors': errors,
+                    'peak_rss_mb': round(sampler.peak, 1),
+                }
+                steps.append(step)
+                self.stdout.write(
+                    f'{name:<12} {clients:>7} {step["rps"]:>8} {step["p50_ms"]!s:>8} {step["p99_ms"]!s:>8} '
+                    f'{errors:>7} {step["peak_rss_mb"]:>12}'
+                )
+        finally:
+            stop_server(process)
+        return steps
+
+
+class RSSSampler(threading.Thread):
+    """Track the peak resident memory of the server's process tree"""
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.peak = max(self.peak, process_tree_rss_mb(self.pid))
+            except OSError:
+                pass
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
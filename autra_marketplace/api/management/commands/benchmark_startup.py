@@ -0,0 +1,108 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: set up Django, build the handler and import
+# every view the URLconf points at, i.e. everything before the first request
+PROBE = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autra.settings')
+django.setup()
+setup_done = time.perf_counter()
+if sys.argv[1] == 'asgi':
+    from django.core.asgi import get_asgi_application as get_application
+else:
+    from django.core.wsgi import get_wsgi_application as get_application
+application = get_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+ready = time.perf_counter()
+from django.conf import settings
+try:
+    # Resident memory now; the peak can be set by the interpreter's own startup
+    with open('/proc/self/status') as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform == 'darwin' else 1)
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'ready_ms': (ready - started) * 1000,
+    'rss_mb': rss_kb / 1024,
+    'modules': len(sys.modules),
+    'apps': len(settings.INSTALLED_APPS),
+    'middleware': len(settings.MIDDLEWARE),
+}))
+'''
+
+# prod and api refuse to load without these; nothing connects during the probe
+PLACEHOLDER_ENV = {
+    'DB_NAME': 'autra',
+    'DB_USER': 'autra',
+    'DB_PASSWORD': 'unused',
+    'ALLOWED_HOSTS': 'localhost',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start time and memory of a worker for each settings profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='base,prod,api',
+                            help='Comma-separated ENVIRONMENT values to compare')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--output', help='Write the results as JSON')
+
+    def handle(self, *args, **options):
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive')
+
+        results = {}
+        self.stdout.write(
+            f'{"profile":<10} {"process ms":>11} {"setup ms":>9} {"ready ms":>9} '
+            f'{"RSS MB":>7} {"modules":>8} {"apps":>5} {"mw":>4}'
+        )
+        for profile in profiles:
+            runs = [self.probe(profile, options['server']) for _ in range(options['runs'])]
+            result = {
+                key: round(statistics.median(run[key] for run in runs), 1)
+                for key in runs[0]
+            }
+            results[profile] = result
+            self.stdout.write(
+                f'{profile:<10} {result["process_ms"]:>11} {result["setup_ms"]:>9} {result["ready_ms"]:>9} '
+                f'{result["rss_mb"]:>7} {result["modules"]:>8.0f} {result["apps"]:>5.0f} '
+                f'{result["middleware"]:>4.0f}'
+            )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+    def probe(self, profile, server):
+        """Start one interpreter under the profile and return its measurements"""
+        env = {**PLACEHOLDER_ENV, **os.environ, 'ENVIRONMENT': profile}
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', PROBE, server],
+            cwd=Path(settings.BASE_DIR).parent,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        if completed.returncode:
+            raise CommandError(f'Profile {profile} failed to start:\n{completed.stderr}')
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['process_ms'] = elapsed
+        return result
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import (
+    DEFAULT_MIX,
+    FLOWS,
+    free_port,
+    load_dataset,
+    run_load,
+    start_server,
+    stop_server,
+)
+
+
+def parse_mix(value):
+    """'browse=50,detail=30' -> {'browse': 50, 'detail': 30}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in FLOWS:
+            raise CommandError(f'Unknown flow "{name}"; choose from {", ".join(FLOWS)}')
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight}')
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Load-test the catalog API over HTTP under gunicorn (WSGI) or uvicorn (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--url', help='Test an already running server instead of booting one')
+        parser.add_argument('--workers', type=int, default=4, help='Server worker processes')
+        parser.add_argument('--concurrency', type=int, default=16, help='Simulated clients')
+        parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before that')
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                            help=f'Weighted flows, e.g. browse=40,detail=30 (from: {", ".join(FLOWS)})')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--revisions', nargs=2, metavar=('BASE', 'HEAD'),
+                            help='Run the same load against two git revisions and compare them')
+        parser.add_argument('--output', help='Write the full results as JSON')
+
+    def handle(self, *args, **options):
+        if options['url'] and options['revisions']:
+            raise CommandError('--url and --revisions cannot be combined')
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG is on: query logging and debug middleware will skew the numbers'
+            ))
+
+        try:
+            data = load_dataset(users=options['concurrency'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        if options['url']:
+            runs = {options['url']: self.run(options['url'], data, options)}
+        elif options['revisions']:
+            runs = {revision: self.run_revision(revision, data, options) for revision in options['revisions']}
+        else:
+            runs = {'working tree': self.run_local(Path(settings.BASE_DIR).parent, data, options)}
+
+        if options['revisions']:
+            self.compare(*runs.items())
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(runs, indent=2))
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def run(self, url, data, options):
+        self.stdout.write(
+            f'\n{url}: {options["concurrency"]} clients, {options["duration"]:g}s '
+            f'after {options["warmup"]:g}s warmup'
+        )
+        result = run_load(
+            url, data, options['mix'], options['concurrency'],
+            options['duration'], options['warmup'], options['seed'],
+        )
+        self.report(result)
+        return result
+
+    def run_local(self, project_dir, data, options):
+        port = free_port()
+        try:
+            process = start_server(options['server'], project_dir, port, options['workers'], os.environ.copy())
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        try:
+            return self.run(f'http://127.0.0.1:{port}', data, options)
+        finally:
+            stop_server(process)
+
+    def run_revision(self, revision, data, options):
+        """
+        Check the revision out in a temporary worktree and test it there. A
+        SQLite database (and .env) is copied in, so both revisions start
+        from the same data; other databases are shared as configured.
+        """
+        project_dir = Path(settings.BASE_DIR).parent
+        toplevel = Path(self.git(project_dir, 'rev-parse', '--show-toplevel'))
+        worktree = Path(tempfile.mkdtemp(prefix='autra-loadtest-'))
+        self.git(project_dir, 'worktree', 'add', '--detach', str(worktree), revision)
+        try:
+            copies = [project_dir / '.env']
+            database = settings.DATABASES['default']
+            if database['ENGINE'].endswith('sqlite3'):
+                copies.append(Path(database['NAME']))
+            for source in copies:
+                if source.exists():
+                    shutil.copy2(source, worktree / source.resolve().relative_to(toplevel))
+            self.stdout.write(f'\nRevision {revision} ({self.git(worktree, "rev-parse", "--short", "HEAD")})')
+            return self.run_local(worktree / project_dir.relative_to(toplevel), data, options)
+        finally:
+            self.git(project_dir, 'worktree', 'remove', '--force', str(worktree))
+
+    @staticmethod
+    def git(cwd, *args):
+        try:
+            return subprocess.run(
+                ['git', *args], cwd=cwd, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except subprocess.CalledProcessError as exc:
+            raise CommandError(f'git {" ".join(args)} failed: {exc.stderr.strip()}')
+
+    def report(self, result):
+        overall = result['overall']
+        self.stdout.write(
+            f'{overall["requests"]} requests, {overall["rps"]} req/s, '
+            f'statuses {result["statuses"]}'
+        )
+        self.stdout.write(
+            f'{"endpoint":<16} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"p99.9 ms":>9} {"max ms":>8}'
+        )
+        for label, stats in [*result['endpoints'].items(), ('all', overall)]:
+            self.stdout.write(
+                f'{label:<16} {stats["rps"]:>8} {stats["p50_ms"] or "-":>8} {stats["p90_ms"] or "-":>8} '
+                f'{stats["p99_ms"] or "-":>8} {stats["p999_ms"] or "-":>9} {stats["max_ms"] or "-":>8}'
+            )
+
+        peak = max((bucket['count'] for bucket in result['histogram']), default=0) or 1
+        for bucket in result['histogram']:
+            bound = f'<= {bucket["le_ms"]} ms' if bucket['le_ms'] is not None else '> 5000 ms'
+            bar = '#' * round(40 * bucket['count'] / peak)
+            self.stdout.write(f'{bound:>12} {bucket["count"]:>8} {bar}')
+
+    def compare(self, base, head):
+        (base_name, base), (head_name, head) = base, head
+
+        def change(old, new):
+            if not old or new is None:
+                return '-'
+            return f'{(new - old) / old * 100:+.1f}%'
+
+        self.stdout.write(f'\n{"":<10} {base_name:>12} {head_name:>12} {"change":>9}')
+        for key, label in (('rps', 'req/s'), ('p50_ms', 'p50 ms'), ('p99_ms', 'p99 ms'), ('p999_ms', 'p99.9 ms')):
+            old, new = base['overall'][key], head['overall'][key]
+            self.stdout.write(f'{label:<10} {old!s:>12} {new!s:>12} {change(old, new):>9}')
@@ -0,0 +1,239 @@
+from rest_framework import serializers
+
+from marketplace.models import REVIEW_DIMENSIONS, Agent, Review
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients pick fields with ?fields=a,b,c.
+
+    Serializers list, per field, the model columns it reads in
+    `field_columns` (defaulting to the field's own name), so views can
+    restrict the SQL SELECT to exactly what will be rendered.
+    """
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+    @classmethod
+    def select_fields(cls, requested):
+        """Validate a requested field list against the serializer's fields"""
+        available = cls.Meta.fields
+        if not requested:
+            return list(available)
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f'Unknown fields: {", ".join(unknown)}'}
+            )
+        return requested
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Model columns needed to render the given fields"""
+        columns = {'id'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, (name,)))
+        return sorted(columns)
+
+
+class DeveloperSummarySerializer(serializers.Serializer):
+    username = serializers.CharField()
+    display_name = serializers.CharField()
+
+
+class AgentListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact agent representation for catalog listings"""
+    developer = DeveloperSummarySerializer(read_only=True)
+
+    field_columns = {
+        'developer': (
+            'developer__username',
+            'developer__company_name',
+            'developer__first_name',
+            'developer__last_name',
+        ),
+    }
+
+    class Meta:
+        model = Agent
+        fields = [
+            'id',
+            'slug',
+            'name',
+            'short_description',
+            'category',
+            'pricing_model',
+            'price',
+            'usage_price',
+            'average_rating',
+            'total_reviews',
+            'times_hired',
+            'is_verified',
+            'is_featured',
+            'logo',
+            'developer',
+        ]
+        read_only_fields = fields
+
+
+class AgentDetailSerializer(AgentListSerializer):
+    """Full agent representation, including the wide text and JSON columns"""
+    trust_score = serializers.IntegerField(read_only=True)
+    ratings = serializers.SerializerMethodField()
+    latest_stable_version = serializers.CharField(
+        source='latest_stable_version.version_number', read_only=True, default=None
+    )
+
+    field_columns = {
+        **AgentListSerializer.field_columns,
+        'trust_score': (
+            'tested_by_platform',
+            'is_verified',
+            'security_audit_date',
+            'uptime_percentage',
+            'risk_rating',
+        ),
+        'ratings': tuple(
+            f'rating_summary__{column}'
+            for column in ['histograms'] + [
+                f'{dimension}_{part}' for dimension in REVIEW_DIMENSIONS for part in ('count', 'avg')
+            ]
+        ),
+        'latest_stable_version': ('latest_stable_version__version_number',),
+    }
+
+    class Meta(AgentListSerializer.Meta):
+        fields = AgentListSerializer.Meta.fields + [
+            'description',
+            'tags',
+            'free_tier_limit',
+            'documentation_url',
+            'github_url',
+            'integration_type',
+            'requirements',
+            'sandbox_available',
+            'demo_url',
+            'risk_rating',
+            'tested_by_platform',
+            'compliance_certifications',
+            'trust_score',
+            'average_response_time',
+            'uptime_percentage',
+            'rate_limit',
+            'screenshots',
+            'video_url',
+            'published_at',
+            'updated_at',
+            'ratings',
+            'latest_stable_version',
+        ]
+        read_only_fields = fields
+
+    def get_ratings(self, agent):
+        """Average, count and 1-5 star histogram for each review dimension"""
+        try:
+            summary = agent.rating_summary
+        except Agent.rating_summary.RelatedObjectDoesNotExist:
+            summary = None
+        return {
+            dimension: {
+                'average': getattr(summary, f'{dimension}_avg', None),
+                'count': getattr(summary, f'{dimension}_count', 0),
+                'histogram': summary.histograms.get(dimension, [0] * 5) if summary else [0] * 5,
+            }
+            for dimension in REVIEW_DIMENSIONS
+        }
+
+
+class AgentVersionSummarySerializer(serializers.Serializer):
+    version_number = serializers.CharField()
+    is_stable = serializers.BooleanField()
+    release_date = serializers.DateTimeField()
+
+
+class AgentBulkSerializer(AgentListSerializer):
+    """Listing fields plus the latest version, for bulk lookups"""
+    latest_version = serializers.SerializerMethodField()
+
+    field_columns = {
+        **AgentListSerializer.field_columns,
+        'latest_version': (),
+    }
+
+    class Meta(AgentListSerializer.Meta):
+        fields = AgentListSerializer.Meta.fields + ['latest_version']
+        read_only_fields = fields
+
+    def get_latest_version(self, agent):
+        # Filled by a single windowed prefetch in the view
+        versions = getattr(agent, 'latest_versions', None)
+        if not versions:
+            return None
+        return AgentVersionSummarySerializer(versions[0]).data
+
+
+class BulkLookupSerializer(serializers.Serializer):
+    """Request body for POST /api/agents/bulk/"""
+    MAX_ITEMS = 500
+
+    slugs = serializers.ListField(
+        child=serializers.SlugField(max_length=255),
+        required=False,
+        max_length=MAX_ITEMS,
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=MAX_ITEMS,
+    )
+
+    def validate(self, attrs):
+        if bool(attrs.get('slugs')) == bool(attrs.get('ids')):
+            raise serializers.ValidationError('Provide either "slugs" or "ids".')
+        return attrs
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    reviewer = serializers.CharField(source='reviewer.username', read_only=True)
+
+    class Meta:
+        model = Review
+        fields = [
+            'id',
+            'reviewer',
+            'rating',
+            'title',
+            'comment',
+            'ease_of_use',
+            'reliability',
+            'support',
+            'value_for_money',
+            'verified_purchase',
+            'helpful_count',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+
+class TopRatedAgentSerializer(AgentListSerializer):
+    score = serializers.FloatField()
+    score_count = serializers.IntegerField()
+
+    class Meta(AgentListSerializer.Meta):
+        fields = AgentListSerializer.Meta.fields + ['score', 'score_count']
+        read_only_fields = fields
+
+
+class TrendingAgentSerializer(AgentListSerializer):
+    score = serializers.FloatField()
+    last_event_at = serializers.DateTimeField()
+
+    class Meta(AgentListSerializer.Meta):
+        fields = AgentListSerializer.Meta.fields + ['score', 'last_event_at']
+        read_only_fields = fields
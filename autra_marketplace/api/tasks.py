@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .homepage import refresh_snapshot
+
+
+@shared_task
+def refresh_homepage_snapshot():
+    """Rebuild the homepage snapshot when the catalog, ratings or trending lists changed"""
+    return refresh_snapshot() is not None
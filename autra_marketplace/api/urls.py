@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+
+from . import async_views, views
+
+router = DefaultRouter()
+router.register('agents', views.AgentViewSet, basename='agent')
+
+urlpatterns = [
+    path('homepage/', views.homepage, name='homepage'),
+    path('reviews/<int:pk>/helpful/', views.mark_review_helpful, name='review-helpful'),
+]
+
+if settings.CATALOG_ASYNC_VIEWS:
+    # Native async read path for ASGI workers; bulk lookups stay on DRF
+    urlpatterns += [
+        path('agents/', async_views.agent_list, name='agent-list'),
+        path('agents/facets/', async_views.agent_facets, name='agent-facets'),
+        path('agents/top/', async_views.agent_top, name='agent-top'),
+        path('agents/trending/', async_views.agent_trending, name='agent-trending'),
+        path('agents/bulk/', views.AgentViewSet.as_view({'post': 'bulk'}), name='agent-bulk'),
+        path('agents/<slug:slug>/', async_views.agent_detail, name='agent-detail'),
+        path('agents/<slug:slug>/reviews/', async_views.agent_reviews, name='agent-reviews'),
+    ]
+
+urlpatterns += router.urls
@@ -1,3 +1,334 @@
-from django.shortcuts import render
+from django.core.cache import cache
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from rest_framework import permissions, serializers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from autra.cache import get_or_compute, namespace_key
+from marketplace.facets import apply_facet_filters, facet_counts, normalize_filters
+from marketplace.models import REVIEW_DIMENSIONS, Agent, AgentVersion, Review
+from marketplace.rankings import top_rated_agents, trending_agents
+from marketplace.reviews import record_helpful_vote, review_feed
+from marketplace.utils import CATALOG_CACHE_NAMESPACE, RANKINGS_CACHE_NAMESPACE, TRENDING_CACHE_NAMESPACE
+from marketplace.versions import with_version_at_least
+
+from .conditional import ConditionalGetMixin, add_validators, not_modified
+from .homepage import BUILD_RETRY_AFTER, homepage_snapshot
+from .serializers import (
+    AgentBulkSerializer,
+    AgentDetailSerializer,
+    AgentListSerializer,
+    AgentVersionSummarySerializer,
+    BulkLookupSerializer,
+    ReviewSerializer,
+    TopRatedAgentSerializer,
+    TrendingAgentSerializer,
+)
+
+DETAIL_INCLUDES = ('reviews', 'versions')
+EMBEDDED_VERSIONS = 10
+
+
+def requested_fields(serializer_class, params):
+    """The serializer fields picked with ?fields=a,b,c (all of them by default)"""
+    requested = [name.strip() for name in params.get('fields', '').split(',') if name.strip()]
+    return serializer_class.select_fields(requested)
+
+
+def catalog_queryset(serializer_class, fields):
+    """Active agents, selecting only the columns the given fields render"""
+    queryset = Agent.objects.filter(is_active=True)
+    if 'developer' in fields:
+        queryset = queryset.select_related('developer')
+    if 'ratings' in fields:
+        queryset = queryset.select_related('rating_summary')
+    if 'latest_stable_version' in fields:
+        queryset = queryset.select_related('latest_stable_version')
+    return queryset.only(*serializer_class.columns_for(fields))
+
+
+def filter_listing(queryset, params):
+    """Apply the facet filters and ?min_version= to a catalog listing"""
+    queryset = apply_facet_filters(queryset, normalize_filters(params))
+    min_version = params.get('min_version', '').strip()
+    if min_version:
+        try:
+            queryset = with_version_at_least(queryset, min_version, stable_only=True)
+        except ValueError:
+            raise serializers.ValidationError({'min_version': 'Not a version number.'})
+    return queryset
+
+
+def review_limit(params):
+    try:
+        return min(max(int(params.get('limit', 20)), 1), 100)
+    except ValueError:
+        raise serializers.ValidationError({'cursor': 'Invalid cursor or limit.'})
+
+
+def top_params(params):
+    """(dimension, category, min_reviews, limit) for the top-rated endpoint"""
+    dimension = params.get('dimension', 'rating')
+    if dimension not in REVIEW_DIMENSIONS:
+        raise serializers.ValidationError(
+            {'dimension': f'Choose one of: {", ".join(REVIEW_DIMENSIONS)}'}
+        )
+    try:
+        limit = min(max(int(params.get('limit', 20)), 1), 100)
+        min_reviews = max(int(params.get('min_reviews', 3)), 1)
+    except ValueError:
+        raise serializers.ValidationError('limit and min_reviews must be integers.')
+    return dimension, params.get('category') or None, min_reviews, limit
+
+
+def trending_params(params):
+    """(category, limit) for the trending endpoint"""
+    try:
+        limit = min(max(int(params.get('limit', 20)), 1), 100)
+    except ValueError:
+        raise serializers.ValidationError('limit must be an integer.')
+    return params.get('category') or None, limit
+
+
+def parse_includes(params):
+    """Validate ?include=reviews,versions on the agent detail endpoint"""
+    requested = {name.strip() for name in params.get('include', '').split(',') if name.strip()}
+    unknown = requested - set(DETAIL_INCLUDES)
+    if unknown:
+        raise serializers.ValidationError(
+            {'include': f'Unknown includes: {", ".join(sorted(unknown))}'}
+        )
+    return requested
+
+
+def recent_versions(agent_id):
+    return AgentVersion.objects.filter(agent_id=agent_id).order_by('-release_date')[:EMBEDDED_VERSIONS]
+
+
+def embedded_data(reviews_page=None, versions=None):
+    """Serialize the extra sections requested with ?include="""
+    data = {}
+    if reviews_page is not None:
+        reviews, next_cursor = reviews_page
+        data['reviews'] = {'next': next_cursor, 'results': ReviewSerializer(reviews, many=True).data}
+    if versions is not None:
+        data['versions'] = AgentVersionSummarySerializer(versions, many=True).data
+    return data
+
+
+class AgentViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Public agent catalog.
+
+    Supports ?fields=a,b,c on both list and detail; only the columns those
+    fields need are selected, so listings never load description,
+    requirements or screenshots unless asked to. Detail pages can embed the
+    first page of reviews and recent versions with ?include=reviews,versions.
+    Listings take ?min_version=2.0 to keep agents with a stable release at
+    or above that version.
+    Responses carry ETag and Last-Modified, and revalidations are answered
+    with 304.
+    """
+    lookup_field = 'slug'
+
+    def get_object(self):
+        self.agent = super().get_object()
+        return self.agent
+
+    def retrieve(self, request, *args, **kwargs):
+        includes = parse_includes(request.query_params)
+        response = super().retrieve(request, *args, **kwargs)
+        if includes and response.status_code == 200:
+            response.data.update(embedded_data(
+                review_feed(self.agent.pk) if 'reviews' in includes else None,
+                recent_versions(self.agent.pk) if 'versions' in includes else None,
+            ))
+        return response
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return AgentDetailSerializer
+        if self.action == 'bulk':
+            return AgentBulkSerializer
+        return AgentListSerializer
+
+    def get_fields(self):
+        if not hasattr(self, '_fields'):
+            self._fields = requested_fields(self.get_serializer_class(), self.request.query_params)
+        return self._fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fields()
+        return context
+
+    def get_queryset(self):
+        queryset = catalog_queryset(self.get_serializer_class(), self.get_fields())
+        if self.action == 'list':
+            queryset = filter_listing(queryset, self.request.query_params)
+        return queryset
+
+    @action(detail=True)
+    def reviews(self, request, slug=None):
+        """
+        The agent's reviews, most helpful first, excluding reported ones.
+        Paginate with the opaque `next` cursor; `limit` caps at 100.
+        """
+        agent_id = get_object_or_404(
+            Agent.objects.filter(is_active=True).values_list('id', flat=True), slug=slug
+        )
+        limit = review_limit(request.query_params)
+        try:
+            reviews, next_cursor = review_feed(agent_id, request.query_params.get('cursor'), limit)
+        except ValueError:
+            raise serializers.ValidationError({'cursor': 'Invalid cursor or limit.'})
+        return Response({
+            'next': next_cursor,
+            'results': ReviewSerializer(reviews, many=True).data,
+        })
+
+    @action(detail=False)
+    def top(self, request):
+        """
+        Best-rated agents on one review dimension (?dimension=reliability),
+        optionally within a category. Served from the rating summaries and
+        cached until a review or agent changes.
+        """
+        dimension, category, min_reviews, limit = top_params(request.query_params)
+        results = get_or_compute(
+            f'top:{dimension}:{category}:{min_reviews}:{limit}',
+            lambda: TopRatedAgentSerializer(
+                top_rated_agents(dimension, category, min_reviews, limit), many=True
+            ).data,
+            namespace=RANKINGS_CACHE_NAMESPACE,
+        )
+        return Response({'dimension': dimension, 'results': results})
+
+    @action(detail=False)
+    def trending(self, request):
+        """
+        Agents with the most purchase, subscription, usage and review activity
+        lately, optionally within a category (?category=coding). Scores decay
+        with a half-life of TRENDING_HALF_LIFE_HOURS and are refreshed every
+        few minutes.
+        """
+        category, limit = trending_params(request.query_params)
+        results = get_or_compute(
+            f'trending:{category}:{limit}',
+            lambda: TrendingAgentSerializer(trending_agents(category, limit), many=True).data,
+            namespace=TRENDING_CACHE_NAMESPACE,
+        )
+        return Response({'results': results})
+
+    @action(detail=False)
+    def facets(self, request):
+        """
+        Counts per category, pricing model, integration type, risk rating,
+        verification and sandbox availability for the current filters.
+        Each facet ignores its own filter, so alternatives stay visible.
+        """
+        return Response(facet_counts(normalize_filters(request.query_params)))
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Resolve up to 500 slugs or ids in one round trip.
+
+        Results come back in request order, one per requested key, repeats
+        included; unknown or inactive agents get a {"found": false} marker.
+        Warm entries are read from the per-agent cache in one multi-get, and
+        the misses are fetched with one IN query plus one windowed prefetch
+        for each agent's latest version. Cached entries are request-agnostic,
+        so logo URLs are made absolute here.
+        """
+        lookup = BulkLookupSerializer(data=request.data)
+        lookup.is_valid(raise_exception=True)
+        by = 'slug' if lookup.validated_data.get('slugs') else 'id'
+        requested = lookup.validated_data.get('slugs') or lookup.validated_data['ids']
+        keys = list(dict.fromkeys(requested))
+
+        cache_keys = {key: namespace_key(CATALOG_CACHE_NAMESPACE, f'agent-bulk:{by}:{key}') for key in keys}
+        cached = cache.get_many(list(cache_keys.values()))
+        agents = {key: cached[cache_keys[key]] for key in keys if cache_keys[key] in cached}
+
+        missing = [key for key in keys if key not in agents]
+        if missing:
+            fresh = self.fetch_bulk(by, missing)
+            agents.update(fresh)
+            cache.set_many({
+                namespace_key(CATALOG_CACHE_NAMESPACE, f'agent-bulk:{field}:{data[field]}'): data
+                for data in fresh.values()
+                for field in ('slug', 'id')
+            })
+
+        fields = self.get_fields()
+        results = []
+        for key in requested:
+            data = agents.get(key)
+            if data is None:
+                results.append({'lookup': key, 'found': False})
+                continue
+            agent = {name: data[name] for name in fields}
+            if agent.get('logo'):
+                agent['logo'] = request.build_absolute_uri(agent['logo'])
+            results.append({'lookup': key, 'found': True, 'agent': agent})
+        return Response({'results': results})
+
+    def fetch_bulk(self, by, keys):
+        """Serialize the given agents with a fixed number of queries"""
+        latest = AgentVersion.objects.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('agent_id')],
+                order_by=F('release_date').desc(),
+            )
+        ).filter(position=1)
+        queryset = (
+            Agent.objects.filter(is_active=True, **{f'{by}__in': keys})
+            .select_related('developer')
+            .only(*AgentBulkSerializer.columns_for(AgentBulkSerializer.Meta.fields))
+            .prefetch_related(Prefetch('versions', queryset=latest, to_attr='latest_versions'))
+        )
+        serialized = AgentBulkSerializer(queryset, many=True).data
+        return {data[by]: data for data in serialized}
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_review_helpful(request, pk):
+    """Record a helpful vote; helpful_count is updated by a periodic batch job"""
+    review = get_object_or_404(Review.objects.only('id'), pk=pk, reported=False)
+    created = record_helpful_vote(review, request.user)
+    return Response(
+        {'recorded': created},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+
+@require_safe
+def homepage(request):
+    """
+    Featured, top-rated and trending agents for the homepage.
+
+    A plain Django view: the body comes pre-rendered from the snapshot in
+    api/homepage.py, so serving it is one cache read and never touches
+    the database (not even for the session). While a cold cache's first
+    snapshot is being built, other requests get a 503 with Retry-After.
+    """
+    snapshot = homepage_snapshot()
+    if snapshot is None:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = BUILD_RETRY_AFTER
+        return response
+    last_modified = int(snapshot['built_at'])
+    response = not_modified(request, snapshot['etag'], last_modified)
+    if response is None:
+        response = add_validators(
+            HttpResponse(snapshot['body'], content_type='application/json'),
+            snapshot['etag'], last_modified,
+        )
+    return response
@@ -0,0 +1,8 @@
+from decouple import config
+
+# Load the Celery app with Django so @shared_task uses it. API-only workers
+# (ENVIRONMENT=api) never enqueue jobs, so they skip Celery's import cost.
+if config('ENVIRONMENT', default='dev') != 'api':
+    from .celery import app as celery_app
+
+    __all__ = ('celery_app',)
@@ -0,0 +1,71 @@
+"""
+Audit log hooks shared by every app.
+
+Models opt in with the AuditedModel mixin and list their AUDIT_FIELDS;
+admin classes credit changes to the staff member with
+AuditActorAdminMixin. Nothing here imports an app, so users and
+marketplace can both depend on it. Entries are recorded and written by
+marketplace/audit.py.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import ValidationError
+
+_actor = ContextVar('audit_actor', default=None)
+
+
+class AuditedModel:
+    """Mixin for models whose AUDIT_FIELDS changes are logged; remembers the loaded values"""
+    AUDIT_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._audit_loaded = audited_values(instance)
+        return instance
+
+
+def audited_values(instance):
+    """Current values of the instance's audited fields, skipping deferred ones"""
+    return {
+        name: _normalize(instance._meta.get_field(name), instance.__dict__[name])
+        for name in instance.AUDIT_FIELDS
+        if name in instance.__dict__
+    }
+
+
+def _normalize(field, value):
+    # Assigned values may be strings or ints where the database returns Decimals
+    try:
+        return field.to_python(value)
+    except ValidationError:
+        return value
+
+
+def current_actor():
+    """The user changes are being credited to, or None"""
+    return _actor.get()
+
+
+@contextmanager
+def audit_actor(user):
+    """Credit changes saved inside the block to `user`"""
+    token = _actor.set(user)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+class AuditActorAdminMixin:
+    """Credits changes made through the change form, list editing and actions to the staff member"""
+
+    def changeform_view(self, request, *args, **kwargs):
+        with audit_actor(request.user):
+            return super().changeform_view(request, *args, **kwargs)
+
+    def changelist_view(self, request, *args, **kwargs):
+        with audit_actor(request.user):
+            return super().changelist_view(request, *args, **kwargs)
@@ -0,0 +1,420 @@
+"""
+Two-tier cache backend.
+
+A small in-process LRU sits in front of a shared cache (Redis in
+production). Local entries live for a short, jittered TTL so workers don't
+all expire the same key at once; the shared tier is the source of truth.
+
+Whole groups of keys ("namespaces" such as catalog, rankings or facets) are
+invalidated across processes by bumping a version number stored in the
+shared tier, instead of deleting keys one by one. Every process re-reads
+namespace versions after VERSION_TTL seconds, so local copies of
+namespaced keys can live for LOCAL_TIMEOUT. Any other key may be
+overwritten or deleted by another process, which this process never
+hears about, so its local copy lives about VERSION_TTL too.
+
+``get_or_compute()`` adds stampede protection: only one worker recomputes a
+missing key while the rest wait for its result, and hot keys are refreshed
+probabilistically shortly before they expire (XFetch) so they rarely expire
+at all. ``aget_or_compute()`` does the same for coroutines, sharing the
+lock key in the shared tier with the sync path.
+
+Configure it as::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'autra.cache.TwoTierCache',
+            'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 1000},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', ...},
+    }
+"""
+
+import asyncio
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class NamespacedKey(str):
+    """A key under a namespace version; bumping the namespace retires it everywhere"""
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU of pickled values with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache(BaseCache):
+    """Django cache backend: local LRU (L1) in front of a shared cache alias (L2)"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self.jitter = options.get('JITTER', 0.2)
+        self.version_ttl = options.get('VERSION_TTL', 2)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.early_recompute_beta = options.get('EARLY_RECOMPUTE_BETA', 1.0)
+        self.local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._ainflight = {}
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, timeout, key=None):
+        """Jittered L1 lifetime that never outlives the shared entry"""
+        base = self.local_timeout if isinstance(key, NamespacedKey) else self.version_ttl
+        ttl = base * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        return ttl
+
+    # Standard cache API: read through L1, write through to L2
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(full_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(full_key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.local.set(full_key, value, self._local_ttl(self.local_timeout, key))
+        return value
+
+    async def aget(self, key, default=None, version=None):
+        # L1 lives in this process, so only an L2 read needs a worker thread
+        value = self.local.get(self.make_and_validate_key(key, version=version), _MISSING)
+        if value is not _MISSING:
+            return value
+        return await sync_to_async(self.get)(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        timeout = self._seconds(timeout)
+        self.shared.set(full_key, value, timeout)
+        self.local.set(full_key, value, self._local_ttl(timeout, key))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        timeout = self._seconds(timeout)
+        added = self.shared.add(full_key, value, timeout)
+        if added:
+            self.local.set(full_key, value, self._local_ttl(timeout, key))
+        return added
+
+    def get_many(self, keys, version=None):
+        """L1 hits first, then one round trip to L2 for everything else"""
+        found = {}
+        missing = {}
+        for key in keys:
+            full_key = self.make_and_validate_key(key, version=version)
+            value = self.local.get(full_key, _MISSING)
+            if value is _MISSING:
+                missing[full_key] = key
+            else:
+                found[key] = value
+        if missing:
+            for full_key, value in self.shared.get_many(list(missing)).items():
+                self.local.set(full_key, value, self._local_ttl(self.local_timeout, missing[full_key]))
+                found[missing[full_key]] = value
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._seconds(timeout)
+        full = {self.make_and_validate_key(key, version=version): (key, value) for key, value in data.items()}
+        failed = self.shared.set_many({full_key: value for full_key, (_, value) in full.items()}, timeout)
+        for full_key, (key, value) in full.items():
+            self.local.set(full_key, value, self._local_ttl(timeout, key))
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.shared.touch(key, self._seconds(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def _seconds(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Namespace versions
+
+    def namespace_version(self, namespace):
+        """Current version of a namespace, re-read from L2 every few seconds"""
+        version_key = f'nsver:{namespace}'
+        version = self.local.get(version_key)
+        if version is None:
+            version = self.shared.get(version_key)
+            if version is None:
+                self.shared.add(version_key, 1, None)
+                version = self.shared.get(version_key, 1)
+            self.local.set(version_key, version, self.version_ttl)
+        return version
+
+    def bump_namespace(self, namespace):
+        """Invalidate every key in a namespace, in all processes"""
+        version_key = f'nsver:{namespace}'
+        try:
+            version = self.shared.incr(version_key)
+        except ValueError:
+            self.shared.add(version_key, 1, None)
+            version = self.shared.incr(version_key)
+        self.local.set(version_key, version, self.version_ttl)
+        return version
+
+    def namespaced_key(self, namespace, key):
+        return NamespacedKey(f'{namespace}:{self.namespace_version(namespace)}:{key}')
+
+    # Stampede protection
+
+    def get_or_compute(self, key, compute, timeout=300, namespace=None):
+        """
+        Return the cached value for key, computing and storing it if needed.
+
+        Only one caller per process (and, through a lock key in L2, one
+        process) runs compute() for a missing key; the others wait for its
+        result. Entries close to expiry are refreshed early with a
+        probability that rises as expiry approaches, weighted by how long
+        compute() took last time.
+        """
+        if namespace:
+            key = self.namespaced_key(namespace, key)
+
+        envelope = self.get(key)
+        if envelope is not None and not self._should_refresh(envelope):
+            return envelope['value']
+
+        # Single flight within this process
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            if envelope is not None:
+                return envelope['value']
+            event.wait(self.lock_timeout)
+            envelope = self.get(key)
+            if envelope is not None:
+                return envelope['value']
+            return compute()
+
+        try:
+            return self._compute_shared(key, compute, timeout, envelope)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    async def aget_or_compute(self, key, compute, timeout=300, namespace=None):
+        """
+        Async get_or_compute(); compute is a coroutine function.
+
+        Only one task per event loop, and through the same L2 lock key as
+        the sync path one process, computes a missing key; the others
+        await its result.
+        """
+        if namespace:
+            key = self.namespaced_key(namespace, key)
+        envelope = await self.aget(key)
+        if envelope is not None and not self._should_refresh(envelope):
+            return envelope['value']
+
+        # Single flight within this event loop; tasks only switch at an await
+        flight = (id(asyncio.get_running_loop()), key)
+        event = self._ainflight.get(flight)
+        if event is not None:
+            if envelope is not None:
+                return envelope['value']
+            try:
+                await asyncio.wait_for(event.wait(), self.lock_timeout)
+            except asyncio.TimeoutError:
+                pass
+            envelope = await self.aget(key)
+            if envelope is not None:
+                return envelope['value']
+            return await compute()
+
+        event = self._ainflight[flight] = asyncio.Event()
+        try:
+            return await self._acompute_shared(key, compute, timeout, envelope)
+        finally:
+            self._ainflight.pop(flight, None)
+            event.set()
+
+    def _should_refresh(self, envelope):
+        remaining = envelope['expires_at'] - time.time()
+        if remaining <= 0:
+            return True
+        # XFetch: refresh early with probability growing as expiry nears
+        jitter = -envelope['delta'] * self.early_recompute_beta * math.log(random.random() or 1e-12)
+        return jitter >= remaining
+
+    def _compute_shared(self, key, compute, timeout, stale):
+        lock_key = f'lock:{key}'
+        locked = self.shared.add(lock_key, 1, self.lock_timeout)
+        if not locked:
+            # Another process is recomputing: serve stale, or wait for it
+            if stale is not None:
+                return stale['value']
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                envelope = self.get(key)
+                if envelope is not None:
+                    return envelope['value']
+        try:
+            started = time.monotonic()
+            value = compute()
+            self.set(key, {
+                'value': value,
+                'delta': time.monotonic() - started,
+                'expires_at': time.time() + timeout,
+            }, timeout)
+            return value
+        finally:
+            if locked:
+                self.shared.delete(lock_key)
+
+    async def _acompute_shared(self, key, compute, timeout, stale):
+        lock_key = f'lock:{key}'
+        locked = await self.shared.aadd(lock_key, 1, self.lock_timeout)
+        if not locked:
+            if stale is not None:
+                return stale['value']
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                envelope = await self.aget(key)
+                if envelope is not None:
+                    return envelope['value']
+        try:
+            started = time.monotonic()
+            value = await compute()
+            await self.aset(key, {
+                'value': value,
+                'delta': time.monotonic() - started,
+                'expires_at': time.time() + timeout,
+            }, timeout)
+            return value
+        finally:
+            if locked:
+                await self.shared.adelete(lock_key)
+
+
+def shared_cache(alias='default'):
+    """The cache every process reads directly: a two-tier cache's shared tier, or the cache itself"""
+    cache = caches[alias]
+    return cache.shared if isinstance(cache, TwoTierCache) else cache
+
+
+def namespace_version(namespace, alias='default'):
+    """Current version of a namespace; it changes whenever the namespace is bumped"""
+    cache = caches[alias]
+    if isinstance(cache, TwoTierCache):
+        return cache.namespace_version(namespace)
+    return cache.get(f'nsver:{namespace}', 1)
+
+
+def namespace_key(namespace, key, alias='default'):
+    """Key under the current version of a namespace, for manual get/set"""
+    cache = caches[alias]
+    if isinstance(cache, TwoTierCache):
+        return cache.namespaced_key(namespace, key)
+    return f'{namespace}:{cache.get(f"nsver:{namespace}", 1)}:{key}'
+
+
+def get_or_compute(key, compute, timeout=300, namespace=None, alias='default'):
+    """get_or_compute() on a two-tier cache, falling back to plain get/set"""
+    cache = caches[alias]
+    if isinstance(cache, TwoTierCache):
+        return cache.get_or_compute(key, compute, timeout, namespace)
+    if namespace:
+        key = namespace_key(namespace, key, alias)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+async def aget_or_compute(key, compute, timeout=300, namespace=None, alias='default'):
+    """Async get_or_compute(), awaiting compute() on a miss"""
+    cache = caches[alias]
+    if isinstance(cache, TwoTierCache):
+        return await cache.aget_or_compute(key, compute, timeout, namespace)
+    if namespace:
+        key = namespace_key(namespace, key, alias)
+    value = await cache.aget(key, _MISSING)
+    if value is _MISSING:
+        value = await compute()
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def bump_namespace(namespace, alias='default'):
+    """Invalidate every key cached under a namespace"""
+    cache = caches[alias]
+    if isinstance(cache, TwoTierCache):
+        return cache.bump_namespace(namespace)
+    try:
+        return cache.incr(f'nsver:{namespace}')
+    except ValueError:
+        cache.set(f'nsver:{namespace}', 2, None)
+        return 2
@@ -0,0 +1,16 @@
+"""
+Celery application for autra.
+
+Workers and beat are started with ``celery -A autra worker`` and
+``celery -A autra beat``; periodic jobs live in ``CELERY_BEAT_SCHEDULE``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'autra.settings')
+
+app = Celery('autra')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,477 @@
+"""
+Migration operations that change large tables without blocking writes.
+
+Plain AddIndex, AddConstraint and data migrations lock a table for as long
+as they take, which on Transaction or Review means minutes of failed
+checkouts. The operations here do the same work in steps that keep the
+table writable:
+
+- AddIndexConcurrently / RemoveIndexConcurrently build and drop indexes
+  with CONCURRENTLY (partition by partition on partitioned tables)
+- AddUniqueConstraintConcurrently builds the unique index concurrently and
+  then attaches it as the constraint
+- AddConstraintNotValid adds a CHECK constraint that only applies to new
+  rows; ValidateConstraint then checks existing rows without blocking writes
+- BackfillField fills a column in small batches, one transaction each,
+  pausing between them
+
+Concurrent builds and batched backfills cannot run inside a transaction, so
+migrations using them need ``atomic = False``. On databases other than
+PostgreSQL each operation falls back to the ordinary blocking version.
+
+lint_migration() reports operations that would lock a table; see the
+lint_migrations management command.
+"""
+
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import NotSupportedError, migrations, models, transaction
+
+
+def is_postgres(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+def ensure_not_in_transaction(schema_editor, operation):
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError(
+            f'{operation.__class__.__name__} cannot run inside a transaction; '
+            f'set atomic = False on the migration'
+        )
+
+
+@contextmanager
+def lock_timeout(connection):
+    """
+    Give up on an exclusive table lock after MIGRATION_LOCK_TIMEOUT instead
+    of queueing behind a long transaction while every query on the table
+    queues behind us. Concurrent builds are left alone: waiting out older
+    transactions is how they avoid blocking.
+    """
+    timeout = getattr(settings, 'MIGRATION_LOCK_TIMEOUT', '')
+    if connection.vendor != 'postgresql' or not timeout:
+        yield
+        return
+    local = connection.in_atomic_block
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW lock_timeout')
+        previous = cursor.fetchone()[0]
+        cursor.execute('SELECT set_config(%s, %s, %s)', ['lock_timeout', str(timeout), local])
+    try:
+        yield
+    finally:
+        if not local:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT set_config(%s, %s, false)', ['lock_timeout', previous])
+
+
+def drop_invalid_index(schema_editor, name):
+    """Drop an index left INVALID by an interrupted concurrent build, so it can be retried"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+            'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+            [name],
+        )
+        invalid = cursor.fetchone() is not None
+    if invalid:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}')
+
+
+def partitions_of(connection, table):
+    """Names of a partitioned table's partitions, or None for an ordinary table"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)', [table])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_partitioned_index(schema_editor, model, index, partitions):
+    """
+    CREATE INDEX CONCURRENTLY doesn't work on a partitioned table, so create
+    the parent index ON ONLY the parent (instant, and invalid until every
+    partition has one), then build each partition's index concurrently and
+    attach it. Partitions created later get the index automatically.
+    """
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    statement = str(index.create_sql(model, schema_editor, concurrently=True))
+    schema_editor.execute(
+        statement.replace('CREATE INDEX CONCURRENTLY', 'CREATE INDEX IF NOT EXISTS', 1)
+        .replace(f' ON {quote(table)}', f' ON ONLY {quote(table)}', 1)
+    )
+    for partition in partitions:
+        name = f'{index.name}_{partition.removeprefix(table + "_")}'[:63]
+        drop_invalid_index(schema_editor, name)
+        schema_editor.execute(
+            statement.replace('CREATE INDEX CONCURRENTLY', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1)
+            .replace(quote(index.name), quote(name), 1)
+            .replace(f' ON {quote(table)}', f' ON {quote(partition)}', 1)
+        )
+        schema_editor.execute(f'ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(name)}')
+
+
+def remove_index(schema_editor, model, index):
+    """Drop an index concurrently, or with a lock timeout where that isn't possible (partitioned tables)"""
+    if partitions_of(schema_editor.connection, model._meta.db_table) is None:
+        schema_editor.remove_index(model, index, concurrently=True)
+    else:
+        with lock_timeout(schema_editor.connection):
+            schema_editor.remove_index(model, index)
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex using CREATE INDEX CONCURRENTLY, which leaves the table writable"""
+
+    atomic = False
+
+    def describe(self):
+        return f'Concurrently create index {self.index.name} on {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        ensure_not_in_transaction(schema_editor, self)
+        partitions = partitions_of(schema_editor.connection, model._meta.db_table)
+        if partitions is not None:
+            return add_partitioned_index(schema_editor, model, self.index, partitions)
+        drop_invalid_index(schema_editor, self.index.name)
+        schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        ensure_not_in_transaction(schema_editor, self)
+        remove_index(schema_editor, model, self.index)
+
+
+class RemoveIndexConcurrently(migrations.RemoveIndex):
+    """RemoveIndex using DROP INDEX CONCURRENTLY"""
+
+    atomic = False
+
+    def describe(self):
+        return f'Concurrently remove index {self.name} from {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        ensure_not_in_transaction(schema_editor, self)
+        index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+        remove_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        ensure_not_in_transaction(schema_editor, self)
+        index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+        partitions = partitions_of(schema_editor.connection, model._meta.db_table)
+        if partitions is not None:
+            return add_partitioned_index(schema_editor, model, index, partitions)
+        drop_invalid_index(schema_editor, index.name)
+        schema_editor.add_index(model, index, concurrently=True)
+
+
+class AddUniqueConstraintConcurrently(migrations.AddConstraint):
+    """
+    AddConstraint for a plain UniqueConstraint on fields: build the unique
+    index concurrently, then attach it with ADD CONSTRAINT ... USING INDEX,
+    which only needs a brief lock
+    """
+
+    atomic = False
+
+    def __init__(self, model_name, constraint):
+        if not isinstance(constraint, models.UniqueConstraint) or not constraint.fields or (
+            constraint.condition or constraint.include or constraint.opclasses or constraint.deferrable
+        ):
+            raise ValueError(
+                'AddUniqueConstraintConcurrently only supports UniqueConstraint(fields=...) '
+                'without condition, include, opclasses or deferrable'
+            )
+        super().__init__(model_name, constraint)
+
+    def describe(self):
+        return f'Concurrently create unique constraint {self.constraint.name} on {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        ensure_not_in_transaction(schema_editor, self)
+        quote = schema_editor.quote_name
+        name = quote(self.constraint.name)
+        table = quote(model._meta.db_table)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in self.constraint.fields)
+        drop_invalid_index(schema_editor, self.constraint.name)
+        schema_editor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})')
+        with lock_timeout(schema_editor.connection):
+            schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}')
+
+
+class AddConstraintNotValid(migrations.AddConstraint):
+    """
+    AddConstraint for a CheckConstraint, added NOT VALID: it applies to new
+    and updated rows straight away but existing rows are not scanned until a
+    later ValidateConstraint
+    """
+
+    def __init__(self, model_name, constraint):
+        if not isinstance(constraint, models.CheckConstraint):
+            raise TypeError('AddConstraintNotValid only supports CheckConstraint')
+        super().__init__(model_name, constraint)
+
+    def describe(self):
+        return f'Create not valid constraint {self.constraint.name} on {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not is_postgres(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        with lock_timeout(schema_editor.connection):
+            schema_editor.execute(f'{self.constraint.create_sql(model, schema_editor)} NOT VALID')
+
+
+class ValidateConstraint(migrations.operations.base.Operation):
+    """
+    Check existing rows against a constraint added NOT VALID. Validation only
+    takes a SHARE UPDATE EXCLUSIVE lock, so reads and writes carry on.
+    """
+
+    reversible = True
+    reduces_to_sql = True
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'model_name': self.model_name, 'name': self.name}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not is_postgres(schema_editor) or not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        quote = schema_editor.quote_name
+        schema_editor.execute(f'ALTER TABLE {quote(model._meta.db_table)} VALIDATE CONSTRAINT {quote(self.name)}')
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        pass
+
+    def describe(self):
+        return f'Validate constraint {self.name} on {self.model_name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'validate_{self.model_name.lower()}_{self.name.lower()}'
+
+
+class BackfillField(migrations.operations.base.Operation):
+    """
+    Set a column on existing rows in primary-key order, batch_size rows per
+    transaction with a pause between batches, so row locks are short and
+    replicas keep up. value may be a constant or an expression (F(), Func(),
+    Subquery(), ...). With only_null (the default) rows that already have a
+    value are skipped, so an interrupted backfill can simply be rerun.
+    Backwards is a no-op.
+    """
+
+    reversible = True
+    reduces_to_sql = False
+    atomic = False
+
+    def __init__(self, model_name, name, value, batch_size=None, pause=None, only_null=True):
+        self.model_name = model_name
+        self.name = name
+        self.value = value
+        self.batch_size = batch_size
+        self.pause = pause
+        self.only_null = only_null
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'name': self.name, 'value': self.value}
+        if self.batch_size is not None:
+            kwargs['batch_size'] = self.batch_size
+        if self.pause is not None:
+            kwargs['pause'] = self.pause
+        if not self.only_null:
+            kwargs['only_null'] = False
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        alias = schema_editor.connection.alias
+        if not self.allow_migrate_model(alias, model):
+            return
+        batch_size = self.batch_size or settings.MIGRATION_BACKFILL_BATCH_SIZE
+        pause = settings.MIGRATION_BACKFILL_PAUSE if self.pause is None else self.pause
+
+        queryset = model._base_manager.using(alias)
+        if self.only_null:
+            queryset = queryset.filter(**{f'{self.name}__isnull': True})
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(batch.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic(using=alias):
+                model._base_manager.using(alias).filter(pk__in=pks).update(**{self.name: self.value})
+            last_pk = pks[-1]
+            if len(pks) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        pass
+
+    def describe(self):
+        return f'Backfill {self.model_name}.{self.name} in batches'
+
+    @property
+    def migration_name_fragment(self):
+        return f'backfill_{self.model_name.lower()}_{self.name.lower()}'
+
+
+# Detection
+
+Finding = namedtuple('Finding', 'level code operation message')
+
+CONCURRENT_OPERATIONS = (AddIndexConcurrently, RemoveIndexConcurrently, AddUniqueConstraintConcurrently, BackfillField)
+
+
+def widens_column(old, new):
+    """Changes PostgreSQL makes in the catalog only, without rewriting the table"""
+    if isinstance(old, models.CharField) and isinstance(new, models.TextField):
+        return True
+    return (
+        type(old) is type(new)
+        and isinstance(new, models.CharField)
+        and (new.max_length is None or (old.max_length is not None and new.max_length >= old.max_length))
+    )
+
+
+def creates_index(field):
+    return field.db_index or field.unique or (field.is_relation and field.many_to_one and field.db_constraint)
+
+
+def lint_migration(migration, state, fresh_models=frozenset(), connection=None):
+    """
+    Return Findings for the operations in a migration that would lock a
+    populated table, given the project state before it. Models in
+    fresh_models (created by migrations deploying alongside this one) are
+    empty, so anything goes for them; operations on models created in this
+    migration are skipped too. Codes listed in the migration's lint_ignore
+    are left out.
+    """
+    app_label = migration.app_label
+    ignored = set(getattr(migration, 'lint_ignore', ()))
+    created = set(fresh_models)
+    findings = []
+
+    def report(level, code, operation, message):
+        if code not in ignored:
+            findings.append(Finding(level, code, operation.describe(), message))
+
+    for operation in migration.operations:
+        model_name = getattr(operation, 'model_name_lower', None) or getattr(operation, 'name_lower', None)
+        existing = (app_label, model_name) in state.models and (app_label, model_name) not in created
+        table = state.models[app_label, model_name].options.get('db_table') if existing else None
+        table = table or f'{app_label}_{model_name}'
+
+        if isinstance(operation, CONCURRENT_OPERATIONS) and migration.atomic:
+            report('error', 'needs-non-atomic', operation,
+                   f'{operation.__class__.__name__} cannot run in a transaction; set atomic = False')
+
+        if isinstance(operation, migrations.RunPython) and migration.atomic:
+            report('warning', 'data-in-transaction', operation,
+                   'runs in the migration transaction, holding every row lock it takes until the end; '
+                   'use BackfillField or batch it in a non-atomic migration')
+        elif isinstance(operation, migrations.RunSQL):
+            report('warning', 'raw-sql', operation, 'raw SQL cannot be checked; review the locks it takes')
+        elif isinstance(operation, migrations.CreateModel):
+            created.add((app_label, operation.name_lower))
+        elif not existing:
+            pass
+        elif type(operation) is migrations.AddIndex:
+            report('error', 'add-index', operation,
+                   f'CREATE INDEX blocks writes to {table} until it finishes; '
+                   f'use AddIndexConcurrently in a non-atomic migration')
+        elif type(operation) is migrations.RemoveIndex:
+            report('warning', 'remove-index', operation,
+                   f'DROP INDEX waits for an exclusive lock on {table}, queueing every query behind it; '
+                   f'use RemoveIndexConcurrently')
+        elif type(operation) is migrations.AddConstraint:
+            if isinstance(operation.constraint, models.CheckConstraint):
+                report('error', 'add-constraint', operation,
+                       f'checks every row of {table} while holding an exclusive lock; '
+                       f'use AddConstraintNotValid, then ValidateConstraint in a later migration')
+            else:
+                report('error', 'add-constraint', operation,
+                       f'builds a unique index on {table} while blocking writes; '
+                       f'use AddUniqueConstraintConcurrently')
+        elif isinstance(operation, migrations.AlterUniqueTogether) and operation.option_value:
+            before = set(state.models[app_label, model_name].options.get('unique_together', ()))
+            if set(map(tuple, operation.option_value)) - before:
+                report('error', 'add-constraint', operation,
+                       f'builds a unique index on {table} while blocking writes; '
+                       f'replace it with a UniqueConstraint added by AddUniqueConstraintConcurrently')
+        elif isinstance(operation, migrations.AddField):
+            field = operation.field
+            if creates_index(field) and not field.many_to_many:
+                report('error', 'add-field-index', operation,
+                       f'indexes the new column while blocking writes to {table}; add it with '
+                       f'db_index=False (and db_constraint=False for a ForeignKey), then AddIndexConcurrently')
+        elif isinstance(operation, migrations.AlterField):
+            old = state.models[app_label, model_name].fields[operation.name]
+            new = operation.field
+            if old.null and not new.null:
+                report('error', 'set-not-null', operation,
+                       f'SET NOT NULL scans {table} under an exclusive lock; first add '
+                       f'CHECK ({operation.name} IS NOT NULL) with AddConstraintNotValid and validate it, '
+                       f'which lets PostgreSQL skip the scan')
+            if connection is not None and old.db_parameters(connection)['type'] != new.db_parameters(connection)['type'] \
+                    and not widens_column(old, new):
+                report('error', 'alter-column-type', operation,
+                       f'changing the column type rewrites {table} under an exclusive lock; '
+                       f'add a new column, backfill it with BackfillField and switch over')
+            if creates_index(new) and not creates_index(old):
+                report('error', 'add-field-index', operation,
+                       f'indexes the column while blocking writes to {table}; '
+                       f'use AddIndexConcurrently instead of db_index/unique')
+        elif isinstance(operation, (migrations.RemoveField, migrations.RenameField,
+                                    migrations.RenameModel, migrations.DeleteModel)):
+            report('warning', 'breaks-running-code', operation,
+                   'workers still on the previous release will query the old schema; '
+                   'stop using it in one deploy and change the table in the next')
+
+        operation.state_forwards(app_label, state)
+    return findings
@@ -0,0 +1,141 @@
+"""
+Database routing for read replicas.
+
+Reads of the catalog models listed in ``REPLICA_ROUTED_MODELS`` go to one of
+``DATABASE_REPLICAS``; everything else, and every write, uses ``default``.
+Each request sticks to one randomly chosen replica, so data never goes
+backwards between its queries. A client that has just written is pinned to
+the primary for ``REPLICA_STICKY_SECONDS`` (tracked with a cookie) so it
+never reads its own change back from a lagging replica. Writes are spotted
+by an execute wrapper on the primary's connections, so only statements
+that actually ran count. Code running outside a request (management
+commands, Celery tasks, shells) always reads from the primary, since it
+usually reads back what it has just written.
+"""
+
+import random
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PIN_COOKIE = 'autra_db_pin'
+WRITE_SQL = re.compile(r'\s*(INSERT|UPDATE|DELETE|MERGE|COPY)\b', re.IGNORECASE)
+
+# One mutable dict per request, so writes made inside sync_to_async threads
+# are still visible to the middleware when the response goes out
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def pin_to_primary():
+    """Send this request's remaining reads to the primary"""
+    state = _request_state.get()
+    if state is not None:
+        state['pinned'] = True
+        state['wrote'] = True
+
+
+def is_pinned():
+    """True for pinned requests and for everything outside a request"""
+    state = _request_state.get()
+    return state is None or state['pinned']
+
+
+def _pin_after_write(execute, sql, params, many, context):
+    result = execute(sql, params, many, context)
+    if WRITE_SQL.match(sql):
+        pin_to_primary()
+    return result
+
+
+@receiver(connection_created)
+def watch_primary_writes(sender, connection, **kwargs):
+    """Pin the request once a write has actually run on the primary"""
+    if connection.alias == 'default' and _pin_after_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_pin_after_write)
+
+
+class ReplicaRouter:
+    """Route catalog reads to replicas and keep writes on the primary"""
+
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+        self.routed_models = {
+            label.lower() for label in getattr(settings, 'REPLICA_ROUTED_MODELS', [])
+        }
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or is_pinned():
+            return 'default'
+        if model._meta.label_lower not in self.routed_models:
+            return 'default'
+        state = _request_state.get()
+        if state['replica'] is None:
+            state['replica'] = random.choice(self.replicas)
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        # Asking is not writing: the request is pinned once a write runs
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def ReplicaPinningMiddleware(get_response):
+    """Pin recent writers to the primary and extend the pin after each write"""
+    sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+    def start(request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        state = {
+            'pinned': pinned_until > time.time() or request.method not in ('GET', 'HEAD', 'OPTIONS'),
+            'wrote': False,
+            'replica': None,
+        }
+        return state, _request_state.set(state)
+
+    def finish(response, state):
+        if state['wrote']:
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + sticky_seconds),
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = start(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_state.reset(token)
+            return finish(response, state)
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            state, token = start(request)
+            try:
+                response = get_response(request)
+            finally:
+                _request_state.reset(token)
+            return finish(response, state)
+    return middleware
+
+
+ReplicaPinningMiddleware.sync_capable = True
+ReplicaPinningMiddleware.async_capable = True
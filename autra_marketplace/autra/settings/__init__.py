@@ -7,6 +7,8 @@ ENVIRONMENT = config('ENVIRONMENT', default='dev')
 
 if ENVIRONMENT == 'prod':
     from .prod import *  # Use production settings
+elif ENVIRONMENT == 'api':
+    from .api import *   # Production, slimmed down for API-only workers
 elif ENVIRONMENT == 'dev':
     from .dev import *   # Use development settings
 else:
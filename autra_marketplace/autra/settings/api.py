@@ -0,0 +1,35 @@
+# API worker settings: production, minus everything only HTML pages need
+
+from .prod import *
+
+# No admin, messages, static files or form rendering in an API worker
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+
+    'rest_framework',
+
+    'marketplace',
+    'users',
+    'api',
+]
+
+# DRF does its own CSRF check for session-authenticated requests, and JSON
+# responses need neither messages nor frame protection
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'autra.routers.ReplicaPinningMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+]
+
+ROOT_URLCONF = 'autra.urls_api'
+
+TEMPLATES = []
+
+# JSON only; the browsable API needs templates
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['api.renderers.FastJSONRenderer'],
+}
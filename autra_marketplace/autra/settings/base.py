@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'autra.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -91,6 +92,45 @@ DATABASES = {
     }
 }
 
+# Read replicas (see autra/routers.py); empty means everything uses default
+DATABASE_ROUTERS = ['autra.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_ROUTED_MODELS = [
+    'marketplace.Agent',
+    'marketplace.AgentVersion',
+    'marketplace.Review',
+]
+# How long a client reads from the primary after it writes
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+# Online schema changes (see autra/online_migrations.py): how long DDL waits
+# for a table lock before failing, and how hard BackfillField pushes
+MIGRATION_LOCK_TIMEOUT = config('MIGRATION_LOCK_TIMEOUT', default='5s')
+MIGRATION_BACKFILL_BATCH_SIZE = config('MIGRATION_BACKFILL_BATCH_SIZE', default=5000, cast=int)
+MIGRATION_BACKFILL_PAUSE = config('MIGRATION_BACKFILL_PAUSE', default=0.1, cast=float)
+
+
+# Cache: small per-process LRU in front of a shared cache (see autra/cache.py).
+# Locally the shared tier is in-memory; prod.py points it at Redis.
+# LOCAL_TIMEOUT applies to namespaced keys; other keys are kept locally for
+# about VERSION_TTL (default 2s) so deletes elsewhere are seen quickly.
+CACHES = {
+    'default': {
+        'BACKEND': 'autra.cache.TwoTierCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 30,
+            'JITTER': 0.2,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'autra-shared',
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +178,110 @@ MEDIA_ROOT = BASE_DIR / 'media'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Stripe (developer payouts go to their connected accounts)
+STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
+STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+
+# Celery (background jobs and periodic tasks)
+CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'renew-subscriptions': {
+        'task': 'marketplace.tasks.renew_subscriptions',
+        'schedule': 15 * 60,
+    },
+    'fold-review-votes': {
+        'task': 'marketplace.tasks.fold_review_votes',
+        'schedule': 60,
+    },
+    'maintain-transaction-partitions': {
+        'task': 'marketplace.tasks.maintain_transaction_partitions',
+        'schedule': 24 * 60 * 60,
+    },
+    'refresh-trending-scores': {
+        'task': 'marketplace.tasks.refresh_trending_scores',
+        'schedule': 5 * 60,
+    },
+    'score-transactions': {
+        'task': 'marketplace.tasks.score_transactions',
+        'schedule': 60,
+    },
+    'close-usage-billing': {
+        'task': 'marketplace.tasks.close_usage_billing',
+        'schedule': 60 * 60,
+    },
+    'refresh-homepage-snapshot': {
+        'task': 'api.tasks.refresh_homepage_snapshot',
+        'schedule': config('HOMEPAGE_REFRESH_SECONDS', default=30, cast=int),
+    },
+}
+
+# Monthly transaction partitions on PostgreSQL (see marketplace/partitions.py).
+# Archiving is off until TRANSACTION_ARCHIVE_AFTER_MONTHS is set; archives go
+# to STORAGES['transaction_archive'] if defined, else TRANSACTION_ARCHIVE_DIR.
+TRANSACTION_PARTITIONS_AHEAD = config('TRANSACTION_PARTITIONS_AHEAD', default=3, cast=int)
+TRANSACTION_ARCHIVE_AFTER_MONTHS = config('TRANSACTION_ARCHIVE_AFTER_MONTHS', default=0, cast=int)
+TRANSACTION_ARCHIVE_DIR = config('TRANSACTION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+
+# Pay-per-use billing (see marketplace/usage.py): a month is closed this many
+# hours after it ends, so late usage events are still billed
+USAGE_BILLING_GRACE_HOURS = config('USAGE_BILLING_GRACE_HOURS', default=6, cast=int)
+USAGE_BILLING_BATCH_SIZE = config('USAGE_BILLING_BATCH_SIZE', default=5000, cast=int)
+
+# Audit log (see marketplace/audit.py): entries are written in one insert
+# per commit, split into inserts of at most this many rows. Saves outside
+# atomic() are buffered until this many are queued or the request ends
+AUDIT_BATCH_SIZE = config('AUDIT_BATCH_SIZE', default=500, cast=int)
+
+# Review spam (see marketplace/review_spam.py): clusters of this many
+# near-identical reviews are flagged as duplicates, and this many reviews
+# without a purchase from one reviewer, or for one agent, within
+# REVIEW_BURST_HOURS are flagged as an unverified burst
+REVIEW_DUPLICATE_CLUSTER_SIZE = config('REVIEW_DUPLICATE_CLUSTER_SIZE', default=3, cast=int)
+REVIEW_BURST_COUNT = config('REVIEW_BURST_COUNT', default=5, cast=int)
+REVIEW_BURST_HOURS = config('REVIEW_BURST_HOURS', default=24, cast=int)
+
+# Transaction anomaly scoring (see marketplace/security.py): buyers and
+# sellers whose features sit this many robust z-scores above the median of
+# everyone active alongside them are queued as fraud flags
+FRAUD_SCORE_THRESHOLD = config('FRAUD_SCORE_THRESHOLD', default=6.0, cast=float)
+FRAUD_LOOKBACK_DAYS = config('FRAUD_LOOKBACK_DAYS', default=7, cast=int)
+FRAUD_BURST_SECONDS = config('FRAUD_BURST_SECONDS', default=300, cast=int)
+
+# Trending scores (see marketplace/trending.py): each event adds its weight,
+# which halves every TRENDING_HALF_LIFE_HOURS. Run rebuild_trending after
+# changing the half-life or the weights.
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=48, cast=float)
+TRENDING_LOOKBACK_DAYS = config('TRENDING_LOOKBACK_DAYS', default=14, cast=int)
+TRENDING_MIN_SCORE = config('TRENDING_MIN_SCORE', default=1.0, cast=float)
+TRENDING_WEIGHTS = {
+    'purchase': 1.0,
+    'subscription_start': 1.0,
+    'subscription_renewal': 0.25,
+    'usage': 0.1,
+    'review': 0.5,  # scaled by rating / 5
+}
+
+# The homepage is served from a snapshot (see api/homepage.py), checked every
+# HOMEPAGE_REFRESH_SECONDS and rebuilt after catalog, review or trending
+# changes, or at the latest once it is this many seconds old
+HOMEPAGE_SNAPSHOT_MAX_AGE = config('HOMEPAGE_SNAPSHOT_MAX_AGE', default=300, cast=int)
+
+# Django REST framework
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CatalogPagination',
+    'PAGE_SIZE': 20,
+}
+
+# Serve catalog reads with the native async views in api/async_views.py.
+# Only worth it under ASGI (autra/asgi.py); WSGI would wrap each in an event loop.
+CATALOG_ASYNC_VIEWS = config('CATALOG_ASYNC_VIEWS', default=False, cast=bool)
+
 # We'll create a custom User model
 AUTH_USER_MODEL = 'users.User'
 # Default primary key field type
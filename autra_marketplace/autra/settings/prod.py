@@ -17,9 +17,35 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Keep connections open between requests instead of reconnecting
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Behind PgBouncer in transaction mode, server-side cursors can't survive
+# between transactions, so .iterator() falls back to client-side chunks
+if config('DB_POOLER', default='') == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas: DB_REPLICA_HOSTS=replica1:5432,replica2:5432
+for index, address in enumerate(config('DB_REPLICA_HOSTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])):
+    host, _, port = address.partition(':')
+    DATABASES[f'replica_{index + 1}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Tests see replicas as the test database instead of creating copies
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Shared cache tier lives in Redis so all workers see the same entries
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': config('CACHE_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379/1')),
+}
+
 # Security settings for production
 SECURE_SSL_REDIRECT = True  # Force HTTPS
 SESSION_COOKIE_SECURE = True  # Secure cookies
@@ -0,0 +1,6 @@
+"""URL configuration for API-only workers (ENVIRONMENT=api)"""
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/', include('api.urls')),
+]
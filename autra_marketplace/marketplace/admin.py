@@ -3,13 +3,30 @@ from django.contrib import admin
 # Register your models here.
 # marketplace/admin.py
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Agent, AgentVersion, Transaction, Review
+
+from autra.audit import AuditActorAdminMixin
+
+from .exports import iter_csv_lines
+from .models import (
+    Agent,
+    AgentVersion,
+    ArchivedPartition,
+    AuditEntry,
+    FraudFlag,
+    Payout,
+    Review,
+    Subscription,
+    Transaction,
+    UsageBillingRun,
+)
 
 @admin.register(Agent)
-class AgentAdmin(admin.ModelAdmin):
+class AgentAdmin(AuditActorAdminMixin, admin.ModelAdmin):
     list_display = [
         'name',
         'developer_link',
@@ -188,10 +205,22 @@ class TransactionAdmin(admin.ModelAdmin):
         'created_at',
         'completed_at'
     ]
+    actions = ['export_as_csv']
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related('agent', 'buyer', 'seller')
+    
+    @admin.action(description='Export selected transactions to CSV')
+    def export_as_csv(self, request, queryset):
+        # Streamed straight from a server-side cursor, so "select all" on a
+        # huge changelist doesn't load the whole table into the worker
+        response = StreamingHttpResponse(
+            iter_csv_lines(queryset),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
 
 
 @admin.register(Review)
@@ -209,6 +238,8 @@ class ReviewAdmin(admin.ModelAdmin):
         'rating',
         'verified_purchase',
         'reported',
+        'fingerprint__duplicate',
+        'fingerprint__unverified_burst',
         'created_at'
     ]
     search_fields = [
@@ -240,10 +271,212 @@ class AgentVersionAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'is_stable',
+        'is_prerelease',
         'release_date'
     ]
     search_fields = [
         'agent__name',
         'version_number',
         'changelog'
-    ]
\ No newline at end of file
+    ]
+
+
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = [
+        'agent',
+        'buyer',
+        'billing_period',
+        'price',
+        'status',
+        'next_renewal_at'
+    ]
+    list_filter = [
+        'status',
+        'billing_period'
+    ]
+    search_fields = [
+        'agent__name',
+        'buyer__username',
+        'stripe_subscription_id'
+    ]
+    readonly_fields = [
+        'started_at',
+        'cancelled_at'
+    ]
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('agent', 'buyer')
+
+
+@admin.register(Payout)
+class PayoutAdmin(admin.ModelAdmin):
+    list_display = [
+        'seller',
+        'period_start',
+        'period_end',
+        'net_amount',
+        'transaction_count',
+        'status',
+        'paid_at'
+    ]
+    list_filter = [
+        'status',
+        'period_end'
+    ]
+    search_fields = [
+        'seller__username',
+        'stripe_transfer_id'
+    ]
+    readonly_fields = [
+        'gross_earnings',
+        'refunds',
+        'carried_in',
+        'net_amount',
+        'transaction_count',
+        'carried_to',
+        'created_at',
+        'paid_at'
+    ]
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('seller')
+
+
+@admin.register(ArchivedPartition)
+class ArchivedPartitionAdmin(admin.ModelAdmin):
+    """Read-only record of archived transaction months; see transaction_partitions"""
+    list_display = [
+        'table_name',
+        'range_start',
+        'range_end',
+        'row_count',
+        'size_bytes',
+        'file',
+        'archived_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UsageBillingRun)
+class UsageBillingRunAdmin(admin.ModelAdmin):
+    """Read-only record of monthly usage closes; see close_usage_billing"""
+    list_display = [
+        'period_start',
+        'status',
+        'transaction_count',
+        'amount_billed',
+        'started_at',
+        'completed_at'
+    ]
+    list_filter = [
+        'status'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FraudFlag)
+class FraudFlagAdmin(admin.ModelAdmin):
+    """Review queue for marketplace.security; open flags sort most suspicious first"""
+    list_display = [
+        'user',
+        'kind',
+        'score',
+        'status',
+        'window_end',
+        'reviewed_by'
+    ]
+    list_filter = [
+        'status',
+        'kind',
+        'created_at'
+    ]
+    search_fields = [
+        'user__username',
+        'user__email'
+    ]
+    readonly_fields = [
+        'kind',
+        'user',
+        'score',
+        'reasons',
+        'transaction_ids',
+        'window_start',
+        'window_end',
+        'reviewed_by',
+        'reviewed_at',
+        'created_at'
+    ]
+    actions = ['mark_confirmed', 'mark_dismissed']
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('user', 'reviewed_by')
+    
+    def save_model(self, request, obj, form, change):
+        if 'status' in form.changed_data:
+            obj.reviewed_by = request.user
+            obj.reviewed_at = timezone.now()
+        super().save_model(request, obj, form, change)
+    
+    def review(self, request, queryset, status):
+        updated = queryset.update(status=status, reviewed_by=request.user, reviewed_at=timezone.now())
+        self.message_user(request, f'{updated} flag(s) marked {status}')
+    
+    @admin.action(description='Mark selected flags as confirmed fraud')
+    def mark_confirmed(self, request, queryset):
+        self.review(request, queryset, 'confirmed')
+    
+    @admin.action(description='Dismiss selected flags')
+    def mark_dismissed(self, request, queryset):
+        self.review(request, queryset, 'dismissed')
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    """Read-only, append-only history of agent and user changes; see marketplace/audit.py"""
+    list_display = [
+        'created_at',
+        'content_type',
+        'object_id',
+        'actor',
+        'changes'
+    ]
+    list_filter = [
+        'content_type'
+    ]
+    search_fields = [
+        '=object_id',
+        'actor__username'
+    ]
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('content_type', 'actor')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,121 @@
+"""
+Field-level audit log for trust, verification and pricing changes.
+
+Models opt in with the AuditedModel mixin from autra/audit.py and list
+their AUDIT_FIELDS. Loaded values are remembered in from_db(), so after a save the diff is
+worked out in memory. Saves that don't change an audited field, like
+login timestamps or counter updates, cost nothing.
+
+Each save with changes becomes one AuditEntry holding
+{field: [old, new]} for the fields that changed. Values are compared
+after the field's to_python(), so assigning 12 to a price of 10.00
+logs ['10.00', '12'] and assigning '10.00' logs nothing.
+
+Entries are queued only once their transaction commits, so rolled-back
+changes are never logged, and the last one queued by a commit writes
+them all with a single bulk insert straight away. Nothing is written
+while the save itself runs. Saves outside atomic() have committed by the
+time they are recorded; their entries are queued without a write of
+their own and go out with the next flush, or once AUDIT_BATCH_SIZE have
+built up. When the last change recorded in a transaction was rolled back
+to a savepoint, the rest also wait for the next flush: the next commit
+with changes, the end of the request or Celery task, or process exit.
+
+The log is append-only: entries are never updated or deleted. Changes
+made with QuerySet.update() bypass save() and are not logged.
+"""
+
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from autra.audit import audited_values, current_actor
+
+_pending = threading.local()
+
+
+def record_changes(instance, created=False, update_fields=None):
+    """Queue an AuditEntry for the audited fields a save changed (called from post_save)"""
+    from django.contrib.contenttypes.models import ContentType
+
+    from .models import AuditEntry
+
+    loaded = getattr(instance, '_audit_loaded', None)
+    current = audited_values(instance)
+    if created or loaded is None:
+        instance._audit_loaded = current
+        return
+
+    saved = current.keys() if update_fields is None else current.keys() & set(update_fields)
+    changes = {
+        name: [loaded[name], current[name]]
+        for name in sorted(saved)
+        if name in loaded and loaded[name] != current[name]
+    }
+    instance._audit_loaded = {**loaded, **{name: current[name] for name in saved}}
+    if not changes:
+        return
+
+    actor = current_actor()
+    entry = AuditEntry(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        actor_id=actor.pk if actor is not None and actor.is_authenticated else None,
+        changes=changes,
+    )
+    if not transaction.get_connection().in_atomic_block:
+        # Already committed; batch with the rest of the request or task
+        _queue(entry)
+        return
+    _pending.latest = getattr(_pending, 'latest', 0) + 1
+    sequence = _pending.latest
+    transaction.on_commit(lambda: _queue(entry, sequence))
+
+
+def _buffer():
+    if not hasattr(_pending, 'entries'):
+        _pending.entries = []
+    return _pending.entries
+
+
+def _queue(entry, sequence=None):
+    pending = _buffer()
+    pending.append(entry)
+    # Commit hooks run in order: the last entry recorded writes the batch
+    last = sequence is not None and sequence == _pending.latest
+    if last or len(pending) >= settings.AUDIT_BATCH_SIZE:
+        flush_audit_log()
+
+
+def flush_audit_log():
+    """Write this thread's queued entries in one insert; returns how many"""
+    from .models import AuditEntry
+
+    entries, _pending.entries = _buffer(), []
+    if entries:
+        AuditEntry.objects.bulk_create(entries, batch_size=settings.AUDIT_BATCH_SIZE)
+    return len(entries)
+
+
+atexit.register(flush_audit_log)
+
+
+def object_history(instance):
+    """Changes to one agent or user, newest first"""
+    from django.contrib.contenttypes.models import ContentType
+
+    from .models import AuditEntry
+
+    return AuditEntry.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).order_by('-id')
+
+
+def changes_by(user):
+    """Changes credited to one staff member, newest first"""
+    from .models import AuditEntry
+
+    return AuditEntry.objects.filter(actor=user).order_by('-id')
@@ -0,0 +1,222 @@
+"""
+Benchmarks for the hot paths of the marketplace.
+
+Each benchmark is a setup function registered with ``@benchmark``. It gets a
+seeded ``random.Random`` and returns the zero-argument callable that is
+timed. Write paths run inside a transaction that is rolled back, so the
+dataset stays the same from one run to the next. Run them with
+``manage.py run_benchmarks`` after ``manage.py seed_benchmark``.
+"""
+
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import override_settings
+
+from .facets import compute_facet_counts
+from .models import Agent, Review, Transaction
+from .payments import compute_payouts
+from .rankings import top_rated_agents
+
+BENCHMARKS = {}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: object
+    iterations: int
+    description: str
+
+
+def benchmark(name, iterations=30):
+    """Register a benchmark setup function under a name"""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, iterations, (setup.__doc__ or '').strip())
+        return setup
+    return register
+
+
+class Rollback(Exception):
+    pass
+
+
+def rolled_back(func):
+    """Run func inside a transaction and undo whatever it wrote"""
+    def run():
+        try:
+            with transaction.atomic():
+                func()
+                raise Rollback
+        except Rollback:
+            pass
+    return run
+
+
+def api_client():
+    return Client(HTTP_HOST='localhost')
+
+
+def admin_client():
+    user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+    if user is None:
+        raise LookupError('No superuser to load the admin with; run seed_benchmark first')
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    return client
+
+
+def get_ok(client, path, data=None):
+    def run():
+        response = client.get(path, data)
+        if response.status_code != 200:
+            raise AssertionError(f'{path} returned {response.status_code}')
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+    return run
+
+
+@benchmark('catalog_list')
+def catalog_list(rng):
+    """First page of the catalog API, 100 agents with all list fields"""
+    return get_ok(api_client(), '/api/agents/', {'page_size': 100})
+
+
+@benchmark('catalog_deep_page')
+def catalog_deep_page(rng):
+    """A catalog page near the end of the listing"""
+    count = Agent.objects.filter(is_active=True).count()
+    page = max(1, count // 100)
+    return get_ok(api_client(), '/api/agents/', {'page_size': 100, 'page': page})
+
+
+@benchmark('catalog_filtered')
+def catalog_filtered(rng):
+    """Catalog page filtered on two facets"""
+    return get_ok(api_client(), '/api/agents/', {'category': 'coding', 'pricing_model': 'monthly,annual'})
+
+
+@benchmark('facet_counts')
+def facet_counts(rng):
+    """Facet counts for a filtered catalog, computed without the cache"""
+    return lambda: compute_facet_counts({'category': ('coding',)})
+
+
+@benchmark('agent_detail')
+def agent_detail(rng):
+    """Detail page of popular agents, with ratings"""
+    slugs = list(Agent.objects.filter(is_active=True).order_by('-times_hired').values_list('slug', flat=True)[:50])
+    if not slugs:
+        raise LookupError('No active agents')
+    client = api_client()
+    return lambda: get_ok(client, f'/api/agents/{rng.choice(slugs)}/')()
+
+
+@benchmark('search')
+def search(rng):
+    """Agent search through the admin changelist (name, description, developer)"""
+    client = admin_client()
+    terms = ['assistant', 'coder', 'nova', 'support bot', 'bench_1']
+    return lambda: get_ok(client, '/admin/marketplace/agent/', {'q': rng.choice(terms)})()
+
+
+@benchmark('ranking')
+def ranking(rng):
+    """Top 20 agents by reliability, overall and in one category"""
+    def run():
+        list(top_rated_agents('reliability', limit=20))
+        list(top_rated_agents('rating', category='coding', limit=20))
+    return run
+
+
+@benchmark('review_feed')
+def review_feed(rng):
+    """First page of the review feed for the most reviewed agent"""
+    agent = Agent.objects.order_by('-total_reviews').values_list('slug', flat=True).first()
+    if agent is None:
+        raise LookupError('No agents')
+    return get_ok(api_client(), f'/api/agents/{agent}/reviews/')
+
+
+@benchmark('rating_update', iterations=100)
+def rating_update(rng):
+    """Edit one review's scores, updating the agent's rating summary"""
+    max_id = Review.objects.aggregate(max_id=Max('id'))['max_id']
+    if max_id is None:
+        raise LookupError('No reviews')
+
+    def run():
+        review = Review.objects.filter(id__gte=rng.randint(1, max_id)).order_by('id').first()
+        if review is None:
+            return
+        review.rating = rng.randint(1, 5)
+        review.reliability = rng.choice((None, 1, 2, 3, 4, 5))
+        review.save()
+    return rolled_back(run)
+
+
+@benchmark('settlement', iterations=5)
+def settlement(rng):
+    """Compute payouts for every seller in the latest month with transactions"""
+    latest = Transaction.objects.aggregate(latest=Max('created_at'))['latest']
+    if latest is None:
+        raise LookupError('No transactions')
+    period_start = latest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    period_end = (period_start + timedelta(days=32)).replace(day=1)
+    return rolled_back(lambda: compute_payouts(period_start, period_end))
+
+
+@benchmark('admin_agent_changelist')
+def admin_agent_changelist(rng):
+    """Admin agent changelist, first page"""
+    return get_ok(admin_client(), '/admin/marketplace/agent/')
+
+
+@benchmark('admin_transaction_changelist')
+def admin_transaction_changelist(rng):
+    """Admin transaction changelist filtered to completed transactions"""
+    return get_ok(admin_client(), '/admin/marketplace/transaction/', {'status__exact': 'completed'})
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_benchmark(entry, iterations=None, warmup=2, seed=0):
+    """
+    Time one benchmark and return its summary statistics.
+
+    Timings are wall clock in milliseconds; queries is the number of SQL
+    statements a single run issued.
+    """
+    rng = random.Random(seed)
+    func = entry.setup(rng)
+    iterations = iterations or entry.iterations
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    with override_settings(DEBUG=True):
+        for _ in range(iterations):
+            reset_queries()
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(connection.queries)
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': queries,
+    }
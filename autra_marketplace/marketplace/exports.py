@@ -0,0 +1,120 @@
+import csv
+from datetime import datetime, timezone as dt_timezone
+
+from .models import Transaction
+from .utils import batched
+
+# (column name, lookup) pairs; the lookups across relations become JOINs in
+# the same query, so no per-row queries are issued for buyer/seller/agent
+TRANSACTION_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('completed_at', 'completed_at'),
+    ('transaction_type', 'transaction_type'),
+    ('status', 'status'),
+    ('agent_id', 'agent_id'),
+    ('agent_name', 'agent__name'),
+    ('buyer_id', 'buyer_id'),
+    ('buyer_username', 'buyer__username'),
+    ('buyer_company', 'buyer__company_name'),
+    ('seller_id', 'seller_id'),
+    ('seller_username', 'seller__username'),
+    ('seller_company', 'seller__company_name'),
+    ('amount', 'amount'),
+    ('platform_fee', 'platform_fee'),
+    ('seller_earning', 'seller_earning'),
+    ('stripe_payment_intent', 'stripe_payment_intent'),
+)
+
+
+def transactions_for_month(year, month, queryset=None):
+    """Transactions created in the given calendar month (UTC)"""
+    start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    if queryset is None:
+        queryset = Transaction.objects.all()
+    return queryset.filter(created_at__gte=start, created_at__lt=end)
+
+
+def iter_transaction_rows(queryset, chunk_size=5000):
+    """
+    Stream export rows as tuples.
+
+    Uses a server-side cursor on PostgreSQL, so only `chunk_size` rows are
+    held in memory at any time regardless of how large the queryset is.
+    """
+    lookups = [lookup for _, lookup in TRANSACTION_EXPORT_COLUMNS]
+    return (
+        queryset.order_by('pk')
+        .values_list(*lookups)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_lines(queryset, chunk_size=5000):
+    """Yield the export as CSV text, one line at a time (for streaming responses)"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in TRANSACTION_EXPORT_COLUMNS])
+    for row in iter_transaction_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def write_csv(queryset, fh, chunk_size=5000):
+    """Write the export to an open text file; returns the number of rows"""
+    writer = csv.writer(fh)
+    writer.writerow([name for name, _ in TRANSACTION_EXPORT_COLUMNS])
+    count = 0
+    for row in iter_transaction_rows(queryset, chunk_size):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_parquet(queryset, path, chunk_size=50000):
+    """
+    Write the export as Parquet, one row group per chunk.
+
+    Requires pyarrow, which is optional and only needed for this format.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    money = pa.decimal128(10, 2)
+    timestamp = pa.timestamp('us', tz='UTC')
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('created_at', timestamp),
+        ('completed_at', timestamp),
+        ('transaction_type', pa.string()),
+        ('status', pa.string()),
+        ('agent_id', pa.int64()),
+        ('agent_name', pa.string()),
+        ('buyer_id', pa.int64()),
+        ('buyer_username', pa.string()),
+        ('buyer_company', pa.string()),
+        ('seller_id', pa.int64()),
+        ('seller_username', pa.string()),
+        ('seller_company', pa.string()),
+        ('amount', money),
+        ('platform_fee', money),
+        ('seller_earning', money),
+        ('stripe_payment_intent', pa.string()),
+    ])
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in batched(iter_transaction_rows(queryset, chunk_size), chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(chunk)
+    return count
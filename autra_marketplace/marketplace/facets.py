@@ -0,0 +1,149 @@
+"""
+Faceted filtering for the agent catalog.
+
+All facet counts for a filter set come from one GROUP BY over the facet
+columns of the active catalog. That returns one row per distinct
+combination (a few thousand at most, however many agents there are),
+and each facet is counted from those rows with every filter applied
+except its own, so a selected category still shows counts for the
+other categories.
+"""
+
+import hashlib
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+
+from autra.cache import aget_or_compute, get_or_compute
+
+from .models import Agent
+from .utils import FACETS_CACHE_NAMESPACE
+
+FACET_FIELDS = (
+    'category',
+    'pricing_model',
+    'integration_type',
+    'risk_rating',
+    'is_verified',
+    'sandbox_available',
+)
+BOOLEAN_FACETS = {'is_verified', 'sandbox_available'}
+INTEGER_FACETS = {'risk_rating'}
+BOOLEAN_VALUES = {
+    '1': True, 'true': True, 'yes': True,
+    '0': False, 'false': False, 'no': False,
+}
+
+
+def _parse_value(field, raw):
+    if field in BOOLEAN_FACETS:
+        try:
+            return BOOLEAN_VALUES[raw.strip().lower()]
+        except KeyError:
+            raise ValueError(f'{raw!r} is not a boolean') from None
+    value = int(raw) if field in INTEGER_FACETS else raw.strip()
+    # Out-of-range values and unknown choices would each get their own cache entry
+    try:
+        Agent._meta.get_field(field).clean(value, None)
+    except ValidationError:
+        raise ValueError(f'{raw!r} is not a valid {field}') from None
+    return value
+
+
+def normalize_filters(params):
+    """
+    Turn query parameters into a canonical {field: tuple of values} dict.
+
+    Values may be repeated or comma-separated (?category=sales,coding);
+    unknown parameters and values that parse to nothing the column can
+    hold (?risk_rating=high, ?risk_rating=9, ?category=bogus,
+    ?is_verified=maybe) are ignored and values are sorted, so equivalent
+    filter sets share one cache entry.
+    """
+    filters = {}
+    for field in FACET_FIELDS:
+        raw_values = params.getlist(field) if hasattr(params, 'getlist') else [params.get(field)]
+        values = set()
+        for raw in raw_values:
+            for part in (raw or '').split(','):
+                if part.strip():
+                    try:
+                        values.add(_parse_value(field, part))
+                    except ValueError:
+                        continue
+        if values:
+            filters[field] = tuple(sorted(values))
+    return filters
+
+
+def apply_facet_filters(queryset, filters):
+    """Filter a queryset by a normalized filter dict"""
+    for field, values in filters.items():
+        if len(values) == 1:
+            queryset = queryset.filter(**{field: values[0]})
+        else:
+            queryset = queryset.filter(**{f'{field}__in': values})
+    return queryset
+
+
+def _combinations_queryset(queryset=None):
+    if queryset is None:
+        queryset = Agent.objects.filter(is_active=True)
+    return queryset.order_by().values_list(*FACET_FIELDS).annotate(count=Count('id'))
+
+
+def _count_facets(combinations, filters):
+    facets = {field: Counter() for field in FACET_FIELDS}
+    total = 0
+    for row in combinations:
+        *values, count = row
+        misses = [
+            field for field, value in zip(FACET_FIELDS, values)
+            if field in filters and value not in filters[field]
+        ]
+        if not misses:
+            total += count
+        # A row counts towards a facet when only that facet's filter excludes it
+        for field, value in zip(FACET_FIELDS, values):
+            if not misses or misses == [field]:
+                facets[field][value] += count
+
+    return {
+        'total': total,
+        'facets': {
+            field: [
+                {'value': value, 'count': count, 'selected': value in filters.get(field, ())}
+                for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+            ]
+            for field, counter in facets.items()
+        },
+    }
+
+
+def compute_facet_counts(filters, queryset=None):
+    """Facet counts and the filtered total, from a single grouped query"""
+    return _count_facets(_combinations_queryset(queryset), filters)
+
+
+def _cache_key(filters):
+    digest = hashlib.md5(repr(sorted(filters.items())).encode(), usedforsecurity=False).hexdigest()
+    return f'facets:{digest}'
+
+
+def facet_counts(filters, timeout=300):
+    """Cached facet counts for the active catalog, keyed by the normalized filters"""
+    return get_or_compute(
+        _cache_key(filters),
+        lambda: compute_facet_counts(filters),
+        timeout,
+        namespace=FACETS_CACHE_NAMESPACE,
+    )
+
+
+async def afacet_counts(filters, timeout=300):
+    """Async version of facet_counts(), sharing its cache entries"""
+    async def compute():
+        return _count_facets([row async for row in _combinations_queryset()], filters)
+
+    return await aget_or_compute(_cache_key(filters), compute, timeout, namespace=FACETS_CACHE_NAMESPACE)
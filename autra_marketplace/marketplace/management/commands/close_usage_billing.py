@@ -0,0 +1,34 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.usage import close_due_usage_periods, close_usage_period
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f'Months must look like 2025-01, got "{value}"')
+
+
+class Command(BaseCommand):
+    help = 'Turn a month of pay-per-use calls into usage transactions (default: every month that is due)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', metavar='YYYY-MM', help='Close this month, even if it is not due yet')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['month']:
+            runs = [close_usage_period(parse_month(options['month']), batch_size=options['batch_size'])]
+        else:
+            runs = close_due_usage_periods()
+        for run in runs:
+            self.stdout.write(self.style.SUCCESS(
+                f'{run.period_start:%Y-%m}: {run.status}, {run.transaction_count} transactions, '
+                f'£{run.amount_billed}'
+            ))
+        self.stdout.write(f'Done in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,58 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.exports import transactions_for_month, write_csv, write_parquet
+from marketplace.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Stream transactions with buyer, seller and agent names to CSV or Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Calendar month to export as YYYY-MM (default: everything)'
+        )
+        parser.add_argument('--status', help='Only export transactions with this status')
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+        parser.add_argument(
+            '--output', '-o',
+            default='-',
+            help='Output path, or "-" for stdout (CSV only)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        queryset = Transaction.objects.all()
+        if options['month']:
+            try:
+                year, month = (int(part) for part in options['month'].split('-'))
+                queryset = transactions_for_month(year, month, queryset)
+            except ValueError:
+                raise CommandError('--month must look like 2025-01')
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+
+        fmt = options['format']
+        output = options['output']
+        chunk_kwargs = {'chunk_size': options['chunk_size']} if options['chunk_size'] else {}
+        started = time.monotonic()
+
+        if fmt == 'parquet':
+            if output == '-':
+                raise CommandError('Parquet exports need an --output path')
+            try:
+                count = write_parquet(queryset, output, **chunk_kwargs)
+            except ImportError:
+                raise CommandError('Parquet export requires pyarrow (pip install pyarrow)')
+        elif output == '-':
+            count = write_csv(queryset, sys.stdout, **chunk_kwargs)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as fh:
+                count = write_csv(queryset, fh, **chunk_kwargs)
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {count} transactions in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,244 @@
+import csv
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from autra.cache import bump_namespace
+from marketplace.models import Agent, AgentVersion
+from marketplace.utils import (
+    CATALOG_CACHE_NAMESPACE,
+    FACETS_CACHE_NAMESPACE,
+    allocate_unique_slugs,
+    batched,
+    touch_categories,
+)
+from marketplace.versions import refresh_latest_versions
+
+User = get_user_model()
+
+# Columns a partner catalog may set; statistics and slugs are ours to manage
+IMPORTABLE_FIELDS = {
+    'name', 'description', 'short_description', 'category', 'tags',
+    'pricing_model', 'price', 'usage_price', 'free_tier_limit',
+    'api_endpoint', 'documentation_url', 'github_url', 'integration_type',
+    'requirements', 'sandbox_available', 'sandbox_url', 'demo_url',
+    'test_api_key', 'risk_rating', 'compliance_certifications',
+    'average_response_time', 'uptime_percentage', 'rate_limit',
+    'screenshots', 'video_url', 'is_active', 'published_at',
+}
+JSON_FIELDS = {'tags', 'requirements', 'compliance_certifications', 'screenshots', 'versions'}
+BOOLEAN_FIELDS = {'sandbox_available', 'is_active'}
+
+
+class Command(BaseCommand):
+    help = 'Stream agents, their developers and version history from NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or "-" to read from stdin')
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='Input format (default: guessed from the file extension)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        imported = failed = 0
+        started = time.monotonic()
+        try:
+            rows = self.read_rows(stream, fmt)
+            for batch in batched(rows, batch_size):
+                created, errors = self.import_batch(batch)
+                imported += created
+                failed += len(errors)
+                for line_no, message in errors:
+                    self.stderr.write(f'line {line_no}: {message}')
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{imported} imported, {failed} rejected '
+                    f'({(imported + failed) / elapsed:.0f} rows/s)'
+                )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        # bulk_create skips the post_save signals that normally invalidate these
+        if imported:
+            bump_namespace(CATALOG_CACHE_NAMESPACE)
+            bump_namespace(FACETS_CACHE_NAMESPACE)
+            touch_categories(*(category for category, _ in Agent.CATEGORY_CHOICES))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {imported} agents imported, {failed} rows rejected '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
+
+    def read_rows(self, stream, fmt):
+        """Yield (line number, row dict) pairs one at a time"""
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, {k: v for k, v in row.items() if v not in ('', None)}
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_no, {'_error': f'invalid JSON: {exc}'}
+
+    def import_batch(self, batch):
+        """Validate and insert one batch; returns (created count, errors)"""
+        errors = []
+        parsed = []
+        for line_no, row in batch:
+            try:
+                parsed.append((line_no, *self.parse_row(row)))
+            except ValidationError as exc:
+                errors.append((line_no, '; '.join(exc.messages)))
+
+        developers = self.resolve_developers(parsed, errors)
+        now = timezone.now()
+        rows = []
+        for line_no, agent, versions, username, email in parsed:
+            developer = developers.get(username)
+            if developer is None:
+                continue
+            agent.developer = developer
+            if agent.is_active and not agent.published_at:
+                agent.published_at = now
+            rows.append((agent, versions))
+
+        if not rows:
+            return 0, errors
+
+        slugs = allocate_unique_slugs([agent.name for agent, _ in rows])
+        for (agent, _), slug in zip(rows, slugs):
+            agent.slug = slug
+
+        with transaction.atomic():
+            agents = Agent.objects.bulk_create([agent for agent, _ in rows])
+            versions = [
+                AgentVersion(agent=agent, **version)
+                for agent, (_, agent_versions) in zip(agents, rows)
+                for version in agent_versions
+            ]
+            for version in versions:
+                version.set_sort_key()
+            AgentVersion.objects.bulk_create(versions)
+            refresh_latest_versions({version.agent_id for version in versions})
+        return len(agents), errors
+
+    def parse_row(self, row):
+        """Build an unsaved Agent from a row, validating fields without queries"""
+        if '_error' in row:
+            raise ValidationError(row['_error'])
+
+        row = dict(row)
+        # csv.DictReader files cells beyond the header under None
+        if row.pop(None, None):
+            raise ValidationError('more cells than header columns')
+        username = row.pop('developer', None)
+        email = row.pop('developer_email', None)
+        if not username:
+            raise ValidationError('developer is required')
+
+        for field in JSON_FIELDS & row.keys():
+            if isinstance(row[field], str):
+                try:
+                    row[field] = json.loads(row[field])
+                except json.JSONDecodeError:
+                    raise ValidationError(f'{field} is not valid JSON')
+        for field in BOOLEAN_FIELDS & row.keys():
+            if isinstance(row[field], str):
+                row[field] = row[field].strip().lower() in ('1', 'true', 'yes')
+
+        versions = row.pop('versions', None) or []
+        unknown = row.keys() - IMPORTABLE_FIELDS
+        if unknown:
+            raise ValidationError(f'unknown columns: {", ".join(sorted(unknown))}')
+
+        agent = Agent(**row)
+        # Defaults are trusted, so only supplied and required columns are checked
+        defaulted = [
+            field.name for field in Agent._meta.concrete_fields
+            if field.has_default() and field.name not in row
+        ]
+        agent.full_clean(
+            exclude=['slug', 'developer', 'logo', *defaulted],
+            validate_unique=False,
+            validate_constraints=False,
+        )
+
+        seen = set()
+        cleaned_versions = []
+        for version in versions:
+            number = str(version.get('version_number', '')).strip()
+            if not number or number in seen:
+                raise ValidationError(f'missing or duplicate version "{number}"')
+            seen.add(number)
+            cleaned_versions.append({
+                'version_number': number,
+                'changelog': version.get('changelog', ''),
+                'is_stable': bool(version.get('is_stable', True)),
+            })
+        return agent, cleaned_versions, username, email
+
+    def resolve_developers(self, parsed, errors):
+        """Map usernames to developers with one lookup, creating missing ones in bulk"""
+        emails = {}
+        for _, _, _, username, email in parsed:
+            emails[username] = emails.get(username) or email
+        developers = {
+            user.username: user
+            for user in User.objects.filter(username__in=list(emails)).only('id', 'username', 'user_type')
+        }
+
+        missing = [username for username in emails if username not in developers]
+        new_users = [
+            User(
+                username=username,
+                email=emails[username],
+                user_type='developer',
+                password=make_password(None),
+            )
+            for username in missing if emails[username]
+        ]
+        if new_users:
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            developers.update(
+                (user.username, user)
+                for user in User.objects.filter(
+                    username__in=[user.username for user in new_users]
+                ).only('id', 'username', 'user_type')
+            )
+
+        # Never attach agents to an existing buyer or admin account
+        not_developers = {
+            username for username, user in developers.items() if user.user_type != 'developer'
+        }
+        for line_no, _, _, username, email in parsed:
+            if username in not_developers:
+                errors.append((line_no, f'user "{username}" is not a developer'))
+            elif username not in developers:
+                reason = 'could not be created' if email else 'not found and no developer_email given'
+                errors.append((line_no, f'developer "{username}" {reason}'))
+        return {
+            username: user for username, user in developers.items() if username not in not_developers
+        }
@@ -0,0 +1,118 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, migrations
+from django.db.migrations.loader import MigrationLoader
+
+from autra.online_migrations import lint_migration
+
+
+class Command(BaseCommand):
+    help = 'Report migration operations that would lock large tables (by default: unapplied migrations)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='?')
+        parser.add_argument('migration_name', nargs='?', help='Name or unique prefix of one migration')
+        parser.add_argument('--all', action='store_true', help='Lint every migration, applied or not')
+        parser.add_argument('--since', metavar='REF',
+                            help='Lint migration files added since a git revision (no database needed)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--fail-on-warning', action='store_true')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        from_database = not (options['all'] or options['since'] or options['migration_name'])
+        loader = MigrationLoader(connection if from_database else None, ignore_no_migrations=True)
+        targets = self.targets(loader, options)
+
+        # Unapplied (or newly added) migrations deploy together, so tables created
+        # by one of them are still empty when the next one runs
+        deploy_batch = not (options['all'] or options['migration_name'])
+        errors = warnings = 0
+        fresh = set()
+        for key in targets:
+            migration = loader.graph.nodes[key]
+            state = loader.project_state(key, at_end=False)
+            findings = lint_migration(migration, state, fresh, connection)
+            if deploy_batch:
+                fresh.update(
+                    (migration.app_label, operation.name_lower)
+                    for operation in migration.operations
+                    if isinstance(operation, migrations.CreateModel)
+                )
+            if not findings:
+                continue
+            self.stdout.write(f'{key[0]}.{key[1]}')
+            for finding in findings:
+                style = self.style.ERROR if finding.level == 'error' else self.style.WARNING
+                self.stdout.write(f'  {style(finding.level)} [{finding.code}] {finding.operation}: {finding.message}')
+                errors += finding.level == 'error'
+                warnings += finding.level == 'warning'
+
+        self.stdout.write(f'{len(targets)} migration(s) checked: {errors} error(s), {warnings} warning(s)')
+        if errors or (warnings and options['fail_on_warning']):
+            raise CommandError(
+                'Unsafe migration operations found; list intentional ones in the migration\'s lint_ignore'
+            )
+
+    def targets(self, loader, options):
+        """Migration keys to lint, in the order they would be applied"""
+        plan = []
+        for leaf in sorted(loader.graph.leaf_nodes()):
+            plan.extend(key for key in loader.graph.forwards_plan(leaf) if key not in plan)
+
+        if options['migration_name']:
+            if not options['app_label']:
+                raise CommandError('Give the app label along with the migration name')
+            try:
+                migration = loader.get_migration_by_prefix(options['app_label'], options['migration_name'])
+            except (KeyError, ValueError) as exc:
+                raise CommandError(str(exc).strip('"\''))
+            return [(migration.app_label, migration.name)]
+
+        # Only our own apps: third-party migrations are not ours to rewrite
+        project_dir = Path(settings.BASE_DIR).parent.resolve()
+        local_apps = {
+            config.label for config in apps.get_app_configs()
+            if Path(config.path).resolve().is_relative_to(project_dir)
+        }
+        if options['app_label']:
+            if options['app_label'] not in local_apps:
+                raise CommandError(f'No local app with label "{options["app_label"]}"')
+            local_apps = {options['app_label']}
+        plan = [key for key in plan if key[0] in local_apps]
+
+        if options['since']:
+            added = self.files_added_since(options['since'], project_dir)
+            return [key for key in plan if self.migration_path(loader, key) in added]
+        if options['all']:
+            return plan
+        return [key for key in plan if key not in loader.applied_migrations]
+
+    @staticmethod
+    def migration_path(loader, key):
+        return Path(sys.modules[loader.graph.nodes[key].__module__].__file__).resolve()
+
+    @staticmethod
+    def files_added_since(revision, project_dir):
+        try:
+            toplevel = subprocess.run(
+                ['git', 'rev-parse', '--show-toplevel'],
+                cwd=project_dir, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+            # Committed since the revision, plus anything not committed yet
+            changed = subprocess.run(
+                ['git', 'diff', '--name-only', '--diff-filter=A', revision, '--', '*/migrations/*.py'],
+                cwd=project_dir, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            untracked = subprocess.run(
+                ['git', 'ls-files', '--others', '--exclude-standard', '--', '*/migrations/*.py'],
+                cwd=toplevel, capture_output=True, text=True, check=True,
+            ).stdout.split()
+        except subprocess.CalledProcessError as exc:
+            raise CommandError(f'git failed: {exc.stderr.strip()}')
+        return {(Path(toplevel) / path).resolve() for path in [*changed, *untracked]}
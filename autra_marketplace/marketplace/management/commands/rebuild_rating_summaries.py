@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.reviews import rebuild_rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-agent review summaries from the review table'
+
+    def handle(self, *args, **options):
+        written = rebuild_rating_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rating summaries'))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from marketplace.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores from recent transactions and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TRENDING_LOOKBACK_DAYS,
+                            help='How much history to score')
+
+    def handle(self, *args, **options):
+        written = rebuild_trending(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt trending scores for {written} agents'))
@@ -0,0 +1,123 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from marketplace.benchmarks import BENCHMARKS, run_benchmark
+from marketplace.models import Agent, Review, Transaction
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Time the marketplace hot paths and compare against a previous run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+        parser.add_argument('--iterations', type=int, help='Override every benchmark\'s iteration count')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the configured caches (default: measure uncached paths)')
+        parser.add_argument('--output', help='Where to write the results JSON '
+                            '(default: benchmark-results/<timestamp>-<revision>.json)')
+        parser.add_argument('--compare', help='Results JSON of a previous run to compare against')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Median slowdown, in percent, reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for entry in BENCHMARKS.values():
+                self.stdout.write(f'{entry.name:<30} {entry.description}')
+            return
+
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+        selected = [BENCHMARKS[name] for name in options['names'] or BENCHMARKS]
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as handle:
+                baseline = json.load(handle)['results']
+
+        results = {}
+        self.stdout.write(
+            f'{"benchmark":<30} {"median ms":>10} {"p95 ms":>9} {"queries":>8} {"vs base":>9}'
+        )
+        with override_settings(CACHES=settings.CACHES if options['warm_cache'] else NO_CACHE):
+            for entry in selected:
+                try:
+                    result = run_benchmark(entry, options['iterations'], seed=options['seed'])
+                except LookupError as exc:
+                    self.stderr.write(f'{entry.name:<30} skipped: {exc}')
+                    continue
+                results[entry.name] = result
+                self.stdout.write(
+                    f'{entry.name:<30} {result["median_ms"]:>10.2f} {result["p95_ms"]:>9.2f} '
+                    f'{result["queries"]:>8} {self.delta(result, baseline, entry.name):>9}'
+                )
+
+        path = Path(options['output'] or self.default_output())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'warm_cache': options['warm_cache'],
+            'dataset': {
+                'agents': Agent.objects.count(),
+                'transactions': Transaction.objects.count(),
+                'reviews': Review.objects.count(),
+            },
+            'results': results,
+        }, indent=2))
+        self.stdout.write(f'Results written to {path}')
+
+        if baseline is not None:
+            regressions = [
+                name for name, result in results.items()
+                if name in baseline and self.change(result, baseline[name]) > options['threshold']
+            ]
+            if regressions:
+                message = f'Slower than baseline by more than {options["threshold"]}%: {", ".join(regressions)}'
+                if options['fail_on_regression']:
+                    raise CommandError(message)
+                self.stdout.write(self.style.WARNING(message))
+            else:
+                self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def default_output(self):
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        return Path('benchmark-results') / f'{stamp}-{git_revision() or "norev"}.json'
+
+    @staticmethod
+    def change(result, previous):
+        """Percentage change of the median against a previous result"""
+        if not previous['median_ms']:
+            return 0.0
+        return (result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100
+
+    def delta(self, result, baseline, name):
+        if not baseline or name not in baseline:
+            return '-'
+        return f'{self.change(result, baseline[name]):+.1f}%'
@@ -0,0 +1,47 @@
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from marketplace.payments import compute_payouts, send_pending_payouts
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f'Dates must look like 2025-01-31, got "{value}"')
+
+
+class Command(BaseCommand):
+    help = 'Compute developer payouts for a period and optionally send them via Stripe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day of the period (default: start of last month)')
+        parser.add_argument('--end', help='Day after the period ends (default: start of this month)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--send',
+            action='store_true',
+            help='Transfer pending payouts to connected Stripe accounts afterwards'
+        )
+
+    def handle(self, *args, **options):
+        this_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        last_month = (this_month - timedelta(days=1)).replace(day=1)
+        start = parse_date(options['start']) if options['start'] else last_month
+        end = parse_date(options['end']) if options['end'] else this_month
+        if start >= end:
+            raise CommandError('--start must be before --end')
+
+        started = time.monotonic()
+        sellers = compute_payouts(start, end, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed payouts for {sellers} sellers ({start:%Y-%m-%d} to {end:%Y-%m-%d}) '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
+
+        if options['send']:
+            sent = send_pending_payouts()
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} payouts'))
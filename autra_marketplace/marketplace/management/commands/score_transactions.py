@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace.security import score_new_transactions, score_window
+
+
+class Command(BaseCommand):
+    help = 'Score transactions for fraud and anomalies and queue suspicious buyers and sellers for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float,
+                            help='Score the last N hours in one pass instead of resuming from the checkpoint')
+        parser.add_argument('--follow', action='store_true',
+                            help='Keep scoring new transactions as they arrive')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between passes with --follow')
+
+    def handle(self, *args, **options):
+        if options['hours']:
+            end = timezone.now()
+            started = time.monotonic()
+            flagged = score_window(end - timedelta(hours=options['hours']), end)
+            self.stdout.write(self.style.SUCCESS(
+                f'{flagged} new flag(s) in {time.monotonic() - started:.1f}s'
+            ))
+            return
+
+        while True:
+            started = time.monotonic()
+            flagged = score_new_transactions()
+            self.stdout.write(f'{flagged} new flag(s) in {time.monotonic() - started:.1f}s')
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
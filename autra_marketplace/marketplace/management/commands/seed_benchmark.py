@@ -0,0 +1,376 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from autra.cache import bump_namespace
+from marketplace.models import (
+    PLATFORM_FEE_RATE,
+    Agent,
+    AgentRatingSummary,
+    AgentTrend,
+    AgentVersion,
+    Review,
+    ReviewFingerprint,
+    ReviewHelpfulVote,
+    Subscription,
+    Transaction,
+    UsageEvent,
+)
+from marketplace.reviews import rebuild_rating_summaries
+from marketplace.utils import (
+    CATALOG_CACHE_NAMESPACE,
+    FACETS_CACHE_NAMESPACE,
+    RANKINGS_CACHE_NAMESPACE,
+    batched,
+    touch_categories,
+)
+
+User = get_user_model()
+
+# Every generated row is recognisable by these, so --flush never touches real data
+USER_PREFIX = 'bench_'
+AGENT_PREFIX = 'bench-'
+BENCH_PASSWORD = 'bench-password'
+ADMIN_USERNAME = 'bench_admin'
+
+SCALES = {
+    'small': {'users': 10_000, 'agents': 2_000, 'transactions': 100_000, 'reviews': 50_000},
+    'medium': {'users': 200_000, 'agents': 20_000, 'transactions': 2_000_000, 'reviews': 500_000},
+    'large': {'users': 2_000_000, 'agents': 100_000, 'transactions': 10_000_000, 'reviews': 3_000_000},
+}
+
+NAME_WORDS = (
+    'Smart', 'Auto', 'Insight', 'Swift', 'Deep', 'Nova', 'Pilot', 'Sage',
+    'Flow', 'Quantum', 'Echo', 'Atlas', 'Signal', 'Vector', 'Lumen', 'Relay',
+)
+NAME_NOUNS = (
+    'Assistant', 'Analyst', 'Writer', 'Scheduler', 'Coder', 'Researcher',
+    'Tutor', 'Closer', 'Support Bot', 'Summarizer', 'Classifier', 'Agent',
+)
+PRICES = {
+    'one_time': ('19.00', '49.00', '99.00', '249.00'),
+    'monthly': ('9.99', '19.99', '49.00', '99.00'),
+    'annual': ('99.00', '199.00', '499.00'),
+    'usage': ('0.00',),
+    'freemium': ('0.00', '9.99'),
+    'custom': ('0.00',),
+}
+TRANSACTION_TYPES = {
+    'one_time': 'purchase',
+    'monthly': 'subscription_renewal',
+    'annual': 'subscription_renewal',
+    'usage': 'usage',
+    'freemium': 'subscription_renewal',
+    'custom': 'purchase',
+}
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative Zipf weights: rank k is picked with probability ~ 1 / k**exponent"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def raw_delete(queryset):
+    """One DELETE statement: no rows loaded, no cascades, no signals"""
+    return queryset._raw_delete(queryset.db)
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Let bulk_create keep the timestamps we set instead of stamping them with now()"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible, skewed marketplace dataset for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small')
+        parser.add_argument('--users', type=int, help='Override the number of users')
+        parser.add_argument('--agents', type=int, help='Override the number of agents')
+        parser.add_argument('--transactions', type=int, help='Override the number of transactions')
+        parser.add_argument('--reviews', type=int, help='Override the number of reviews')
+        parser.add_argument('--developer-share', type=float, default=0.05,
+                            help='Fraction of users who are developers')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent for agent popularity (0 = uniform)')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread transactions and reviews over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete previously generated benchmark data first')
+
+    def handle(self, *args, **options):
+        counts = {
+            key: options[key] if options[key] is not None else default
+            for key, default in SCALES[options['scale']].items()
+        }
+        developers = max(1, int(counts['users'] * options['developer_share']))
+        if counts['users'] < 2 or developers >= counts['users']:
+            raise CommandError('Need at least one developer and one business user')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(microsecond=0)
+        self.days = max(options['days'], 1)
+
+        if options['flush']:
+            self.flush()
+        elif User.objects.filter(username__startswith=USER_PREFIX).exists():
+            raise CommandError('Benchmark data already exists; pass --flush to regenerate it')
+
+        started = time.monotonic()
+        developer_ids, buyer_ids = self.seed_users(counts['users'], developers)
+        agents = self.seed_agents(counts['agents'], developer_ids, options['skew'])
+        popularity = zipf_cum_weights(len(agents), options['skew'])
+        self.seed_transactions(counts['transactions'], agents, popularity, buyer_ids)
+        self.seed_reviews(counts['reviews'], agents, popularity, buyer_ids)
+        self.refresh_statistics()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {counts} in {time.monotonic() - started:.1f}s '
+            f'(log in to the admin as {ADMIN_USERNAME} / {BENCH_PASSWORD})'
+        ))
+
+    def progress(self, label, done, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{label}: {done} ({done / elapsed:.0f} rows/s)')
+
+    def flush(self):
+        """
+        Remove generated rows.
+
+        Review, Agent and AgentVersion have post_delete receivers, so
+        QuerySet.delete() would load every row and fire them one at a time.
+        Their tables are cleared children first with raw DELETEs instead;
+        refresh_statistics() invalidates the caches once seeding is done.
+        """
+        agents = Agent.objects.filter(slug__startswith=AGENT_PREFIX)
+        reviews = Review.objects.filter(agent__in=agents)
+        raw_delete(ReviewHelpfulVote.objects.filter(review__in=reviews))
+        raw_delete(ReviewFingerprint.objects.filter(review__in=reviews))
+        raw_delete(reviews)
+        for model in (Transaction, Subscription, UsageEvent, AgentRatingSummary, AgentTrend):
+            raw_delete(model.objects.filter(agent__in=agents))
+        agents.update(latest_stable_version=None)
+        raw_delete(AgentVersion.objects.filter(agent__in=agents))
+        raw_delete(agents)
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+    def random_moment(self):
+        # Squared so that recent days are busier than old ones
+        offset = self.days * 86400 * self.rng.random() ** 2
+        return self.now - timedelta(seconds=int(offset))
+
+    def seed_users(self, total, developers):
+        password = make_password(BENCH_PASSWORD)
+        started = time.monotonic()
+        done = 0
+
+        def build(index):
+            is_developer = index < developers
+            return User(
+                username=f'{USER_PREFIX}{index}',
+                email=f'{USER_PREFIX}{index}@example.invalid',
+                password=password,
+                user_type='developer' if is_developer else 'business',
+                company_name='' if is_developer else f'Company {index}',
+                verified=self.rng.random() < 0.3,
+            )
+
+        for batch in batched(map(build, range(total)), self.batch_size):
+            User.objects.bulk_create(batch)
+            done += len(batch)
+            self.progress('users', done, started)
+
+        User.objects.create_superuser(
+            ADMIN_USERNAME, f'{ADMIN_USERNAME}@example.invalid', BENCH_PASSWORD,
+            user_type='business',
+        )
+        rows = User.objects.filter(username__startswith=USER_PREFIX).exclude(
+            username=ADMIN_USERNAME
+        ).values_list('id', 'user_type')
+        developer_ids, buyer_ids = [], []
+        for pk, user_type in rows.iterator(chunk_size=self.batch_size):
+            (developer_ids if user_type == 'developer' else buyer_ids).append(pk)
+        developer_ids.sort()
+        buyer_ids.sort()
+        return developer_ids, buyer_ids
+
+    def seed_agents(self, total, developer_ids, skew):
+        """Agents per developer follow the same long tail as agent popularity"""
+        developer_weights = zipf_cum_weights(len(developer_ids), skew)
+        categories = [choice for choice, _ in Agent.CATEGORY_CHOICES]
+        pricing_models = [choice for choice, _ in Agent.PRICING_MODEL_CHOICES]
+        integrations = [choice for choice, _ in Agent.INTEGRATION_CHOICES]
+        started = time.monotonic()
+        done = 0
+
+        def build(index):
+            pricing_model = self.rng.choices(pricing_models, weights=(3, 5, 2, 3, 2, 1))[0]
+            name = f'{self.rng.choice(NAME_WORDS)} {self.rng.choice(NAME_NOUNS)} {index}'
+            created = self.random_moment()
+            return Agent(
+                name=name,
+                slug=f'{AGENT_PREFIX}{index}',
+                description=f'{name} is a generated agent used for benchmarking. ' * 8,
+                short_description=f'{name}, generated for benchmarks',
+                developer_id=self.rng.choices(developer_ids, cum_weights=developer_weights)[0],
+                category=self.rng.choices(categories, weights=(5, 4, 4, 4, 3, 5, 2, 2, 1))[0],
+                tags=self.rng.sample(('GPT-4', 'Python', 'API', 'RAG', 'Slack', 'CRM', 'SQL'), 3),
+                pricing_model=pricing_model,
+                price=Decimal(self.rng.choice(PRICES[pricing_model])),
+                usage_price=Decimal('0.0100') if pricing_model == 'usage' else None,
+                free_tier_limit=self.rng.choice((0, 0, 100, 1000)),
+                integration_type=self.rng.choices(integrations, weights=(8, 2, 3, 2, 1))[0],
+                sandbox_available=self.rng.random() < 0.4,
+                risk_rating=self.rng.choices((1, 2, 3, 4, 5), weights=(2, 4, 5, 2, 1))[0],
+                tested_by_platform=self.rng.random() < 0.2,
+                is_verified=self.rng.random() < 0.25,
+                is_featured=self.rng.random() < 0.02,
+                is_active=self.rng.random() < 0.95,
+                created_at=created,
+                updated_at=created,
+                published_at=created,
+            )
+
+        with explicit_timestamps(Agent, 'created_at', 'updated_at'):
+            for batch in batched(map(build, range(total)), self.batch_size):
+                Agent.objects.bulk_create(batch)
+                done += len(batch)
+                self.progress('agents', done, started)
+
+        agents = list(
+            Agent.objects.filter(slug__startswith=AGENT_PREFIX)
+            .values_list('id', 'developer_id', 'pricing_model', 'price')
+            .order_by('id')
+        )
+        # Popularity rank is independent of creation order
+        self.rng.shuffle(agents)
+        return agents
+
+    def seed_transactions(self, total, agents, popularity, buyer_ids):
+        started = time.monotonic()
+        done = 0
+
+        def build(_):
+            agent_id, seller_id, pricing_model, price = self.rng.choices(agents, cum_weights=popularity)[0]
+            amount = price if price else Decimal(self.rng.randint(1, 5000)) / 100
+            fee = (amount * PLATFORM_FEE_RATE).quantize(Decimal('0.01'))
+            roll = self.rng.random()
+            if roll < 0.02:
+                transaction_type, status = 'refund', 'completed'
+            else:
+                transaction_type = TRANSACTION_TYPES[pricing_model]
+                status = 'completed' if roll < 0.93 else self.rng.choice(('pending', 'failed'))
+            created = self.random_moment()
+            return Transaction(
+                agent_id=agent_id,
+                buyer_id=self.rng.choice(buyer_ids),
+                seller_id=seller_id,
+                amount=amount,
+                platform_fee=fee,
+                seller_earning=amount - fee,
+                transaction_type=transaction_type,
+                status=status,
+                created_at=created,
+                completed_at=created if status == 'completed' else None,
+            )
+
+        with explicit_timestamps(Transaction, 'created_at'):
+            for batch in batched(map(build, range(total)), self.batch_size):
+                Transaction.objects.bulk_create(batch)
+                done += len(batch)
+                self.progress('transactions', done, started)
+
+    def seed_reviews(self, total, agents, popularity, buyer_ids):
+        """Popular agents collect most reviews; each buyer reviews an agent at most once"""
+        total = min(total, len(agents) * len(buyer_ids))
+        seen = set()
+        started = time.monotonic()
+        done = 0
+
+        def sub_rating(rating):
+            # Sub-ratings are optional and track the overall rating loosely
+            if self.rng.random() < 0.4:
+                return None
+            return min(5, max(1, rating + self.rng.choice((-1, 0, 0, 1))))
+
+        def build():
+            while len(seen) < total:
+                agent_id = self.rng.choices(agents, cum_weights=popularity)[0][0]
+                reviewer_id = self.rng.choice(buyer_ids)
+                if (agent_id, reviewer_id) in seen:
+                    continue
+                seen.add((agent_id, reviewer_id))
+                rating = self.rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 5, 8))[0]
+                created = self.random_moment()
+                yield Review(
+                    agent_id=agent_id,
+                    reviewer_id=reviewer_id,
+                    rating=rating,
+                    title=f'{rating} stars',
+                    comment='Generated review text for benchmarking. ' * 4,
+                    ease_of_use=sub_rating(rating),
+                    reliability=sub_rating(rating),
+                    support=sub_rating(rating),
+                    value_for_money=sub_rating(rating),
+                    verified_purchase=self.rng.random() < 0.7,
+                    helpful_count=int(self.rng.paretovariate(1.5)) - 1,
+                    reported=self.rng.random() < 0.01,
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        with explicit_timestamps(Review, 'created_at', 'updated_at'):
+            for batch in batched(build(), self.batch_size):
+                Review.objects.bulk_create(batch)
+                done += len(batch)
+                self.progress('reviews', done, started)
+
+    def refresh_statistics(self):
+        """Fill in the counters that signals would have maintained"""
+        self.stdout.write('rating summaries and agent statistics...')
+        agents = Agent.objects.filter(slug__startswith=AGENT_PREFIX)
+        rebuild_rating_summaries(agent_ids=agents.values('id'), batch_size=self.batch_size)
+
+        summary = AgentRatingSummary.objects.filter(agent=OuterRef('pk'))
+        hires = (
+            Transaction.objects.filter(agent=OuterRef('pk'), status='completed')
+            .exclude(transaction_type='refund')
+            .order_by()
+            .values('agent')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        agents.update(
+            average_rating=Coalesce(Subquery(summary.values('rating_avg')), Value(0.0)),
+            total_reviews=Coalesce(Subquery(summary.values('rating_count')), Value(0)),
+            times_hired=Coalesce(Subquery(hires, output_field=IntegerField()), Value(0)),
+        )
+
+        # bulk_create skips the post_save signals that normally invalidate these
+        for namespace in (CATALOG_CACHE_NAMESPACE, FACETS_CACHE_NAMESPACE, RANKINGS_CACHE_NAMESPACE):
+            bump_namespace(namespace)
+        touch_categories(*(choice for choice, _ in Agent.CATEGORY_CHOICES))
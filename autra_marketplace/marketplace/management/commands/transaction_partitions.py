@@ -0,0 +1,89 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from marketplace.models import ArchivedPartition
+from marketplace.partitions import (
+    archive_partition,
+    ensure_partitions,
+    has_unsettled,
+    is_partitioned,
+    list_partitions,
+    partition_sizes,
+    restore_partition,
+)
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f'Months must look like 2025-01, got "{value}"')
+
+
+class Command(BaseCommand):
+    help = 'List, create, archive and restore monthly transaction partitions (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create-ahead', type=int, metavar='MONTHS',
+                            help='Create partitions up to this many months past the current one')
+        parser.add_argument('--archive-before', metavar='YYYY-MM',
+                            help='Archive partitions that end on or before the start of this month')
+        parser.add_argument('--restore', metavar='TABLE', help='Load an archived partition back into the table')
+        parser.add_argument('--dry-run', action='store_true', help='Only show what --archive-before would do')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError(
+                f'The transaction table is not partitioned on this {connection.vendor} database '
+                f'(partitioning needs PostgreSQL and migration marketplace.0007)'
+            )
+
+        if options['create_ahead'] is not None:
+            for name in ensure_partitions(options['create_ahead']):
+                self.stdout.write(f'Created {name}')
+
+        if options['archive_before']:
+            before = parse_month(options['archive_before'])
+            for partition in list_partitions():
+                if partition.end > before:
+                    continue
+                if has_unsettled(partition):
+                    self.stdout.write(self.style.WARNING(f'Skipping {partition.name}: it has unsettled earnings'))
+                elif options['dry_run']:
+                    self.stdout.write(f'Would archive {partition.name}')
+                else:
+                    archive = archive_partition(partition)
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Archived {archive.row_count} rows from {archive.table_name} to {archive.file} '
+                        f'({archive.size_bytes / 1024 / 1024:.1f} MB)'
+                    ))
+
+        if options['restore']:
+            try:
+                archive = ArchivedPartition.objects.get(table_name=options['restore'])
+            except ArchivedPartition.DoesNotExist:
+                raise CommandError(f'No archived partition named {options["restore"]}')
+            restore_partition(archive)
+            self.stdout.write(self.style.SUCCESS(f'Restored {archive.row_count} rows into {archive.table_name}'))
+
+        self.report()
+
+    def report(self):
+        sizes = partition_sizes()
+        self.stdout.write(f'\n{"partition":<40} {"from":<10} {"to":<10} {"~rows":>12} {"MB":>9}')
+        for partition in list_partitions():
+            rows, size = sizes.get(partition.name, (0, 0))
+            start = f'{partition.start:%Y-%m-%d}' if partition.start else '-'
+            self.stdout.write(
+                f'{partition.name:<40} {start:<10} {partition.end:%Y-%m-%d} {rows:>12} {size / 1024 / 1024:>9.1f}'
+            )
+        archives = ArchivedPartition.objects.order_by('range_end')
+        if archives:
+            self.stdout.write(f'\n{"archived":<40} {"to":<10} {"rows":>12} {"MB":>9}  file')
+            for archive in archives:
+                self.stdout.write(
+                    f'{archive.table_name:<40} {archive.range_end:%Y-%m-%d} {archive.row_count:>12} '
+                    f'{archive.size_bytes / 1024 / 1024:>9.1f}  {archive.file}'
+                )
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('gross_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, help_text='Refunded earnings netted out of this payout', max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('carried', 'Carried forward')], default='pending', max_length=20)),
+                ('stripe_transfer_id', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-period_end', 'seller'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='payout',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='marketplace.payout'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('payout__isnull', True), ('status', 'completed')), fields=['created_at'], name='transaction_unpaid_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('payout__isnull', False)), fields=['payout'], name='transaction_payout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(fields=['status', 'period_end'], name='marketplace_status_acf72d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payout',
+            unique_together={('seller', 'period_start', 'period_end')},
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_payouts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billing_period', models.CharField(choices=[('monthly', 'Monthly'), ('annual', 'Annual')], max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, help_text='Price locked in when the subscription started', max_digits=10)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled')], default='active', max_length=20)),
+                ('stripe_subscription_id', models.CharField(blank=True, max_length=255)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('next_renewal_at', models.DateTimeField()),
+                ('cancelled_at', models.DateTimeField(blank=True, null=True)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='marketplace.agent')),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['next_renewal_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'active')), fields=['next_renewal_at'], name='subscription_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('agent', 'buyer'), name='one_active_subscription_per_buyer'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0003_subscriptions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewHelpfulVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted', models.BooleanField(default=False, help_text="Already added to the review's helpful_count?")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(models.F('agent'), models.OrderBy(models.F('helpful_count'), descending=True), models.OrderBy(models.F('created_at'), descending=True), models.OrderBy(models.F('id'), descending=True), condition=models.Q(('reported', False)), name='review_feed_idx'),
+        ),
+        migrations.AddField(
+            model_name='reviewhelpfulvote',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='helpful_votes', to='marketplace.review'),
+        ),
+        migrations.AddField(
+            model_name='reviewhelpfulvote',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='helpful_votes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='reviewhelpfulvote',
+            index=models.Index(condition=models.Q(('counted', False)), fields=['id'], name='helpful_vote_pending_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewhelpfulvote',
+            unique_together={('review', 'user')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:14
+
+import django.db.models.deletion
+import marketplace.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0004_review_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentRatingSummary',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='marketplace.agent')),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_avg', models.FloatField(blank=True, null=True)),
+                ('ease_of_use_count', models.IntegerField(default=0)),
+                ('ease_of_use_sum', models.IntegerField(default=0)),
+                ('ease_of_use_avg', models.FloatField(blank=True, null=True)),
+                ('reliability_count', models.IntegerField(default=0)),
+                ('reliability_sum', models.IntegerField(default=0)),
+                ('reliability_avg', models.FloatField(blank=True, null=True)),
+                ('support_count', models.IntegerField(default=0)),
+                ('support_sum', models.IntegerField(default=0)),
+                ('support_avg', models.FloatField(blank=True, null=True)),
+                ('value_for_money_count', models.IntegerField(default=0)),
+                ('value_for_money_sum', models.IntegerField(default=0)),
+                ('value_for_money_avg', models.FloatField(blank=True, null=True)),
+                ('histograms', models.JSONField(default=marketplace.models.empty_histograms, help_text='Counts of 1-5 star scores per dimension, e.g. {"rating": [0, 1, 4, 9, 20]}')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rating_avg'], name='summary_rating_avg_idx'), models.Index(fields=['-ease_of_use_avg'], name='summary_ease_avg_idx'), models.Index(fields=['-reliability_avg'], name='summary_reliability_avg_idx'), models.Index(fields=['-support_avg'], name='summary_support_avg_idx'), models.Index(fields=['-value_for_money_avg'], name='summary_value_avg_idx')],
+            },
+        ),
+    ]
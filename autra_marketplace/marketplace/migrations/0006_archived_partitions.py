@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_rating_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=63, unique=True)),
+                ('range_start', models.DateTimeField(blank=True, help_text='Empty for the partition holding everything from before partitioning', null=True)),
+                ('range_end', models.DateTimeField()),
+                ('file', models.CharField(help_text='Gzipped CSV in the transaction archive storage', max_length=255)),
+                ('row_count', models.BigIntegerField()),
+                ('size_bytes', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-range_end'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:44
+
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+def partition_transactions(apps, schema_editor):
+    # Raw SQL on the table only, so the live module is safe to use here
+    from marketplace.partitions import convert_to_partitioned
+    convert_to_partitioned(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0006_archived_partitions'),
+    ]
+
+    operations = [
+        # Monthly partitions on PostgreSQL; a no-op elsewhere. Reversing
+        # leaves the table partitioned, which the model works with as is.
+        migrations.RunPython(partition_transactions, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['-created_at'], name='transaction_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The review index is built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0007_partition_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentTrend',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='marketplace.agent')),
+                ('log_score', models.FloatField(help_text='ln of the summed event weights decayed forward to TRENDING_EPOCH')),
+                ('last_event_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agenttrend',
+            index=models.Index(fields=['-log_score'], name='trend_log_score_idx'),
+        ),
+    ]
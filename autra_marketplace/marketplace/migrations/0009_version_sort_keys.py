@@ -0,0 +1,102 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:53
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+# Frozen copy of marketplace.versions.version_key as of this migration
+VERSION_RE = re.compile(
+    r'^[vV]?(\d{1,10})(?:\.(\d{1,10}))?(?:\.(\d{1,10}))?'
+    r'(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$'
+)
+
+
+def version_key(number):
+    match = VERSION_RE.match(number.strip())
+    if match is None:
+        return None, False
+    major, minor, patch, prerelease = match.groups()
+    key = f'{int(major):010d}{int(minor or 0):010d}{int(patch or 0):010d}{0 if prerelease else 1}'
+    return key, bool(prerelease)
+
+
+def backfill_sort_keys(apps, schema_editor):
+    AgentVersion = apps.get_model('marketplace', 'AgentVersion')
+    batch_size = settings.MIGRATION_BACKFILL_BATCH_SIZE
+    last_pk = 0
+    while True:
+        versions = list(
+            AgentVersion.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'version_number')[:batch_size]
+        )
+        if not versions:
+            break
+        for version in versions:
+            version.sort_key, version.is_prerelease = version_key(version.version_number)
+        with transaction.atomic():
+            AgentVersion.objects.bulk_update(versions, ['sort_key', 'is_prerelease'])
+        last_pk = versions[-1].pk
+
+
+def backfill_latest_versions(apps, schema_editor):
+    Agent = apps.get_model('marketplace', 'Agent')
+    AgentVersion = apps.get_model('marketplace', 'AgentVersion')
+    latest = models.Subquery(
+        AgentVersion.objects.filter(
+            agent=models.OuterRef('pk'),
+            is_stable=True,
+            is_prerelease=False,
+            sort_key__isnull=False,
+        ).order_by('-sort_key', '-release_date').values('pk')[:1]
+    )
+    batch_size = settings.MIGRATION_BACKFILL_BATCH_SIZE
+    last_pk = 0
+    while True:
+        pks = list(Agent.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            Agent.objects.filter(pk__in=pks).update(latest_stable_version=latest)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Backfills run in batches and the indexes are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0008_agent_trends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='latest_stable_version',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.agentversion'),
+        ),
+        migrations.AddField(
+            model_name='agentversion',
+            name='is_prerelease',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='agentversion',
+            name='sort_key',
+            field=models.CharField(blank=True, editable=False, help_text="Sortable semver key; empty if version_number isn't semver-like", max_length=31, null=True),
+        ),
+        migrations.RunPython(backfill_sort_keys, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='agentversion',
+            index=models.Index(fields=['agent', '-sort_key'], name='version_sort_key_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='agent',
+            index=models.Index(fields=['latest_stable_version'], name='agent_latest_version_idx'),
+        ),
+        migrations.RunPython(backfill_latest_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_version_sort_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageBillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(unique=True)),
+                ('period_end', models.DateTimeField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20)),
+                ('last_buyer_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_agent_id', models.BigIntegerField(blank=True, null=True)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('amount_billed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UsageEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calls', models.PositiveIntegerField(default=1)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_events', to='marketplace.agent')),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['occurred_at'], name='usage_event_occurred_idx')],
+            },
+        ),
+    ]
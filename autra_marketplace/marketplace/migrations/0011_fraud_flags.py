@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_usage_billing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudScoringCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FraudFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('buyer', 'Unusual buyer activity'), ('seller', 'Unusual seller activity'), ('self_dealing', 'Linked buyer and seller')], max_length=20)),
+                ('score', models.FloatField(help_text='Largest robust z-score among the features')),
+                ('reasons', models.JSONField(default=dict, help_text='Features that tripped the flag, e.g. {"burst": {"value": 14, "z": 9.2}}')),
+                ('transaction_ids', models.JSONField(default=list, help_text='Sample of the transactions behind the flag')),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('confirmed', 'Confirmed fraud'), ('dismissed', 'Dismissed')], default='open', max_length=20)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fraud_flags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(condition=models.Q(('status', 'open')), fields=['-score'], name='fraud_flag_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='fraudflag',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('kind', 'user'), name='one_open_fraud_flag_per_subject'),
+        ),
+    ]
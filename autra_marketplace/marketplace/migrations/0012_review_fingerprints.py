@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0011_fraud_flags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewFingerprint',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='marketplace.review')),
+                ('created_at', models.DateTimeField()),
+                ('simhash', models.BigIntegerField(blank=True, null=True)),
+                ('band_0', models.IntegerField(blank=True, null=True)),
+                ('band_1', models.IntegerField(blank=True, null=True)),
+                ('band_2', models.IntegerField(blank=True, null=True)),
+                ('band_3', models.IntegerField(blank=True, null=True)),
+                ('purchased', models.BooleanField(default=False, help_text='Had the reviewer paid for the agent when the review was checked?')),
+                ('cluster', models.BigIntegerField(blank=True, help_text='Lowest review id among its near duplicates', null=True)),
+                ('duplicate', models.BooleanField(default=False, help_text='Part of a cluster of copy-pasted or templated reviews')),
+                ('unverified_burst', models.BooleanField(default=False, help_text='Part of a burst of reviews from a reviewer, or for an agent, without purchases')),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+                ('agent', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.agent')),
+                ('reviewer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band_0'], name='review_fp_band_0_idx'), models.Index(fields=['band_1'], name='review_fp_band_1_idx'), models.Index(fields=['band_2'], name='review_fp_band_2_idx'), models.Index(fields=['band_3'], name='review_fp_band_3_idx'), models.Index(fields=['cluster'], name='review_fp_cluster_idx'), models.Index(fields=['reviewer', 'created_at'], name='review_fp_reviewer_idx'), models.Index(fields=['agent', 'created_at'], name='review_fp_agent_idx')],
+            },
+        ),
+    ]
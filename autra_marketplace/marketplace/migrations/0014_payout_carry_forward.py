@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0013_audit_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payout',
+            name='carried_in',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Zero or negative balance brought forward from earlier payouts', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='carried_to',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='carried_from', to='marketplace.payout'),
+        ),
+        AddIndexConcurrently(
+            model_name='payout',
+            index=models.Index(condition=models.Q(('carried_to__isnull', True), ('status', 'carried')), fields=['seller'], name='payout_carried_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payout',
+            index=models.Index(condition=models.Q(('carried_to__isnull', False)), fields=['carried_to'], name='payout_carried_to_idx'),
+        ),
+    ]
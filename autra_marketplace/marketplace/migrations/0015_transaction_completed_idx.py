@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0014_payout_carry_forward'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['completed_at'], name='transaction_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from autra.online_migrations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('marketplace', '0015_transaction_completed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='clawback_payout',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clawbacks', to='marketplace.payout'),
+        ),
+        migrations.AlterField(
+            model_name='payout',
+            name='refunds',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Refunded earnings netted out of this payout, including sales refunded after an earlier payout', max_digits=12),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('clawback_payout__isnull', True), ('payout__isnull', False), ('status', 'refunded')), fields=['seller'], name='transaction_clawback_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('clawback_payout__isnull', False)), fields=['clawback_payout'], name='transaction_clawed_by_idx'),
+        ),
+    ]
@@ -3,12 +3,37 @@ from django.db import models
 # Create your models here.
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from decimal import Decimal
 import json
 
-class Agent(models.Model):
+from autra.audit import AuditedModel
+
+from .versions import version_key
+
+PLATFORM_FEE_RATE = Decimal('0.10')
+
+# Review scores aggregated per agent; all but the overall rating are optional
+REVIEW_DIMENSIONS = ('rating', 'ease_of_use', 'reliability', 'support', 'value_for_money')
+
+class Agent(AuditedModel, models.Model):
     """AI Agent listing in the marketplace"""
     
+    # Trust, verification and pricing changes are kept in the audit log
+    AUDIT_FIELDS = (
+        'risk_rating',
+        'tested_by_platform',
+        'is_verified',
+        'is_active',
+        'is_featured',
+        'pricing_model',
+        'price',
+        'usage_price',
+        'free_tier_limit',
+    )
+    
     # Basic Information
     name = models.CharField(
         max_length=200,
@@ -238,17 +263,39 @@ class Agent(models.Model):
         help_text="When the agent went live"
     )
     
+    # Highest stable version, kept current by marketplace.versions. No FK
+    # constraint, so adding the column never had to lock the agent table.
+    latest_stable_version = models.ForeignKey(
+        'AgentVersion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        db_index=False,
+        db_constraint=False
+    )
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['developer', 'is_active']),
             models.Index(fields=['average_rating', '-times_hired']),
+            # Finds the agents to re-point when a version is deleted
+            models.Index(fields=['latest_stable_version'], name='agent_latest_version_idx'),
         ]
         
     def __str__(self):
         return f"{self.name} by {self.developer.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded category so moves can invalidate both listings"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category = instance.__dict__.get('category')
+        return instance
+    
     def save(self, *args, **kwargs):
         """Auto-generate slug and set published date"""
         if not self.slug:
@@ -314,12 +361,37 @@ class AgentVersion(models.Model):
     is_stable = models.BooleanField(default=True)
     release_date = models.DateTimeField(auto_now_add=True)
     
+    # Derived from version_number on save (see marketplace/versions.py)
+    sort_key = models.CharField(
+        max_length=31,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Sortable semver key; empty if version_number isn't semver-like"
+    )
+    is_prerelease = models.BooleanField(default=False, editable=False)
+    
     class Meta:
         ordering = ['-release_date']
         unique_together = ['agent', 'version_number']
+        indexes = [
+            # An agent's versions in semver order, and version range filters
+            models.Index(fields=['agent', '-sort_key'], name='version_sort_key_idx'),
+        ]
     
     def __str__(self):
         return f"{self.agent.name} v{self.version_number}"
+    
+    def save(self, *args, **kwargs):
+        self.set_sort_key()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'version_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'sort_key', 'is_prerelease'}
+        super().save(*args, **kwargs)
+    
+    def set_sort_key(self):
+        """Derive sort_key and is_prerelease from version_number (bulk_create skips save())"""
+        self.sort_key, self.is_prerelease = version_key(self.version_number)
 
 
 class Transaction(models.Model):
@@ -393,22 +465,332 @@ class Transaction(models.Model):
         blank=True
     )
     
+    # Developer payout this earning (or refund) was settled in. Added to
+    # a live table, so the constraint is skipped and the index is built
+    # concurrently (transaction_payout_idx)
+    payout = models.ForeignKey(
+        'Payout',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions',
+        db_index=False,
+        db_constraint=False
+    )
+    
+    # Payout that took back this sale's earning after it was refunded
+    clawback_payout = models.ForeignKey(
+        'Payout',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='clawbacks',
+        db_index=False,
+        db_constraint=False
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first listings read only the latest monthly partitions
+            models.Index(fields=['-created_at'], name='transaction_created_idx'),
+            # Only unsettled earnings are scanned by payout runs
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='completed', payout__isnull=True),
+                name='transaction_unpaid_idx'
+            ),
+            models.Index(
+                fields=['payout'],
+                condition=models.Q(payout__isnull=False),
+                name='transaction_payout_idx'
+            ),
+            # Refunded sales still to be taken back from a payout
+            models.Index(
+                fields=['seller'],
+                condition=models.Q(status='refunded', payout__isnull=False, clawback_payout__isnull=True),
+                name='transaction_clawback_idx'
+            ),
+            models.Index(
+                fields=['clawback_payout'],
+                condition=models.Q(clawback_payout__isnull=False),
+                name='transaction_clawed_by_idx'
+            ),
+            # Trending refreshes read transactions by completion time
+            models.Index(
+                fields=['completed_at'],
+                condition=models.Q(status='completed'),
+                name='transaction_completed_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.buyer.username} - {self.agent.name} - £{self.amount}"
     
+    def save(self, *args, **kwargs):
+        """Stamp completed_at the first time the transaction is saved as completed"""
+        if self.status == 'completed' and self.completed_at is None:
+            self.completed_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'completed_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'completed_at']
+        super().save(*args, **kwargs)
+    
     def calculate_fees(self):
         """Calculate platform fee (10% default)"""
-        self.platform_fee = self.amount * 0.10
+        self.platform_fee = (Decimal(self.amount) * PLATFORM_FEE_RATE).quantize(Decimal('0.01'))
         self.seller_earning = self.amount - self.platform_fee
         
 
+class Subscription(models.Model):
+    """A buyer's recurring subscription to a monthly or annual agent"""
+    agent = models.ForeignKey(
+        Agent,
+        on_delete=models.CASCADE,
+        related_name='subscriptions'
+    )
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='subscriptions'
+    )
+    
+    BILLING_PERIOD_CHOICES = (
+        ('monthly', 'Monthly'),
+        ('annual', 'Annual'),
+    )
+    billing_period = models.CharField(
+        max_length=10,
+        choices=BILLING_PERIOD_CHOICES
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Price locked in when the subscription started"
+    )
+    
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('cancelled', 'Cancelled'),
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='active'
+    )
+    stripe_subscription_id = models.CharField(
+        max_length=255,
+        blank=True
+    )
+    
+    # Timestamps
+    started_at = models.DateTimeField(default=timezone.now)
+    next_renewal_at = models.DateTimeField()
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['next_renewal_at']
+        indexes = [
+            # The renewal scheduler only ever reads active, due rows
+            models.Index(
+                fields=['next_renewal_at'],
+                condition=models.Q(status='active'),
+                name='subscription_due_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['agent', 'buyer'],
+                condition=models.Q(status='active'),
+                name='one_active_subscription_per_buyer'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.buyer.username} - {self.agent.name} ({self.get_billing_period_display()})"
+
+
+class UsageEvent(models.Model):
+    """API calls a buyer made to a pay-per-use agent, billed monthly by marketplace.usage"""
+    agent = models.ForeignKey(
+        Agent,
+        on_delete=models.CASCADE,
+        related_name='usage_events'
+    )
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='usage_events'
+    )
+    calls = models.PositiveIntegerField(default=1)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            # Period close reads one month of events
+            models.Index(fields=['occurred_at'], name='usage_event_occurred_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.buyer_id} called agent {self.agent_id} x{self.calls}"
+
+
+class UsageBillingRun(models.Model):
+    """
+    The close of one month of usage into transactions.
+    
+    Rows are billed in (buyer, agent) order and the last pair billed is
+    saved with each batch, so an interrupted close resumes where it stopped.
+    """
+    period_start = models.DateTimeField(unique=True)
+    period_end = models.DateTimeField()
+    
+    STATUS_CHOICES = (
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='running'
+    )
+    last_buyer_id = models.BigIntegerField(null=True, blank=True)
+    last_agent_id = models.BigIntegerField(null=True, blank=True)
+    
+    # Totals so far
+    transaction_count = models.IntegerField(default=0)
+    amount_billed = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-period_start']
+    
+    def __str__(self):
+        return f"Usage for {self.period_start:%Y-%m} ({self.status})"
+
+
+class Payout(models.Model):
+    """Money owed to a developer for one payout period"""
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='payouts'
+    )
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    
+    # Totals of the linked transactions
+    gross_earnings = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0
+    )
+    refunds = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Refunded earnings netted out of this payout, including sales refunded after an earlier payout"
+    )
+    carried_in = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Zero or negative balance brought forward from earlier payouts"
+    )
+    net_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0
+    )
+    transaction_count = models.IntegerField(default=0)
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('paid', 'Paid'),
+        ('failed', 'Failed'),
+        ('carried', 'Carried forward'),
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    stripe_transfer_id = models.CharField(
+        max_length=255,
+        blank=True
+    )
+    # The later payout a carried balance was netted into
+    carried_to = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='carried_from',
+        db_index=False,
+        db_constraint=False
+    )
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-period_end', 'seller']
+        unique_together = ['seller', 'period_start', 'period_end']
+        indexes = [
+            models.Index(fields=['status', 'period_end']),
+            # Balances waiting to be netted into a seller's next payout
+            models.Index(
+                fields=['seller'],
+                condition=models.Q(status='carried', carried_to__isnull=True),
+                name='payout_carried_idx'
+            ),
+            models.Index(
+                fields=['carried_to'],
+                condition=models.Q(carried_to__isnull=False),
+                name='payout_carried_to_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.seller.username} - £{self.net_amount} ({self.get_status_display()})"
+
+
+class ArchivedPartition(models.Model):
+    """A partition of old transactions moved out of the database into a compressed file"""
+    table_name = models.CharField(max_length=63, unique=True)
+    range_start = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Empty for the partition holding everything from before partitioning"
+    )
+    range_end = models.DateTimeField()
+    file = models.CharField(
+        max_length=255,
+        help_text="Gzipped CSV in the transaction archive storage"
+    )
+    row_count = models.BigIntegerField()
+    size_bytes = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-range_end']
+    
+    def __str__(self):
+        return f"{self.table_name} ({self.row_count} rows)"
+
+
 class Review(models.Model):
     """Reviews and ratings for agents"""
     agent = models.ForeignKey(
@@ -465,6 +847,368 @@ class Review(models.Model):
     class Meta:
         ordering = ['-helpful_count', '-created_at']
         unique_together = ['agent', 'reviewer']
+        indexes = [
+            # Serves an agent's review feed in display order, skipping reported rows
+            models.Index(
+                'agent',
+                models.F('helpful_count').desc(),
+                models.F('created_at').desc(),
+                models.F('id').desc(),
+                condition=models.Q(reported=False),
+                name='review_feed_idx'
+            ),
+            # Trending refreshes read reviews by creation time
+            models.Index(fields=['created_at'], name='review_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.agent.name} - {self.rating}★ by {self.reviewer.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded scores so edits can update the rating summary by delta"""
+        instance = super().from_db(db, field_names, values)
+        loaded = set(REVIEW_DIMENSIONS) <= instance.__dict__.keys()
+        instance._loaded_scores = instance.scores() if loaded else None
+        return instance
+    
+    def scores(self):
+        return {dimension: getattr(self, dimension) for dimension in REVIEW_DIMENSIONS}
+
+
+def empty_histograms():
+    return {dimension: [0] * 5 for dimension in REVIEW_DIMENSIONS}
+
+
+class AgentRatingSummary(models.Model):
+    """
+    Running totals of an agent's review scores, one row per agent.
+
+    Kept up to date on every review write, so sub-score breakdowns and
+    "best reliability" rankings never aggregate the review table. Sub-scores
+    are optional, so each dimension has its own count.
+    """
+    agent = models.OneToOneField(
+        Agent,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary'
+    )
+    
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_avg = models.FloatField(null=True, blank=True)
+    ease_of_use_count = models.IntegerField(default=0)
+    ease_of_use_sum = models.IntegerField(default=0)
+    ease_of_use_avg = models.FloatField(null=True, blank=True)
+    reliability_count = models.IntegerField(default=0)
+    reliability_sum = models.IntegerField(default=0)
+    reliability_avg = models.FloatField(null=True, blank=True)
+    support_count = models.IntegerField(default=0)
+    support_sum = models.IntegerField(default=0)
+    support_avg = models.FloatField(null=True, blank=True)
+    value_for_money_count = models.IntegerField(default=0)
+    value_for_money_sum = models.IntegerField(default=0)
+    value_for_money_avg = models.FloatField(null=True, blank=True)
+    
+    histograms = models.JSONField(
+        default=empty_histograms,
+        help_text='Counts of 1-5 star scores per dimension, e.g. {"rating": [0, 1, 4, 9, 20]}'
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating_avg'], name='summary_rating_avg_idx'),
+            models.Index(fields=['-ease_of_use_avg'], name='summary_ease_avg_idx'),
+            models.Index(fields=['-reliability_avg'], name='summary_reliability_avg_idx'),
+            models.Index(fields=['-support_avg'], name='summary_support_avg_idx'),
+            models.Index(fields=['-value_for_money_avg'], name='summary_value_avg_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Ratings for {self.agent_id}"
+    
+    def apply(self, scores, sign=1):
+        """Add (sign=1) or remove (sign=-1) one review's scores"""
+        for dimension in REVIEW_DIMENSIONS:
+            score = scores.get(dimension)
+            if score is None:
+                continue
+            count = getattr(self, f'{dimension}_count') + sign
+            total = getattr(self, f'{dimension}_sum') + sign * score
+            setattr(self, f'{dimension}_count', count)
+            setattr(self, f'{dimension}_sum', total)
+            setattr(self, f'{dimension}_avg', total / count if count else None)
+            self.histograms.setdefault(dimension, [0] * 5)[score - 1] += sign
+
+
+class ReviewHelpfulVote(models.Model):
+    """One user's "helpful" vote on a review, folded into helpful_count in batches"""
+    review = models.ForeignKey(
+        Review,
+        on_delete=models.CASCADE,
+        related_name='helpful_votes'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='helpful_votes'
+    )
+    counted = models.BooleanField(
+        default=False,
+        help_text="Already added to the review's helpful_count?"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['review', 'user']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(counted=False),
+                name='helpful_vote_pending_idx'
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.agent.name} - {self.rating}★ by {self.reviewer.username}"
\ No newline at end of file
+        return f"{self.user.username} found review {self.review_id} helpful"
+
+
+class ReviewFingerprint(models.Model):
+    """
+    SimHash of a review's text plus what the spam checks found, one row per review.
+
+    The 64-bit simhash is also stored as four 16-bit bands: near duplicates
+    almost always share at least one band exactly, so they are found with
+    indexed equality lookups (see marketplace/review_spam.py). Reviewer, agent and creation time are
+    copied from the review so burst checks never touch the review table.
+    """
+    review = models.OneToOneField(
+        Review,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint'
+    )
+    agent = models.ForeignKey(
+        Agent,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+    reviewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+    created_at = models.DateTimeField()
+    
+    # Null for reviews too short to fingerprint meaningfully
+    simhash = models.BigIntegerField(null=True, blank=True)
+    band_0 = models.IntegerField(null=True, blank=True)
+    band_1 = models.IntegerField(null=True, blank=True)
+    band_2 = models.IntegerField(null=True, blank=True)
+    band_3 = models.IntegerField(null=True, blank=True)
+    
+    # Findings
+    purchased = models.BooleanField(
+        default=False,
+        help_text="Had the reviewer paid for the agent when the review was checked?"
+    )
+    cluster = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Lowest review id among its near duplicates"
+    )
+    duplicate = models.BooleanField(
+        default=False,
+        help_text="Part of a cluster of copy-pasted or templated reviews"
+    )
+    unverified_burst = models.BooleanField(
+        default=False,
+        help_text="Part of a burst of reviews from a reviewer, or for an agent, without purchases"
+    )
+    checked_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Near-duplicate candidates: an exact match on any band
+            models.Index(fields=['band_0'], name='review_fp_band_0_idx'),
+            models.Index(fields=['band_1'], name='review_fp_band_1_idx'),
+            models.Index(fields=['band_2'], name='review_fp_band_2_idx'),
+            models.Index(fields=['band_3'], name='review_fp_band_3_idx'),
+            models.Index(fields=['cluster'], name='review_fp_cluster_idx'),
+            # Burst windows per reviewer and per agent
+            models.Index(fields=['reviewer', 'created_at'], name='review_fp_reviewer_idx'),
+            models.Index(fields=['agent', 'created_at'], name='review_fp_agent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Fingerprint of review {self.review_id}"
+
+
+class AgentTrend(models.Model):
+    """
+    Time-decayed activity score of an agent, maintained by marketplace.trending.
+
+    log_score is the log of the decayed event weights scaled forward to a
+    fixed epoch, so ordering by it ranks agents by current trendiness
+    without rescoring anyone as time passes.
+    """
+    agent = models.OneToOneField(
+        Agent,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend'
+    )
+    log_score = models.FloatField(
+        help_text="ln of the summed event weights decayed forward to TRENDING_EPOCH"
+    )
+    last_event_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-log_score'], name='trend_log_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Trend for {self.agent_id}"
+
+
+class TrendingCheckpoint(models.Model):
+    """How far transactions and reviews have been folded into AgentTrend (a single row)"""
+    processed_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Trending processed until {self.processed_until:%Y-%m-%d %H:%M}"
+
+
+class FraudFlag(models.Model):
+    """A buyer or seller whose transactions look anomalous, queued for review"""
+    KIND_CHOICES = (
+        ('buyer', 'Unusual buyer activity'),
+        ('seller', 'Unusual seller activity'),
+        ('self_dealing', 'Linked buyer and seller'),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='fraud_flags'
+    )
+    score = models.FloatField(help_text="Largest robust z-score among the features")
+    reasons = models.JSONField(
+        default=dict,
+        help_text='Features that tripped the flag, e.g. {"burst": {"value": 14, "z": 9.2}}'
+    )
+    transaction_ids = models.JSONField(
+        default=list,
+        help_text="Sample of the transactions behind the flag"
+    )
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('confirmed', 'Confirmed fraud'),
+        ('dismissed', 'Dismissed'),
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='open'
+    )
+    reviewed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            # The review queue: open flags, most suspicious first
+            models.Index(
+                fields=['-score'],
+                condition=models.Q(status='open'),
+                name='fraud_flag_queue_idx'
+            ),
+        ]
+        constraints = [
+            # A subject stays in the queue once until someone reviews it
+            models.UniqueConstraint(
+                fields=['kind', 'user'],
+                condition=models.Q(status='open'),
+                name='one_open_fraud_flag_per_subject'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.user_id} ({self.score:.1f})"
+
+
+class FraudScoringCheckpoint(models.Model):
+    """How far transactions have been scored by marketplace.security (a single row)"""
+    processed_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Fraud scoring processed until {self.processed_until:%Y-%m-%d %H:%M}"
+
+
+class AuditEntry(models.Model):
+    """
+    One save's changes to an audited agent or user (see marketplace/audit.py).
+
+    Append-only: `changes` maps each changed field to [old, new], and
+    entries are never edited or deleted.
+    """
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.PROTECT,
+        related_name='+',
+        db_index=False
+    )
+    object_id = models.BigIntegerField()
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='audit_entries',
+        db_index=False,
+        help_text="Who made the change, if it was made through the admin"
+    )
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = 'Audit entries'
+        indexes = [
+            # History of one object, newest first
+            models.Index(
+                fields=['content_type', 'object_id', '-id'],
+                name='audit_object_idx'
+            ),
+            # Everything one staff member changed, newest first
+            models.Index(fields=['actor', '-id'], name='audit_actor_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id}: {', '.join(self.changes)}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Audit entries are append-only")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit entries are append-only")
@@ -0,0 +1,400 @@
+"""
+Monthly range partitions of the transaction table (PostgreSQL only).
+
+marketplace_transaction is partitioned BY RANGE (created_at), one partition
+per calendar month (UTC) named marketplace_transaction_pYYYY_MM, so a query
+filtering on created_at only reads the months it covers and newest-first
+listings stop after the latest partitions. The primary key becomes
+(id, created_at), which PostgreSQL requires; Django keeps treating id as
+the key.
+
+Rows from before partitioning stay where they were: the old table is
+renamed to marketplace_transaction_legacy and attached as one partition
+covering everything before the first monthly one, so converting moves no
+data.
+
+maintain_partitions() (daily, from Celery beat) keeps partitions created
+TRANSACTION_PARTITIONS_AHEAD months ahead and, once
+TRANSACTION_ARCHIVE_AFTER_MONTHS is set, archives older ones: each is
+written to gzipped CSV in the archive storage, recorded as an
+ArchivedPartition, detached and dropped. archived_transactions() reads
+archived rows back, and restore_partition() loads a month back into the
+table.
+
+On other databases (SQLite in development) the table stays an ordinary
+table and these functions do nothing.
+"""
+
+import csv
+import gzip
+import hashlib
+import re
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from autra.online_migrations import drop_invalid_index, lock_timeout
+
+from .models import ArchivedPartition, Transaction
+from .payments import AWAITING_CLAWBACK
+
+TABLE = Transaction._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+
+# start is None for the legacy partition, which starts at MINVALUE
+Partition = namedtuple('Partition', 'name start end')
+
+BOUND_RE = re.compile(r"FROM \((MINVALUE|'[^']*')\) TO \('([^']*)'\)")
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing value"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(using=None):
+    using = using or connection
+    if using.vendor != 'postgresql':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Attached partitions, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) '
+            'FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        start = None if match[1] == 'MINVALUE' else parse_datetime(match[1].strip("'"))
+        partitions.append(Partition(name, start, parse_datetime(match[2])))
+    return sorted(partitions, key=lambda partition: partition.end)
+
+
+def partition_sizes():
+    """{partition name: (estimated rows, bytes on disk including indexes)}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, child.reltuples::bigint, pg_total_relation_size(child.oid) '
+            'FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [TABLE],
+        )
+        return {name: (max(rows, 0), size) for name, rows, size in cursor.fetchall()}
+
+
+def create_partition(month):
+    """Create the partition for the month starting at month, if missing"""
+    name = partition_name(month)
+    # Creating a partition briefly locks the whole table; don't queue behind a long query
+    with lock_timeout(connection), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(TABLE)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [month, add_months(month, 1)],
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=None, now=None):
+    """
+    Create monthly partitions from the end of the last one through
+    months_ahead months past the current one. Rows for a month without a
+    partition cannot be inserted, so this fills gaps too. Returns the names
+    created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.TRANSACTION_PARTITIONS_AHEAD
+    current = month_start(now or timezone.now())
+    partitions = list_partitions()
+    month = partitions[-1].end if partitions else current
+    created = []
+    while month <= add_months(current, months_ahead):
+        created.append(create_partition(month))
+        month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(schema_editor):
+    """
+    Turn the plain transaction table into a partitioned one without copying
+    rows or blocking writes for more than a moment. Must run outside a
+    transaction (the migration calling it is atomic = False).
+
+    1. Build a unique index on (id, created_at) concurrently and prove with
+       a validated CHECK that every row is older than the cutover month, so
+       attaching the old table as a partition needs neither an index build
+       nor a table scan.
+    2. In one short transaction: rename the table to _legacy, create the
+       partitioned parent with the same columns, indexes and foreign keys,
+       move the id sequence to it, attach the legacy table for everything
+       before the cutover and create the monthly partitions after it.
+    """
+    using = schema_editor.connection
+    if using.vendor != 'postgresql' or is_partitioned(using):
+        return
+    quote = schema_editor.quote_name
+    cutover = add_months(month_start(timezone.now()), 1)
+    key = f'{LEGACY_TABLE}_key'
+    check = f'{LEGACY_TABLE}_range'
+
+    drop_invalid_index(schema_editor, key)
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {quote(key)} ON {quote(TABLE)} (id, created_at)'
+    )
+    with using.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(%s) AND conname = %s', [TABLE, check])
+        has_check = cursor.fetchone() is not None
+    if not has_check:
+        with lock_timeout(using):
+            schema_editor.execute(
+                f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(check)} CHECK (created_at < %s) NOT VALID',
+                [cutover],
+            )
+    schema_editor.execute(f'ALTER TABLE {quote(TABLE)} VALIDATE CONSTRAINT {quote(check)}')
+
+    with transaction.atomic(using=using.alias), lock_timeout(using), using.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [TABLE]
+        )
+        primary_key = cursor.fetchone()[0]
+        # Definitions to recreate on the parent; unique indexes can't exist
+        # there without created_at, and the table has none besides the key
+        cursor.execute(
+            'SELECT index.relname, pg_get_indexdef(index.oid) '
+            'FROM pg_index JOIN pg_class index ON index.oid = pg_index.indexrelid '
+            'WHERE pg_index.indrelid = to_regclass(%s) AND NOT pg_index.indisunique',
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), "
+            "(SELECT is_identity = 'YES' FROM information_schema.columns "
+            " WHERE table_name = %s AND column_name = 'id')",
+            [TABLE, TABLE],
+        )
+        sequence, identity = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY_TABLE)}')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {quote(name)} RENAME TO {quote(name[:56] + "_legacy")}')
+        # The legacy primary key becomes (id, created_at) to match the parent's
+        cursor.execute(
+            f'ALTER TABLE {quote(LEGACY_TABLE)} DROP CONSTRAINT {quote(primary_key)}, '
+            f'ADD CONSTRAINT {quote(LEGACY_TABLE + "_pkey")} PRIMARY KEY USING INDEX {quote(key)}'
+        )
+
+        # Partitioned tables can't have identity columns, so ids come from a plain sequence
+        if identity:
+            cursor.execute('SELECT nextval(%s)', [sequence])
+            next_id = cursor.fetchone()[0]
+            cursor.execute(f'ALTER TABLE {quote(LEGACY_TABLE)} ALTER COLUMN id DROP IDENTITY')
+            sequence = quote(f'{TABLE}_id_seq')
+            cursor.execute(f'CREATE SEQUENCE {sequence} START WITH {int(next_id)}')
+        else:
+            cursor.execute(f'ALTER TABLE {quote(LEGACY_TABLE)} ALTER COLUMN id DROP DEFAULT')
+
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY_TABLE)} INCLUDING DEFAULTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote(TABLE)}.id')
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+        # Created while the parent has no partitions, so nothing is built or
+        # validated; attaching the legacy table adopts its matching indexes
+        # and foreign keys
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY (id, created_at)')
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(LEGACY_TABLE)} '
+            f'FOR VALUES FROM (MINVALUE) TO (%s)',
+            [cutover],
+        )
+        cursor.execute(f'ALTER TABLE {quote(LEGACY_TABLE)} DROP CONSTRAINT {quote(check)}')
+        ensure_partitions()
+
+
+def archive_storage():
+    """The 'transaction_archive' entry in STORAGES if configured, else TRANSACTION_ARCHIVE_DIR"""
+    if 'transaction_archive' in settings.STORAGES:
+        return storages['transaction_archive']
+    return FileSystemStorage(location=settings.TRANSACTION_ARCHIVE_DIR)
+
+
+def partition_filter(partition):
+    """Q matching the rows a partition holds (lets the planner prune to it)"""
+    condition = Q(created_at__lt=partition.end)
+    if partition.start is not None:
+        condition &= Q(created_at__gte=partition.start)
+    return condition
+
+
+def has_unsettled(partition):
+    """Completed transactions no payout has claimed yet, and refunded sales not yet clawed back, must stay"""
+    return Transaction.objects.filter(
+        Q(status='completed', payout__isnull=True) | AWAITING_CLAWBACK,
+        partition_filter(partition),
+    ).exists()
+
+
+def archive_partition(partition):
+    """
+    Write a partition to gzipped CSV in the archive storage, record it and
+    drop it, all in one transaction: if anything fails the partition stays
+    attached. Writes to the partition are blocked while it is copied.
+    """
+    storage = archive_storage()
+    path = f'transactions/{partition.name}.csv.gz'
+    with transaction.atomic(), tempfile.TemporaryFile() as raw:
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {quote(partition.name)} IN SHARE MODE')
+            cursor.execute(f'SELECT count(*) FROM {quote(partition.name)}')
+            row_count = cursor.fetchone()[0]
+            with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+                cursor.copy_expert(
+                    f'COPY {quote(partition.name)} TO STDOUT WITH (FORMAT csv, HEADER true)', compressed
+                )
+
+        size = raw.tell()
+        raw.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: raw.read(1024 * 1024), b''):
+            digest.update(chunk)
+        raw.seek(0)
+        if storage.exists(path):
+            storage.delete(path)
+        path = storage.save(path, File(raw))
+        try:
+            archive = ArchivedPartition.objects.create(
+                table_name=partition.name,
+                range_start=partition.start,
+                range_end=partition.end,
+                file=path,
+                row_count=row_count,
+                size_bytes=size,
+                sha256=digest.hexdigest(),
+            )
+            with lock_timeout(connection), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition.name)}')
+                cursor.execute(f'DROP TABLE {quote(partition.name)}')
+        except Exception:
+            storage.delete(path)
+            raise
+    return archive
+
+
+def archive_partitions(before):
+    """
+    Archive every partition that ends on or before the given instant,
+    skipping any that still hold unsettled earnings. Returns the archives.
+    """
+    archives = []
+    for partition in list_partitions():
+        if partition.end <= before and not has_unsettled(partition):
+            archives.append(archive_partition(partition))
+    return archives
+
+
+def restore_partition(archive):
+    """
+    Load an archived partition back into the table, e.g. for an audit, and
+    forget the archive. The file is deleted once the restore commits.
+    """
+    storage = archive_storage()
+    start = 'MINVALUE' if archive.range_start is None else '%s'
+    params = ([] if archive.range_start is None else [archive.range_start]) + [archive.range_end]
+    with transaction.atomic():
+        with storage.open(archive.file, 'rb') as raw, gzip.open(raw, 'rt', newline='') as text:
+            # The header names the columns; COPY reads the rest
+            columns = ', '.join(quote(column) for column in next(csv.reader([text.readline()])))
+            with lock_timeout(connection), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {quote(archive.table_name)} PARTITION OF {quote(TABLE)} '
+                    f'FOR VALUES FROM ({start}) TO (%s)',
+                    params,
+                )
+            with connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY {quote(archive.table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)', text)
+        path = archive.file
+        archive.delete()
+        transaction.on_commit(lambda: storage.delete(path))
+
+
+def archived_transactions(start=None, end=None):
+    """
+    Yield unsaved Transaction instances for archived rows created in
+    [start, end), oldest partition first. Relations are only available as
+    ids (agent_id, buyer_id, ...).
+    """
+    archives = ArchivedPartition.objects.order_by('range_end')
+    if start is not None:
+        archives = archives.filter(range_end__gt=start)
+    if end is not None:
+        archives = archives.filter(Q(range_start__isnull=True) | Q(range_start__lt=end))
+    fields = {field.column: field for field in Transaction._meta.concrete_fields}
+    storage = archive_storage()
+
+    for archive in archives:
+        with storage.open(archive.file, 'rb') as raw, gzip.open(raw, 'rt', newline='') as text:
+            for row in csv.DictReader(text):
+                values = {}
+                for column, value in row.items():
+                    field = fields[column]
+                    # COPY writes NULL as an empty field
+                    values[field.attname] = None if value == '' and field.null else field.to_python(value)
+                txn = Transaction(**values)
+                if (start is not None and txn.created_at < start) or (end is not None and txn.created_at >= end):
+                    continue
+                yield txn
+
+
+def maintain_partitions(now=None):
+    """Create upcoming partitions and archive expired ones; returns (created, archived) names"""
+    if not is_partitioned():
+        return [], []
+    created = ensure_partitions(now=now)
+    archived = []
+    if settings.TRANSACTION_ARCHIVE_AFTER_MONTHS:
+        before = add_months(month_start(now or timezone.now()), -settings.TRANSACTION_ARCHIVE_AFTER_MONTHS)
+        archived = [archive.table_name for archive in archive_partitions(before)]
+    return created, archived
@@ -0,0 +1,207 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Payout, Transaction
+from .utils import batched
+
+ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=12, decimal_places=2))
+IS_REFUND = Q(transaction_type='refund')
+# Sales moved to status='refunded' after a payout claimed them; their
+# earning is taken back by the seller's next pending payout
+AWAITING_CLAWBACK = Q(status='refunded', payout__isnull=False, clawback_payout__isnull=True)
+
+
+def unsettled_transactions(period_end):
+    """
+    Completed transactions from before period_end that no payout has claimed yet.
+
+    There is no lower bound: a transaction that completed after its own
+    period's payout was sent is settled by the next open payout instead.
+    transaction_unpaid_idx only holds unsettled rows, so this stays cheap.
+    """
+    return Transaction.objects.filter(
+        status='completed',
+        payout__isnull=True,
+        created_at__lt=period_end,
+    )
+
+
+def sellers_to_settle(period_end):
+    """Ids of sellers with unsettled transactions or refunded sales to claw back"""
+    return (
+        unsettled_transactions(period_end).order_by().values_list('seller_id', flat=True)
+        .union(Transaction.objects.filter(AWAITING_CLAWBACK).order_by().values_list('seller_id', flat=True))
+    )
+
+
+def seller_totals(queryset, group_by='seller_id'):
+    """
+    Per-seller earnings, refunds and row counts in a single GROUP BY query.
+
+    Refund transactions carry the seller_earning being clawed back, so they
+    are summed separately and netted out of the gross.
+    """
+    return (
+        queryset.order_by()
+        .values(group_by)
+        .annotate(
+            gross=Coalesce(Sum('seller_earning', filter=~IS_REFUND), ZERO),
+            refunded=Coalesce(Sum('seller_earning', filter=IS_REFUND), ZERO),
+            count=Count('id'),
+        )
+    )
+
+
+def compute_payouts(period_start, period_end, batch_size=1000):
+    """
+    Create payouts for every seller with unsettled earnings in the period,
+    including late completions from earlier periods, sales refunded after
+    they were settled, and negative balances carried forward from earlier
+    payouts.
+
+    Safe to re-run: payouts are unique per (seller, period), transactions
+    are only claimed while unsettled, and each batch commits on its own, so
+    an interrupted run picks up where it stopped. Returns the number of
+    sellers processed.
+    """
+    processed = 0
+    sellers = sellers_to_settle(period_end)
+    for batch in batched(sellers.iterator(chunk_size=batch_size), batch_size):
+        with transaction.atomic():
+            _settle_batch(batch, period_start, period_end)
+        processed += len(batch)
+    return processed
+
+
+def _settle_batch(seller_ids, period_start, period_end):
+    """Create (or reuse) payouts for these sellers and claim their transactions, clawbacks and carried balances"""
+    Payout.objects.bulk_create(
+        [
+            Payout(seller_id=seller_id, period_start=period_start, period_end=period_end)
+            for seller_id in seller_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+    # Only still-pending payouts may absorb late transactions
+    pending = Payout.objects.filter(
+        seller_id__in=seller_ids,
+        period_start=period_start,
+        period_end=period_end,
+        status='pending',
+    )
+    unsettled_transactions(period_end).filter(
+        seller_id__in=seller_ids
+    ).update(
+        payout=Subquery(pending.filter(seller_id=OuterRef('seller_id')).values('pk')[:1])
+    )
+    # A refunded sale is clawed back once, possibly by the payout that claimed it
+    Transaction.objects.filter(AWAITING_CLAWBACK, seller_id__in=seller_ids).update(
+        clawback_payout=Subquery(pending.filter(seller_id=OuterRef('seller_id')).values('pk')[:1])
+    )
+    clawed_back = dict(
+        Transaction.objects.filter(clawback_payout__in=pending)
+        .order_by()
+        .values('clawback_payout')
+        .annotate(total=Sum('seller_earning'))
+        .values_list('clawback_payout', 'total')
+    )
+    # Earlier payouts that netted to zero or less are paid off from this one
+    Payout.objects.filter(
+        seller_id__in=seller_ids,
+        status='carried',
+        carried_to__isnull=True,
+    ).update(
+        carried_to=Subquery(pending.filter(seller_id=OuterRef('seller_id')).values('pk')[:1])
+    )
+    carried = dict(
+        Payout.objects.filter(carried_to__in=pending)
+        .order_by()
+        .values('carried_to')
+        .annotate(total=Sum('net_amount'))
+        .values_list('carried_to', 'total')
+    )
+
+    # Totals are always derived from the linked rows, so re-runs stay correct
+    linked = {
+        row['payout_id']: row
+        for row in seller_totals(
+            # The upper bound lets PostgreSQL skip later months' partitions
+            Transaction.objects.filter(
+                payout__in=pending,
+                created_at__lt=period_end,
+            ),
+            group_by='payout_id'
+        )
+    }
+    payouts = []
+    for payout in pending.only('pk'):
+        row = linked.get(payout.pk)
+        clawback = clawed_back.get(payout.pk) or Decimal('0.00')
+        if row is None and not clawback:
+            continue
+        payout.gross_earnings = row['gross'] if row else Decimal('0.00')
+        payout.refunds = (row['refunded'] if row else Decimal('0.00')) + clawback
+        payout.carried_in = carried.get(payout.pk) or Decimal('0.00')
+        payout.net_amount = payout.gross_earnings - payout.refunds + payout.carried_in
+        payout.transaction_count = row['count'] if row else 0
+        payouts.append(payout)
+    Payout.objects.bulk_update(
+        payouts,
+        ['gross_earnings', 'refunds', 'carried_in', 'net_amount', 'transaction_count'],
+    )
+
+
+def send_pending_payouts(batch_size=500):
+    """
+    Transfer pending payouts to developers' connected Stripe accounts.
+
+    Each transfer uses the payout id as its idempotency key, so retrying
+    after a crash never pays a developer twice. Failed transfers are
+    retried on every run; their amounts are frozen, because only pending
+    payouts absorb new transactions. Payouts that net to zero or less are
+    marked carried, and their balance is taken off the seller's next
+    payout. Those whose seller has not connected a Stripe account yet stay
+    pending for the next run.
+    """
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+
+    sent = 0
+    payouts = (
+        Payout.objects.filter(status__in=['pending', 'failed'])
+        .select_related('seller')
+        .only('id', 'net_amount', 'seller__stripe_account_id')
+    )
+    for batch in batched(payouts.iterator(chunk_size=batch_size), batch_size):
+        carried = []
+        for payout in batch:
+            account = payout.seller.stripe_account_id
+            if payout.net_amount <= 0:
+                carried.append(payout.pk)
+                continue
+            if not account:
+                continue
+            try:
+                transfer = stripe.Transfer.create(
+                    amount=int(payout.net_amount * 100),
+                    currency='gbp',
+                    destination=account,
+                    idempotency_key=f'payout-{payout.pk}',
+                )
+            except stripe.error.StripeError:
+                Payout.objects.filter(pk=payout.pk).update(status='failed')
+                continue
+            Payout.objects.filter(pk=payout.pk).update(
+                status='paid',
+                stripe_transfer_id=transfer.id,
+                paid_at=timezone.now(),
+            )
+            sent += 1
+        Payout.objects.filter(pk__in=carried).update(status='carried')
+    return sent
@@ -0,0 +1,57 @@
+import math
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Exp
+from django.utils import timezone
+
+from .models import REVIEW_DIMENSIONS, Agent
+from .trending import log_offset
+
+
+def top_rated_agents(dimension='rating', category=None, min_reviews=3, limit=20):
+    """
+    Active agents with the best average score on one review dimension.
+
+    Reads the precomputed rating summaries, so no reviews are scanned.
+    Agents need at least `min_reviews` scores on that dimension to appear.
+    """
+    if dimension not in REVIEW_DIMENSIONS:
+        raise ValueError(f'Unknown review dimension: {dimension}')
+
+    queryset = Agent.objects.filter(
+        is_active=True,
+        **{f'rating_summary__{dimension}_count__gte': min_reviews}
+    )
+    if category:
+        queryset = queryset.filter(category=category)
+    return queryset.select_related('developer').order_by(
+        F(f'rating_summary__{dimension}_avg').desc(nulls_last=True),
+        F(f'rating_summary__{dimension}_count').desc(),
+    ).annotate(
+        score=F(f'rating_summary__{dimension}_avg'),
+        score_count=F(f'rating_summary__{dimension}_count'),
+    )[:limit]
+
+
+
+def trending_agents(category=None, limit=20):
+    """
+    Active agents with the most recent activity, hottest first.
+
+    Reads the decayed scores kept by marketplace.trending, so ordering is a
+    walk down the log_score index. `score` is the agent's activity right
+    now, roughly one per recent purchase; agents below TRENDING_MIN_SCORE
+    are left out.
+    """
+    offset = log_offset(timezone.now())
+    queryset = Agent.objects.filter(
+        is_active=True,
+        trend__log_score__gte=offset + math.log(settings.TRENDING_MIN_SCORE),
+    )
+    if category:
+        queryset = queryset.filter(category=category)
+    return queryset.select_related('developer').order_by('-trend__log_score').annotate(
+        score=Exp(F('trend__log_score') - offset),
+        last_event_at=F('trend__last_event_at'),
+    )[:limit]
@@ -0,0 +1,335 @@
+"""
+Review spam detection: near-duplicate text and unverified review bursts.
+
+A review's title and comment are fingerprinted with a 64-bit SimHash of
+their words. Copy-pasted reviews get the same fingerprint, templated ones
+with a word or two swapped land a few bits apart, and unrelated reviews
+are a dozen or more bits apart. Each fingerprint is also stored as four
+16-bit bands, and only reviews that agree exactly on a band are compared
+bit by bit, so candidates come from indexed equality lookups. Pairs up to
+3 bits apart always share a band; at MAX_DISTANCE (6) bits about two in
+three still do, and clusters link up through any of their members. Near
+duplicates are grouped into clusters, and every review in a cluster of
+REVIEW_DUPLICATE_CLUSTER_SIZE or more is flagged as a duplicate.
+
+Reviews are also checked against the reviewer's transactions. A reviewer
+posting REVIEW_BURST_COUNT reviews within REVIEW_BURST_HOURS for agents
+they never paid for, or an agent receiving that many such reviews, is
+flagged as an unverified burst.
+
+check_review() runs inline whenever a review is written, for a handful of
+indexed queries. An edit that moves a review out of its cluster
+re-derives that cluster from its remaining members, which may split it or
+clear their flags. Near duplicates written at the same moment can miss each
+other; rebuild_fingerprints() re-derives everything in batch.
+"""
+
+import hashlib
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Review, ReviewFingerprint, Transaction
+from .utils import batched
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+FULL_MASK = (1 << BITS) - 1
+# Reviews at most this many bits apart are near duplicates
+MAX_DISTANCE = 6
+# Words per shingle; single words keep reviews differing in a word or two closest
+SHINGLE_SIZE = 1
+# Shorter reviews ("Great agent, works well") are too generic to fingerprint
+MIN_WORDS = 8
+# A popular template can crowd a band; compare at most this many candidates
+MAX_CANDIDATES = 500
+# Transactions that make a review a paying customer's
+PAID_TYPES = ('purchase', 'subscription_start', 'subscription_renewal', 'usage')
+
+WORD_RE = re.compile(r'\w+')
+SHIFTS = np.arange(BITS, dtype=np.uint64)
+
+
+def shingles(text):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return []
+    return [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text):
+    """64-bit SimHash of the text as a signed integer (for BigIntegerField), or None if too short"""
+    features = Counter(shingles(text))
+    if not features:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big') for feature in features],
+        dtype=np.uint64,
+    )
+    weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    bits = ((hashes[:, None] >> SHIFTS) & np.uint64(1)).astype(np.int64)
+    totals = weights @ (2 * bits - 1)
+    value = sum(1 << int(bit) for bit in np.flatnonzero(totals > 0))
+    return value - (1 << BITS) if value >> (BITS - 1) else value
+
+
+def distance(a, b):
+    """Number of bits in which two simhashes differ"""
+    return ((a ^ b) & FULL_MASK).bit_count()
+
+
+def fingerprint_fields(title, comment):
+    """{'simhash': ..., 'band_0': ..., ...} for a review's text"""
+    value = simhash(f'{title}\n{comment}')
+    fields = {'simhash': value}
+    for band in range(BANDS):
+        fields[f'band_{band}'] = None if value is None else (value & FULL_MASK) >> (band * BAND_BITS) & BAND_MASK
+    return fields
+
+
+def paid_for(reviewer_id, agent_id):
+    return Transaction.objects.filter(
+        buyer_id=reviewer_id,
+        agent_id=agent_id,
+        status='completed',
+        transaction_type__in=PAID_TYPES,
+    ).exists()
+
+
+def near_duplicates(fingerprint):
+    """(review id, cluster) for other reviews within MAX_DISTANCE bits of the fingerprint"""
+    if fingerprint.simhash is None:
+        return []
+    lookup = Q()
+    for band in range(BANDS):
+        lookup |= Q(**{f'band_{band}': getattr(fingerprint, f'band_{band}')})
+    candidates = (
+        ReviewFingerprint.objects.filter(lookup)
+        .exclude(pk=fingerprint.pk)
+        .order_by()
+        .values_list('pk', 'simhash', 'cluster')[:MAX_CANDIDATES]
+    )
+    return [
+        (pk, cluster) for pk, value, cluster in candidates
+        if distance(value, fingerprint.simhash) <= MAX_DISTANCE
+    ]
+
+
+def join_cluster(fingerprint, matches):
+    """Merge the fingerprint, its matches and their clusters; flag the result if big enough"""
+    members = [pk for pk, _ in matches] + [fingerprint.pk]
+    clusters = {cluster for _, cluster in matches if cluster is not None}
+    root = min(members + list(clusters))
+    ReviewFingerprint.objects.filter(Q(pk__in=members) | Q(cluster__in=clusters)).update(cluster=root)
+    fingerprint.cluster = root
+    cluster = ReviewFingerprint.objects.filter(cluster=root)
+    if cluster.count() >= settings.REVIEW_DUPLICATE_CLUSTER_SIZE:
+        cluster.filter(duplicate=False).update(duplicate=True)
+        fingerprint.duplicate = True
+
+
+def recluster(*roots):
+    """Re-derive the clusters and duplicate flags of these clusters' members from their simhashes"""
+    members = dict(ReviewFingerprint.objects.filter(cluster__in=roots).values_list('pk', 'simhash'))
+    clusters = find_clusters(members)
+    sizes = Counter(clusters.values())
+    ReviewFingerprint.objects.bulk_update(
+        [
+            ReviewFingerprint(
+                review_id=pk,
+                cluster=clusters.get(pk),
+                duplicate=sizes[clusters.get(pk)] >= settings.REVIEW_DUPLICATE_CLUSTER_SIZE,
+            )
+            for pk in members
+        ],
+        ['cluster', 'duplicate'],
+    )
+    return clusters, sizes
+
+
+def flag_bursts(fingerprint):
+    """Flag the unpaid reviews by the same reviewer, or for the same agent, in the window ending here"""
+    count = settings.REVIEW_BURST_COUNT
+    since = fingerprint.created_at - timedelta(hours=settings.REVIEW_BURST_HOURS)
+    for field in ('reviewer_id', 'agent_id'):
+        recent = ReviewFingerprint.objects.filter(
+            purchased=False,
+            created_at__gt=since,
+            created_at__lte=fingerprint.created_at,
+            **{field: getattr(fingerprint, field)},
+        )
+        if len(recent.values_list('pk', flat=True)[:count]) >= count:
+            recent.filter(unverified_burst=False).update(unverified_burst=True)
+            fingerprint.unverified_burst = True
+
+
+def check_review(review):
+    """
+    Fingerprint a new or edited review and update the flags around it.
+
+    Edits that leave the fingerprint unchanged return straight away; other
+    edits re-derive the cluster the review was in. Burst checks only run
+    for new reviews: editing the text doesn't change who paid for what.
+    Returns the ReviewFingerprint.
+    """
+    fields = fingerprint_fields(review.title, review.comment)
+    fingerprint = ReviewFingerprint.objects.filter(pk=review.pk).first()
+    created = fingerprint is None
+    if created:
+        fingerprint = ReviewFingerprint(
+            review_id=review.pk,
+            agent_id=review.agent_id,
+            reviewer_id=review.reviewer_id,
+            created_at=review.created_at,
+            purchased=paid_for(review.reviewer_id, review.agent_id),
+        )
+    elif fingerprint.simhash == fields['simhash']:
+        return fingerprint
+
+    previous_cluster = fingerprint.cluster
+    for name, value in fields.items():
+        setattr(fingerprint, name, value)
+    fingerprint.cluster, fingerprint.duplicate = None, False
+    fingerprint.save(force_insert=created)
+    matches = near_duplicates(fingerprint)
+    if matches:
+        join_cluster(fingerprint, matches)
+    if previous_cluster is not None:
+        # Members may only have been linked through the old text
+        clusters, sizes = recluster(*{previous_cluster, fingerprint.cluster} - {None})
+        fingerprint.cluster = clusters.get(fingerprint.pk)
+        fingerprint.duplicate = sizes[fingerprint.cluster] >= settings.REVIEW_DUPLICATE_CLUSTER_SIZE
+    if created and not fingerprint.purchased:
+        flag_bursts(fingerprint)
+    return fingerprint
+
+
+def find_clusters(hashes):
+    """{review id: cluster root} for every review with a near duplicate, from {review id: simhash}"""
+    parent = {}
+
+    def find(pk):
+        while parent.get(pk, pk) != pk:
+            parent[pk] = parent.get(parent[pk], parent[pk])
+            pk = parent[pk]
+        return pk
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    # Identical fingerprints join directly; only distinct values are compared
+    by_value = defaultdict(list)
+    for pk, value in hashes.items():
+        by_value[value].append(pk)
+    for pks in by_value.values():
+        for pk in pks[1:]:
+            union(pks[0], pk)
+
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for value in by_value:
+            buckets[(value & FULL_MASK) >> (band * BAND_BITS) & BAND_MASK].append(value)
+        for values in buckets.values():
+            for i, a in enumerate(values):
+                for b in values[i + 1:]:
+                    if distance(a, b) <= MAX_DISTANCE:
+                        union(by_value[a][0], by_value[b][0])
+
+    roots = {pk: find(pk) for pk in hashes}
+    sizes = Counter(roots.values())
+    return {pk: root for pk, root in roots.items() if sizes[root] > 1}
+
+
+def find_bursts(reviews):
+    """Ids of unpaid reviews in bursts, from (id, reviewer, agent, created_at) tuples"""
+    count = settings.REVIEW_BURST_COUNT
+    window = timedelta(hours=settings.REVIEW_BURST_HOURS)
+    flagged = set()
+    for position in (1, 2):
+        timelines = defaultdict(list)
+        for review in reviews:
+            timelines[review[position]].append((review[3], review[0]))
+        for timeline in timelines.values():
+            if len(timeline) < count:
+                continue
+            timeline.sort()
+            start = 0
+            for end, (moment, _) in enumerate(timeline):
+                while moment - timeline[start][0] >= window:
+                    start += 1
+                if end - start + 1 >= count:
+                    flagged.update(pk for _, pk in timeline[start:end + 1])
+    return flagged
+
+
+def rebuild_fingerprints(batch_size=2000):
+    """
+    Fingerprint every review and recompute clusters and bursts from scratch.
+
+    For backfills, after changing the settings, and to catch near
+    duplicates that check_review() missed because they were written
+    concurrently. Returns (reviews, duplicates, bursts).
+    """
+    paid = Transaction.objects.filter(
+        buyer_id=OuterRef('reviewer_id'),
+        agent_id=OuterRef('agent_id'),
+        status='completed',
+        transaction_type__in=PAID_TYPES,
+    )
+    rows = (
+        Review.objects.annotate(purchased=Exists(paid))
+        .order_by('pk')
+        .values_list('pk', 'agent_id', 'reviewer_id', 'created_at', 'title', 'comment', 'purchased')
+    )
+    hashes, unpaid, total = {}, [], 0
+    for batch in batched(rows.iterator(chunk_size=batch_size), batch_size):
+        fingerprints = []
+        for pk, agent_id, reviewer_id, created_at, title, comment, purchased in batch:
+            fingerprint = ReviewFingerprint(
+                review_id=pk,
+                agent_id=agent_id,
+                reviewer_id=reviewer_id,
+                created_at=created_at,
+                purchased=purchased,
+                **fingerprint_fields(title, comment),
+            )
+            fingerprints.append(fingerprint)
+            if fingerprint.simhash is not None:
+                hashes[pk] = fingerprint.simhash
+            if not purchased:
+                unpaid.append((pk, reviewer_id, agent_id, created_at))
+        ReviewFingerprint.objects.bulk_create(
+            fingerprints,
+            update_conflicts=True,
+            unique_fields=['review'],
+            update_fields=[
+                'simhash', 'band_0', 'band_1', 'band_2', 'band_3', 'purchased',
+                'cluster', 'duplicate', 'unverified_burst', 'checked_at',
+            ],
+        )
+        total += len(fingerprints)
+
+    clusters = find_clusters(hashes)
+    sizes = Counter(clusters.values())
+    bursts = find_bursts(unpaid)
+    flagged = [
+        ReviewFingerprint(
+            review_id=pk,
+            cluster=clusters.get(pk),
+            duplicate=sizes[clusters.get(pk)] >= settings.REVIEW_DUPLICATE_CLUSTER_SIZE,
+            unverified_burst=pk in bursts,
+        )
+        for pk in sorted(clusters.keys() | bursts)
+    ]
+    ReviewFingerprint.objects.bulk_update(
+        flagged, ['cluster', 'duplicate', 'unverified_burst'], batch_size=batch_size
+    )
+    return total, sum(fingerprint.duplicate for fingerprint in flagged), len(bursts)
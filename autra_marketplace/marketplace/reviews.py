@@ -0,0 +1,191 @@
+import base64
+import json
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Field, Func, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+from django.utils.dateparse import parse_datetime
+
+from .models import REVIEW_DIMENSIONS, AgentRatingSummary, Review, ReviewHelpfulVote
+from .utils import batched
+
+FEED_ORDERING = ('-helpful_count', '-created_at', '-id')
+
+
+class RowValue(Func):
+    """A SQL row value, (a, b, c), so several columns compare as one"""
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+def encode_cursor(review):
+    """Opaque cursor pointing just after the given review"""
+    position = [review.helpful_count, review.created_at.isoformat(), review.pk]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (helpful_count, created_at, id), or raise ValueError"""
+    try:
+        helpful_count, created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return int(helpful_count), created_at, int(pk)
+
+
+def _feed_queryset(agent_id, cursor, limit):
+    queryset = Review.objects.filter(agent_id=agent_id, reported=False)
+    if cursor:
+        helpful_count, created_at, pk = decode_cursor(cursor)
+        # A single row comparison is one range condition on review_feed_idx;
+        # the equivalent OR of column comparisons isn't always planned as one
+        queryset = queryset.alias(
+            feed_position=RowValue('helpful_count', 'created_at', 'id'),
+        ).filter(
+            feed_position__lt=RowValue(Value(helpful_count), Value(created_at), Value(pk)),
+        )
+    # One extra row tells us whether there is a next page
+    return queryset.select_related('reviewer').order_by(*FEED_ORDERING)[:limit + 1]
+
+
+def _feed_page(reviews, limit):
+    next_cursor = encode_cursor(reviews[limit - 1]) if len(reviews) > limit else None
+    return reviews[:limit], next_cursor
+
+
+def review_feed(agent_id, cursor=None, limit=20):
+    """
+    One page of an agent's visible reviews, most helpful first.
+
+    Uses keyset pagination over (helpful_count, created_at, id), which the
+    partial review_feed_idx index serves directly: every page costs the
+    same however deep it is, and reported reviews are never read. Returns
+    (reviews, next_cursor), with next_cursor None on the last page.
+    """
+    return _feed_page(list(_feed_queryset(agent_id, cursor, limit)), limit)
+
+
+async def areview_feed(agent_id, cursor=None, limit=20):
+    """Async version of review_feed()"""
+    return _feed_page([review async for review in _feed_queryset(agent_id, cursor, limit)], limit)
+
+
+def record_helpful_vote(review, user):
+    """
+    Record that a user found a review helpful; returns False for repeat votes.
+
+    This is a single insert; helpful_count catches up when the pending
+    votes are folded in by fold_helpful_votes().
+    """
+    _, created = ReviewHelpfulVote.objects.get_or_create(review=review, user=user)
+    return created
+
+
+def fold_helpful_votes(batch_size=5000):
+    """
+    Add pending helpful votes to Review.helpful_count in batches.
+
+    Each batch claims votes with SKIP LOCKED, so concurrent folders never
+    double count, and applies them with a single UPDATE ... CASE across all
+    affected reviews, moving their updated_at so agent pages stop answering
+304 with the old counts. Returns the number of votes folded.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            votes = list(
+                ReviewHelpfulVote.objects.select_for_update(skip_locked=True)
+                .filter(counted=False)
+                .order_by('id')
+                .values_list('id', 'review_id')[:batch_size]
+            )
+            if not votes:
+                return folded
+
+            per_review = Counter(review_id for _, review_id in votes)
+            Review.objects.filter(pk__in=per_review).update(
+                helpful_count=F('helpful_count') + Case(
+                    *[When(pk=review_id, then=Value(count)) for review_id, count in per_review.items()],
+                    default=Value(0),
+                ),
+                # update() skips auto_now; agent page validators read updated_at
+                updated_at=Now(),
+            )
+            ReviewHelpfulVote.objects.filter(pk__in=[pk for pk, _ in votes]).update(counted=True)
+            folded += len(votes)
+
+
+def update_rating_summary(agent_id, old_scores=None, new_scores=None):
+    """
+    Apply one review's change to the agent's rating summary.
+
+    Pass the scores before and after the write (None for a created or
+    deleted review). The summary row is locked while it is updated, so
+    concurrent review writes for the same agent serialize here instead of
+    losing updates. Deletes never create a summary: with no row there is
+    nothing to subtract from.
+    """
+    with transaction.atomic():
+        if new_scores:
+            AgentRatingSummary.objects.get_or_create(agent_id=agent_id)
+        summary = AgentRatingSummary.objects.select_for_update().filter(agent_id=agent_id).first()
+        if summary is None:
+            return
+        if old_scores:
+            summary.apply(old_scores, sign=-1)
+        if new_scores:
+            summary.apply(new_scores, sign=1)
+        summary.save()
+
+
+def rebuild_rating_summaries(agent_ids=None, batch_size=1000):
+    """
+    Recompute rating summaries from the review table.
+
+    One grouped query covers every agent (or just agent_ids); use it to
+    backfill or to repair drift. Returns the number of summaries written.
+    """
+    aggregates = {}
+    for dimension in REVIEW_DIMENSIONS:
+        aggregates[f'{dimension}_count'] = Count(dimension)
+        aggregates[f'{dimension}_sum'] = Coalesce(Sum(dimension), 0)
+        for star in range(1, 6):
+            aggregates[f'{dimension}_{star}'] = Count('id', filter=Q(**{dimension: star}))
+
+    reviews = Review.objects.order_by()
+    stale = AgentRatingSummary.objects.all()
+    if agent_ids is not None:
+        reviews = reviews.filter(agent_id__in=agent_ids)
+        stale = stale.filter(agent_id__in=agent_ids)
+    # Agents whose last review is gone have no row below to overwrite theirs
+    stale.exclude(agent_id__in=Review.objects.values('agent_id')).delete()
+    rows = reviews.values('agent_id').annotate(**aggregates)
+
+    summary_fields = [
+        f'{dimension}_{part}' for dimension in REVIEW_DIMENSIONS for part in ('count', 'sum', 'avg')
+    ] + ['histograms']
+    written = 0
+    for batch in batched(rows.iterator(chunk_size=batch_size), batch_size):
+        summaries = []
+        for row in batch:
+            summary = AgentRatingSummary(agent_id=row['agent_id'], histograms={})
+            for dimension in REVIEW_DIMENSIONS:
+                count = row[f'{dimension}_count']
+                total = row[f'{dimension}_sum']
+                setattr(summary, f'{dimension}_count', count)
+                setattr(summary, f'{dimension}_sum', total)
+                setattr(summary, f'{dimension}_avg', total / count if count else None)
+                summary.histograms[dimension] = [row[f'{dimension}_{star}'] for star in range(1, 6)]
+            summaries.append(summary)
+        AgentRatingSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['agent'],
+            update_fields=summary_fields,
+        )
+        written += len(summaries)
+    return written
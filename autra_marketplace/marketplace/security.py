@@ -0,0 +1,326 @@
+"""
+Anomaly scoring for transactions.
+
+The transactions of a scoring window (an hour, or whatever streamed in
+since the last run, widened to at least FRAUD_CONTEXT) are loaded into
+NumPy arrays, and per-buyer and per-seller features are computed with
+grouped array operations:
+
+- burst: most transactions a buyer made within FRAUD_BURST_SECONDS
+- spend_jump / volume_jump: log of window spend (or a seller's revenue)
+  over what the FRAUD_LOOKBACK_DAYS before it predict for a window this
+  long; buyers without recent history are measured against total_spent
+- refund_rate: refunds per transaction over lookback plus window
+- seller_concentration / buyer_concentration: share of the money going
+  to (or coming from) a single counterparty
+
+Each feature becomes a robust z-score (distance from the median in units
+of the median absolute deviation), so a buyer is compared with everyone
+else active in the same window rather than with fixed limits. Buyers and
+sellers whose largest z-score reaches FRAUD_SCORE_THRESHOLD are queued as
+FraudFlags, as long as they have transactions in the part of the window
+being scored. Transactions where buyer and seller are the same person,
+or share a company name or a non-webmail email domain, are flagged as
+self dealing regardless of score.
+
+Baselines come from GROUP BY queries over the lookback window, restricted
+to the buyers and sellers in the scoring window, so only the window
+itself is pulled into Python.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import FraudFlag, FraudScoringCheckpoint, Transaction
+from .utils import batched
+
+# Score at most this much time per pass when catching up
+MAX_WINDOW = timedelta(hours=1)
+# Features are always computed over at least this much recent activity,
+# so short streaming windows still have a population to compare against
+FRAUD_CONTEXT = timedelta(hours=1)
+# Transactions can commit a little after their created_at
+SETTLE_DELAY = timedelta(seconds=30)
+# Floors for the MAD scale of each feature, in the feature's own units,
+# so a window where everyone looks alike doesn't make tiny deviations huge
+FEATURE_SCALES = {
+    'burst': 1.0,
+    'spend_jump': 0.5,
+    'refund_rate': 0.03,
+    'seller_concentration': 0.1,
+    'volume_jump': 0.5,
+    'buyer_concentration': 0.1,
+}
+# Fewer transactions than this and ratios and shares are not scored
+MIN_SUPPORT = 5
+# Flags keep a sample of the transactions that raised them
+SAMPLE_SIZE = 20
+# Self dealing is queued regardless of statistics, ahead of scored flags
+SELF_DEALING_SCORE = 100.0
+# Shared webmail domains say nothing about who owns an account
+WEBMAIL_DOMAINS = frozenset({
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'hotmail.co.uk', 'live.com',
+    'yahoo.com', 'yahoo.co.uk', 'icloud.com', 'me.com', 'aol.com', 'proton.me', 'protonmail.com',
+})
+
+TRANSACTION_COLUMNS = ('id', 'buyer_id', 'seller_id', 'amount', 'transaction_type', 'created_at')
+
+
+class TransactionWindow:
+    """
+    The transactions created in [start, end) as parallel arrays.
+
+    Rows before `scored_from` are context only: they count towards
+    features but don't get anyone flagged.
+    """
+
+    def __init__(self, start, end, scored_from=None):
+        self.start, self.end = start, end
+        rows = list(
+            Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+            .exclude(status='failed')
+            .order_by()
+            .values_list(*TRANSACTION_COLUMNS)
+        )
+        self.size = len(rows)
+        ids, buyers, sellers, amounts, types, created = zip(*rows) if rows else ((),) * 6
+        self.ids = np.array(ids, dtype=np.int64)
+        self.buyers = np.array(buyers, dtype=np.int64)
+        self.sellers = np.array(sellers, dtype=np.int64)
+        self.amounts = np.array(amounts, dtype=np.float64)
+        self.refunds = np.array([kind == 'refund' for kind in types], dtype=bool)
+        self.seconds = np.array([(moment - start).total_seconds() for moment in created], dtype=np.float64)
+        # Refunds carry the refunded amount; only charges count as spend
+        self.spend = np.where(self.refunds, 0.0, self.amounts)
+        self.scored = self.seconds >= ((scored_from or start) - start).total_seconds()
+
+
+def group(keys):
+    """(unique keys, index of each row's key)"""
+    return np.unique(keys, return_inverse=True)
+
+
+def largest_share(inverse, counterparts, weights, groups):
+    """For each group, the share of its weight going to its largest counterpart"""
+    others, other_inverse = group(counterparts)
+    pairs, pair_inverse = np.unique(inverse * len(others) + other_inverse, return_inverse=True)
+    pair_totals = np.bincount(pair_inverse, weights=weights)
+    largest = np.zeros(groups)
+    np.maximum.at(largest, pairs // len(others), pair_totals)
+    totals = np.bincount(inverse, weights=weights, minlength=groups)
+    return np.divide(largest, totals, out=np.zeros(groups), where=totals > 0)
+
+
+def bursts(inverse, seconds, groups, span):
+    """For each group, the most rows falling within `span` seconds of each other"""
+    order = np.lexsort((seconds, inverse))
+    # One sorted timeline with groups pushed far apart, so searching never crosses groups
+    timeline = inverse[order] * (seconds.max() + span + 1) + seconds[order]
+    reach = np.searchsorted(timeline, timeline + span, side='left') - np.arange(len(timeline))
+    most = np.zeros(groups)
+    np.maximum.at(most, inverse[order], reach)
+    return most
+
+
+def robust_z(values, scale_floor):
+    """Distance from the median in units of the (floored) median absolute deviation"""
+    if not len(values):
+        return values
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    return (values - median) / max(1.4826 * mad, scale_floor)
+
+
+def lookback_totals(field, ids, start, end):
+    """{id: (count, spend, refunds)} per buyer or seller for transactions in [start, end)"""
+    totals = {}
+    for batch in batched(ids.tolist(), 5000):
+        rows = (
+            Transaction.objects.filter(created_at__gte=start, created_at__lt=end, **{f'{field}__in': batch})
+            .exclude(status='failed')
+            .order_by()
+            .values(field)
+            .annotate(
+                count=Count('id'),
+                spend=Sum('amount', filter=~Q(transaction_type='refund')),
+                refunds=Count('id', filter=Q(transaction_type='refund')),
+            )
+        )
+        for row in rows:
+            totals[row[field]] = (row['count'], float(row['spend'] or 0), row['refunds'])
+    return totals
+
+
+def baseline_arrays(field, ids, window):
+    lookback = timedelta(days=settings.FRAUD_LOOKBACK_DAYS)
+    totals = lookback_totals(field, ids, window.start - lookback, window.start)
+    history = np.array([totals.get(pk, (0, 0.0, 0)) for pk in ids.tolist()], dtype=np.float64).reshape(-1, 3)
+    # What the lookback predicts for a window of this length
+    expected = history[:, 1] * ((window.end - window.start) / lookback)
+    return history[:, 0], expected, history[:, 2]
+
+
+def entity_features(window, field, counterpart_field, users):
+    """(ids, row -> id index, {feature: values}, transaction count) for the window's buyers or sellers"""
+    keys = getattr(window, f'{field}s')
+    ids, inverse = group(keys)
+    groups = len(ids)
+    count = np.bincount(inverse, minlength=groups).astype(np.float64)
+    spend = np.bincount(inverse, weights=window.spend, minlength=groups)
+    refunds = np.bincount(inverse, weights=window.refunds, minlength=groups)
+    past_count, expected, past_refunds = baseline_arrays(f'{field}_id', ids, window)
+
+    if field == 'buyer':
+        # Buyers new to the lookback are measured against their lifetime spend rate
+        window_seconds = (window.end - window.start).total_seconds()
+        lifetime = np.array([users.get(pk, (None, 0.0, 0.0))[1] for pk in ids.tolist()])
+        age = np.array([users.get(pk, (None, 0.0, 0.0))[2] for pk in ids.tolist()])
+        expected = np.where(past_count > 0, expected, lifetime * window_seconds / np.maximum(age, window_seconds))
+
+    counterparts = getattr(window, f'{counterpart_field}s')
+    features = {
+        f'{"spend" if field == "buyer" else "volume"}_jump': np.log1p(spend) - np.log1p(expected),
+        'refund_rate': (refunds + past_refunds) / np.maximum(count + past_count, 1),
+        f'{counterpart_field}_concentration': largest_share(inverse, counterparts, window.spend, groups),
+    }
+    if field == 'buyer':
+        features['burst'] = bursts(inverse, window.seconds, groups, settings.FRAUD_BURST_SECONDS)
+    return ids, inverse, features, count + past_count
+
+
+def score_entities(ids, features, support):
+    """(scores, reasons) with reasons listing the features at or above the threshold"""
+    threshold = settings.FRAUD_SCORE_THRESHOLD
+    zscores = {}
+    for name, values in features.items():
+        z = robust_z(values, FEATURE_SCALES[name])
+        if name.endswith(('_rate', '_concentration')):
+            z = np.where(support >= MIN_SUPPORT, z, 0.0)
+        zscores[name] = z
+    stacked = np.vstack(list(zscores.values())) if zscores else np.zeros((1, len(ids)))
+    scores = stacked.max(axis=0)
+    reasons = {}
+    for position in np.flatnonzero(scores >= threshold):
+        reasons[position] = {
+            name: {'value': round(float(features[name][position]), 4), 'z': round(float(z[position]), 2)}
+            for name, z in zscores.items()
+            if z[position] >= threshold
+        }
+    return scores, reasons
+
+
+def load_users(ids):
+    """{id: (link keys, total_spent, account age in seconds)} for the given users"""
+    now = timezone.now()
+    users = {}
+    for batch in batched(sorted(set(ids)), 5000):
+        rows = get_user_model().objects.filter(pk__in=batch).values_list(
+            'id', 'email', 'company_name', 'total_spent', 'date_joined'
+        )
+        for pk, email, company, total_spent, joined in rows:
+            keys = set()
+            domain = email.rpartition('@')[2].lower()
+            if domain and domain not in WEBMAIL_DOMAINS:
+                keys.add(f'domain:{domain}')
+            if company.strip():
+                keys.add(f'company:{company.strip().lower()}')
+            users[pk] = (keys, float(total_spent), (now - joined).total_seconds())
+    return users
+
+
+def linked_transactions(window, users):
+    """{index: why} for one scored transaction per buyer-seller pair that look like the same party"""
+    scored = np.flatnonzero(window.scored)
+    pairs, first = np.unique(
+        np.stack([window.buyers[scored], window.sellers[scored]], axis=1), axis=0, return_index=True
+    )
+    links = {}
+    for (buyer, seller), index in zip(pairs.tolist(), scored[first].tolist()):
+        if buyer == seller:
+            links[index] = 'buyer is the seller'
+            continue
+        shared = users.get(buyer, (set(),))[0] & users.get(seller, (set(),))[0]
+        if shared:
+            links[index] = f'shares {", ".join(sorted(shared))}'
+    return links
+
+
+def sample_ids(window, mask):
+    return window.ids[mask][:SAMPLE_SIZE].tolist()
+
+
+def score_window(start, end):
+    """
+    Score the transactions created in [start, end) and queue flags.
+
+    Returns the number of new flags; a subject that already has an open
+    flag of the same kind is not queued again.
+    """
+    window = TransactionWindow(min(start, end - FRAUD_CONTEXT), end, scored_from=start)
+    if not window.scored.any():
+        return 0
+    users = load_users(np.concatenate([window.buyers, window.sellers]).tolist())
+    flags = []
+
+    for field, counterpart in (('buyer', 'seller'), ('seller', 'buyer')):
+        ids, inverse, features, support = entity_features(window, field, counterpart, users)
+        scores, reasons = score_entities(ids, features, support)
+        active = np.bincount(inverse, weights=window.scored, minlength=len(ids)) > 0
+        for position, found in reasons.items():
+            if not active[position]:
+                continue
+            flags.append(FraudFlag(
+                kind=field,
+                user_id=int(ids[position]),
+                score=round(float(scores[position]), 2),
+                reasons=found,
+                transaction_ids=sample_ids(window, inverse == position),
+                window_start=start,
+                window_end=end,
+            ))
+
+    for index, why in linked_transactions(window, users).items():
+        buyer, seller = int(window.buyers[index]), int(window.sellers[index])
+        pair = (window.buyers == buyer) & (window.sellers == seller)
+        flags.append(FraudFlag(
+            kind='self_dealing',
+            user_id=buyer,
+            score=SELF_DEALING_SCORE,
+            reasons={'seller_id': seller, 'link': why, 'transactions': int(pair.sum())},
+            transaction_ids=sample_ids(window, pair),
+            window_start=start,
+            window_end=end,
+        ))
+
+    before = FraudFlag.objects.filter(status='open').count()
+    FraudFlag.objects.bulk_create(flags, ignore_conflicts=True)
+    return FraudFlag.objects.filter(status='open').count() - before
+
+
+def score_new_transactions(now=None):
+    """
+    Streaming mode: score the transactions created since the previous run.
+
+    The checkpoint row is locked throughout, so overlapping runs queue up
+    instead of scoring a window twice. The first run starts one window
+    back. Returns the number of new flags.
+    """
+    until = (now or timezone.now()) - SETTLE_DELAY
+    flagged = 0
+    with transaction.atomic():
+        FraudScoringCheckpoint.objects.get_or_create(pk=1, defaults={'processed_until': until - MAX_WINDOW})
+        checkpoint = FraudScoringCheckpoint.objects.select_for_update().get(pk=1)
+        start = checkpoint.processed_until
+        while start < until:
+            end = min(start + MAX_WINDOW, until)
+            flagged += score_window(start, end)
+            start = end
+        checkpoint.processed_until = max(checkpoint.processed_until, until)
+        checkpoint.save()
+    return flagged
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from autra.cache import bump_namespace
+
+from .audit import flush_audit_log, record_changes
+from .models import Agent, AgentVersion, Review
+from .review_spam import check_review
+from .reviews import rebuild_rating_summaries, update_rating_summary
+from .versions import update_latest_version
+from .utils import (
+    CATALOG_CACHE_NAMESPACE,
+    RANKINGS_CACHE_NAMESPACE,
+    invalidate_agents,
+    touch_categories,
+)
+
+
+@receiver([post_save, post_delete], sender=Agent)
+def invalidate_agent_caches(sender, instance, **kwargs):
+    """Listings, facet counts, rankings and trending lists all depend on agent rows"""
+    invalidate_agents(instance.category, getattr(instance, '_loaded_category', None))
+
+
+@receiver([post_save, post_delete], sender=AgentVersion)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """Listings show the latest version and filter on ?min_version="""
+    category = Agent.objects.filter(pk=instance.agent_id).values_list('category', flat=True).first()
+
+    def bump():
+        bump_namespace(CATALOG_CACHE_NAMESPACE)
+        touch_categories(category)
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=AgentVersion)
+def update_latest_version_pointer(sender, instance, **kwargs):
+    update_latest_version(instance.agent_id)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_caches(sender, **kwargs):
+    """Review scores feed both the catalog and the rating rankings"""
+    def bump():
+        bump_namespace(CATALOG_CACHE_NAMESPACE)
+        bump_namespace(RANKINGS_CACHE_NAMESPACE)
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Review)
+def update_summary_on_save(sender, instance, created, **kwargs):
+    old_scores = None if created else getattr(instance, '_loaded_scores', None)
+    if not created and old_scores is None:
+        # Loaded with deferred score fields, so there is no delta to apply
+        rebuild_rating_summaries(agent_ids=[instance.agent_id])
+    else:
+        update_rating_summary(instance.agent_id, old_scores, instance.scores())
+    instance._loaded_scores = instance.scores()
+
+
+@receiver(post_save, sender=Review)
+def check_review_spam(sender, instance, update_fields=None, **kwargs):
+    """Fingerprint new and edited reviews; counter updates leave the text alone"""
+    if update_fields is not None and not {'title', 'comment'} & set(update_fields):
+        return
+    check_review(instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_summary_on_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Agent):
+        # Cascading from the agent, whose summary is being deleted too
+        return
+    old_scores = getattr(instance, '_loaded_scores', None) or instance.scores()
+    update_rating_summary(instance.agent_id, old_scores, None)
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def audit_changes(sender, instance, created, update_fields=None, **kwargs):
+    record_changes(instance, created, update_fields)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_developer_agents(sender, instance, created, **kwargs):
+    """Agent listings and details show the developer's display name"""
+    loaded = None if created else getattr(instance, '_loaded_display_name', None)
+    current = instance.loaded_display_name()
+    instance._loaded_display_name = current
+    if loaded is None or loaded == current:
+        return
+    agents = Agent.objects.filter(developer=instance)
+    categories = set(agents.order_by().values_list('category', flat=True).distinct())
+    if categories:
+        # Moves the agents' ETags, which are built from updated_at
+        agents.update(updated_at=timezone.now())
+        invalidate_agents(*categories)
+
+
+@receiver(request_finished)
+def flush_audit_log_after_request(sender, **kwargs):
+    """Write entries still queued: autocommit saves, and those behind a rolled-back last change"""
+    if flush_audit_log():
+        # Connections were already closed or recycled for this request
+        close_old_connections()
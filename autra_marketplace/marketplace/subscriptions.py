@@ -0,0 +1,142 @@
+import calendar
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Agent, Subscription, Transaction
+from .utils import invalidate_agents
+
+
+def add_period(moment, billing_period, periods=1):
+    """Advance a datetime by billing periods, clamping to the month's last day"""
+    months = (12 if billing_period == 'annual' else 1) * periods
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def next_renewal(subscription):
+    """
+    The renewal after the current one, counted from started_at.
+
+    Stepping from the previous renewal would keep a clamped day: Jan 31
+    would renew on Feb 28 and then the 28th forever after.
+    """
+    started, current = subscription.started_at, subscription.next_renewal_at
+    months = (current.year - started.year) * 12 + current.month - started.month
+    periods = months // (12 if subscription.billing_period == 'annual' else 1)
+    return add_period(started, subscription.billing_period, periods + 1)
+
+
+def _billing_transaction(subscription, transaction_type):
+    txn = Transaction(
+        agent_id=subscription.agent_id,
+        buyer_id=subscription.buyer_id,
+        seller_id=subscription.agent.developer_id,
+        amount=subscription.price,
+        transaction_type=transaction_type,
+        stripe_subscription_id=subscription.stripe_subscription_id,
+    )
+    txn.calculate_fees()
+    return txn
+
+
+@transaction.atomic
+def start_subscription(agent, buyer, stripe_subscription_id=''):
+    """Subscribe a buyer to a monthly or annual agent and record the first charge"""
+    if agent.pricing_model not in ('monthly', 'annual'):
+        raise ValueError(f'{agent.name} is not sold as a subscription')
+
+    now = timezone.now()
+    subscription = Subscription.objects.create(
+        agent=agent,
+        buyer=buyer,
+        billing_period=agent.pricing_model,
+        price=agent.price,
+        stripe_subscription_id=stripe_subscription_id,
+        started_at=now,
+        next_renewal_at=add_period(now, agent.pricing_model),
+    )
+    _billing_transaction(subscription, 'subscription_start').save()
+    Agent.objects.filter(pk=agent.pk).update(
+        active_subscriptions=F('active_subscriptions') + 1,
+        times_hired=F('times_hired') + 1,
+        updated_at=now,
+    )
+    # update() skips the Agent signals, and listings show times_hired
+    invalidate_agents(agent.category)
+    return subscription
+
+
+@transaction.atomic
+def cancel_subscription(subscription):
+    """Stop renewing a subscription"""
+    updated = Subscription.objects.filter(pk=subscription.pk, status='active').update(
+        status='cancelled',
+        cancelled_at=timezone.now(),
+    )
+    # Guarded by the status filter, so cancelling twice only decrements once
+    if updated:
+        agent = Agent.objects.filter(pk=subscription.agent_id)
+        agent.update(
+            active_subscriptions=F('active_subscriptions') - 1,
+            updated_at=timezone.now(),
+        )
+        invalidate_agents(agent.values_list('category', flat=True).get())
+    return bool(updated)
+
+
+def renew_due_subscriptions(now=None, batch_size=1000):
+    """
+    Create renewal transactions for every active subscription that is due.
+
+    Due rows are claimed a batch at a time through the partial index on
+    next_renewal_at. Rows are locked with SKIP LOCKED, so several workers
+    can share one renewal window, and each batch commits on its own.
+    Subscriptions that missed several periods are renewed once per period.
+    Returns the number of renewals created.
+    """
+    now = now or timezone.now()
+    renewed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Subscription.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(status='active', next_renewal_at__lte=now)
+                .select_related('agent')
+                .only(
+                    'id', 'agent_id', 'buyer_id', 'price', 'billing_period',
+                    'stripe_subscription_id', 'started_at', 'next_renewal_at', 'agent__developer_id',
+                )
+                .order_by('next_renewal_at')[:batch_size]
+            )
+            if not batch:
+                return renewed
+
+            transactions = []
+            for subscription in batch:
+                transactions.append(
+                    _billing_transaction(subscription, 'subscription_renewal')
+                )
+                subscription.next_renewal_at = next_renewal(subscription)
+            Transaction.objects.bulk_create(transactions)
+            Subscription.objects.bulk_update(batch, ['next_renewal_at'])
+            renewed += len(batch)
+
+
+def resync_active_subscriptions():
+    """Recompute Agent.active_subscriptions for every agent in one UPDATE"""
+    active = (
+        Subscription.objects.filter(agent=OuterRef('pk'), status='active')
+        .order_by()
+        .values('agent')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Agent.objects.update(
+        active_subscriptions=Coalesce(Subquery(active), Value(0))
+    )
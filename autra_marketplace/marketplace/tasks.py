@@ -0,0 +1,53 @@
+from celery import shared_task
+from celery.signals import task_postrun
+
+from .audit import flush_audit_log
+from .partitions import maintain_partitions
+from .reviews import fold_helpful_votes
+from .security import score_new_transactions
+from .subscriptions import renew_due_subscriptions
+from .trending import refresh_trending
+from .usage import close_due_usage_periods
+
+
+@shared_task
+def renew_subscriptions():
+    """Bill every subscription whose renewal date has passed"""
+    return renew_due_subscriptions()
+
+
+@shared_task
+def fold_review_votes():
+    """Apply pending helpful votes to review helpful counts"""
+    return fold_helpful_votes()
+
+
+@shared_task
+def maintain_transaction_partitions():
+    """Create next months' transaction partitions and archive expired ones"""
+    created, archived = maintain_partitions()
+    return {'created': created, 'archived': archived}
+
+
+@shared_task
+def refresh_trending_scores():
+    """Fold new transactions and reviews into the trending scores"""
+    return refresh_trending()
+
+
+@shared_task
+def close_usage_billing():
+    """Bill last month's pay-per-use calls once late events have had time to arrive"""
+    return [f'{run.period_start:%Y-%m}' for run in close_due_usage_periods()]
+
+
+@shared_task
+def score_transactions():
+    """Score transactions created since the last run and queue anomalies for review"""
+    return score_new_transactions()
+
+
+@task_postrun.connect
+def flush_audit_log_after_task(**kwargs):
+    """Write audit entries a task left queued, like request_finished does for requests"""
+    flush_audit_log()
@@ -1,3 +1,678 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from unittest import mock
 
-# Create your tests here.
+import stripe
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from autra.cache import TwoTierCache
+from autra.routers import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, watch_primary_writes
+from users.models import User
+
+from .models import (
+    Agent,
+    AgentRatingSummary,
+    AgentTrend,
+    AgentVersion,
+    AuditEntry,
+    Payout,
+    Review,
+    ReviewFingerprint,
+    Subscription,
+    Transaction,
+    UsageBillingRun,
+)
+from .audit import flush_audit_log
+from .facets import _cache_key, normalize_filters
+from .payments import compute_payouts, send_pending_payouts
+from .review_spam import BANDS, MAX_DISTANCE, distance, fingerprint_fields, rebuild_fingerprints
+from .reviews import fold_helpful_votes, record_helpful_vote
+from .subscriptions import add_period, next_renewal, renew_due_subscriptions, start_subscription
+from .trending import refresh_trending
+from .usage import close_due_usage_periods, close_usage_period, record_usage
+
+
+def make_user(username, **fields):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pw', **fields
+    )
+
+
+def make_agent(developer, **fields):
+    fields = {
+        'name': 'Helper Bot',
+        'description': 'Answers questions',
+        'short_description': 'Answers questions',
+        'category': 'customer_service',
+        'price': 10,
+        **fields,
+    }
+    return Agent.objects.create(developer=developer, **fields)
+
+
+def make_transaction(agent, buyer, amount=10, transaction_type='purchase', **fields):
+    txn = Transaction(
+        agent=agent,
+        buyer=buyer,
+        seller_id=agent.developer_id,
+        amount=amount,
+        transaction_type=transaction_type,
+        **fields,
+    )
+    txn.calculate_fees()
+    txn.save()
+    return txn
+
+
+class AgentDeletionTests(TestCase):
+    def setUp(self):
+        self.agent = make_agent(make_user('dev', user_type='developer'))
+        for number in range(2):
+            Review.objects.create(
+                agent=self.agent,
+                reviewer=make_user(f'buyer{number}'),
+                rating=4,
+                title='Solid',
+                comment='Does what it says',
+            )
+
+    def test_delete_agent_with_reviews(self):
+        self.assertTrue(AgentRatingSummary.objects.filter(agent=self.agent).exists())
+        agent_id = self.agent.pk
+
+        self.agent.delete()
+
+        self.assertFalse(Agent.objects.filter(pk=agent_id).exists())
+        self.assertFalse(Review.objects.filter(agent_id=agent_id).exists())
+        self.assertFalse(AgentRatingSummary.objects.filter(agent_id=agent_id).exists())
+
+    def test_delete_review_keeps_summary_in_step(self):
+        Review.objects.filter(agent=self.agent).first().delete()
+
+        summary = AgentRatingSummary.objects.get(agent=self.agent)
+        self.assertEqual(summary.rating_count, 1)
+
+
+class FacetFilterTests(TestCase):
+    def test_unknown_choices_share_the_unfiltered_cache_key(self):
+        filters = normalize_filters(QueryDict('category=bogus&pricing_model=free&risk_rating=9'))
+
+        self.assertEqual(filters, {})
+        self.assertEqual(_cache_key(filters), _cache_key(normalize_filters(QueryDict())))
+
+    def test_valid_choices_are_kept(self):
+        filters = normalize_filters(QueryDict('category=sales,nope,coding&risk_rating=2'))
+
+        self.assertEqual(filters, {'category': ('coding', 'sales'), 'risk_rating': (2,)})
+
+
+class ImportCatalogTests(TestCase):
+    def run_import(self, content):
+        with NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as csv_file:
+            csv_file.write(content)
+            csv_file.flush()
+            stderr = StringIO()
+            call_command('import_catalog', csv_file.name, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_extra_cells_reject_the_row(self):
+        errors = self.run_import(
+            'name,description,short_description,category,pricing_model,price,developer,developer_email\n'
+            'Helper Bot,Answers,Answers,customer_service,one_time,10,dev,dev@example.com,surplus\n'
+        )
+        self.assertIn('line 2: more cells than header columns', errors)
+        self.assertFalse(Agent.objects.exists())
+
+    def test_existing_business_user_is_not_made_a_developer(self):
+        make_user('buyer', user_type='business')
+        errors = self.run_import(
+            'name,description,short_description,category,pricing_model,price,developer\n'
+            'Helper Bot,Answers,Answers,customer_service,one_time,10,buyer\n'
+        )
+        self.assertIn('user "buyer" is not a developer', errors)
+        self.assertFalse(Agent.objects.exists())
+
+    def test_existing_developer_is_reused(self):
+        developer = make_user('dev', user_type='developer')
+        errors = self.run_import(
+            'name,description,short_description,category,pricing_model,price,developer\n'
+            'Helper Bot,Answers,Answers,customer_service,one_time,10,dev\n'
+        )
+        self.assertEqual(errors, '')
+        self.assertEqual(Agent.objects.get().developer, developer)
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class MinVersionFilterTests(TestCase):
+    def setUp(self):
+        developer = make_user('dev', user_type='developer')
+        self.current = make_agent(developer, name='Current Bot')
+        self.dated = make_agent(developer, name='Dated Bot')
+        self.previewing = make_agent(developer, name='Preview Bot')
+        AgentVersion.objects.create(agent=self.current, version_number='2.1.0')
+        AgentVersion.objects.create(agent=self.dated, version_number='1.9.9')
+        AgentVersion.objects.create(agent=self.previewing, version_number='2.0.0-rc.1')
+
+    def listed(self, query):
+        response = self.client.get(f'/api/agents/?fields=slug&{query}')
+        self.assertEqual(response.status_code, 200)
+        return {agent['slug'] for agent in response.json()['results']}
+
+    def test_keeps_agents_with_a_stable_release_at_or_above(self):
+        self.assertEqual(self.listed('min_version=2.0'), {self.current.slug})
+
+    def test_rejects_an_unparseable_version(self):
+        response = self.client.get('/api/agents/?min_version=latest')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_version', response.json())
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.agent = make_agent(make_user('dev', user_type='developer'))
+        self.buyer = make_user('buyer')
+
+    def test_transaction_completed_after_its_creation_window_counts(self):
+        now = timezone.now()
+        txn = make_transaction(self.agent, self.buyer)
+        Transaction.objects.filter(pk=txn.pk).update(created_at=now - timedelta(hours=3))
+
+        # The creation window is folded while the purchase is still pending
+        refresh_trending(now=now - timedelta(hours=1))
+        self.assertFalse(AgentTrend.objects.filter(agent=self.agent).exists())
+
+        txn.status = 'completed'
+        txn.save(update_fields=['status'])
+        Transaction.objects.filter(pk=txn.pk).update(completed_at=now - timedelta(minutes=30))
+        refresh_trending(now=now)
+
+        self.assertTrue(AgentTrend.objects.filter(agent=self.agent).exists())
+
+    def test_pending_and_failed_transactions_do_not_count(self):
+        make_transaction(self.agent, self.buyer)
+        make_transaction(self.agent, self.buyer, status='failed')
+
+        refresh_trending(now=timezone.now() + timedelta(minutes=5))
+
+        self.assertFalse(AgentTrend.objects.filter(agent=self.agent).exists())
+
+    def test_completing_stamps_completed_at(self):
+        txn = make_transaction(self.agent, self.buyer)
+        self.assertIsNone(txn.completed_at)
+
+        txn.status = 'completed'
+        txn.save(update_fields=['status'])
+
+        txn.refresh_from_db()
+        self.assertIsNotNone(txn.completed_at)
+
+
+class PayoutTests(TestCase):
+    def setUp(self):
+        self.developer = make_user('dev', user_type='developer', stripe_account_id='acct_dev')
+        self.agent = make_agent(self.developer)
+        self.buyer = make_user('buyer')
+        self.now = timezone.now()
+        self.first = (self.now - timedelta(days=60), self.now - timedelta(days=30))
+        self.second = (self.now - timedelta(days=30), self.now)
+
+    def completed(self, period, amount=10, **fields):
+        txn = make_transaction(self.agent, self.buyer, amount=amount, status='completed', **fields)
+        Transaction.objects.filter(pk=txn.pk).update(created_at=period[0] + timedelta(days=1))
+        return txn
+
+    def payout(self, period):
+        return Payout.objects.get(seller=self.developer, period_start=period[0], period_end=period[1])
+
+    def send(self, *results):
+        with mock.patch('stripe.Transfer.create', side_effect=results) as create:
+            send_pending_payouts()
+        return create
+
+    def test_refund_transactions_are_netted_out(self):
+        self.completed(self.first)
+        self.completed(self.first, amount=20)
+        self.completed(self.first, transaction_type='refund')
+
+        compute_payouts(*self.first)
+
+        payout = self.payout(self.first)
+        self.assertEqual(payout.gross_earnings, Decimal('27.00'))
+        self.assertEqual(payout.refunds, Decimal('9.00'))
+        self.assertEqual(payout.net_amount, Decimal('18.00'))
+        self.assertEqual(payout.transaction_count, 3)
+
+    def test_rerunning_a_period_changes_nothing(self):
+        self.completed(self.first)
+        compute_payouts(*self.first)
+        compute_payouts(*self.first)
+
+        self.assertEqual(Payout.objects.count(), 1)
+        self.assertEqual(self.payout(self.first).net_amount, Decimal('9.00'))
+
+    def test_late_completion_is_settled_by_the_next_payout(self):
+        compute_payouts(*self.first)
+        self.completed(self.first)
+
+        compute_payouts(*self.second)
+
+        self.assertEqual(self.payout(self.second).net_amount, Decimal('9.00'))
+
+    def test_negative_balance_is_carried_into_the_next_payout(self):
+        self.completed(self.first, transaction_type='refund')
+        compute_payouts(*self.first)
+        create = self.send()
+
+        create.assert_not_called()
+        self.assertEqual(self.payout(self.first).status, 'carried')
+
+        self.completed(self.second, amount=20)
+        compute_payouts(*self.second)
+
+        payout = self.payout(self.second)
+        self.assertEqual(payout.carried_in, Decimal('-9.00'))
+        self.assertEqual(payout.net_amount, Decimal('9.00'))
+        self.assertEqual(self.payout(self.first).carried_to, payout)
+
+    def test_failed_transfer_is_retried_with_the_same_amount_and_key(self):
+        self.completed(self.first)
+        compute_payouts(*self.first)
+        payout = self.payout(self.first)
+
+        first = self.send(stripe.error.APIConnectionError('down'))
+        self.assertEqual(self.payout(self.first).status, 'failed')
+
+        # Earnings arriving meanwhile are left for the next payout, not added to the failed one
+        self.completed(self.first)
+        compute_payouts(*self.first)
+        second = self.send(mock.Mock(id='tr_1'))
+
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, 'paid')
+        self.assertEqual(payout.stripe_transfer_id, 'tr_1')
+        self.assertEqual(first.call_args.kwargs, second.call_args.kwargs)
+        self.assertEqual(second.call_args.kwargs['idempotency_key'], f'payout-{payout.pk}')
+        self.assertEqual(second.call_args.kwargs['amount'], 900)
+
+    def test_sale_refunded_after_payout_is_clawed_back_once(self):
+        sale = self.completed(self.first)
+        compute_payouts(*self.first)
+        self.send(mock.Mock(id='tr_1'))
+
+        sale.status = 'refunded'
+        sale.save(update_fields=['status'])
+        self.completed(self.second, amount=20)
+        compute_payouts(*self.second)
+        compute_payouts(*self.second)
+
+        payout = self.payout(self.second)
+        self.assertEqual(payout.refunds, Decimal('9.00'))
+        self.assertEqual(payout.net_amount, Decimal('9.00'))
+        sale.refresh_from_db()
+        self.assertEqual(sale.clawback_payout, payout)
+
+    def test_sale_refunded_before_its_payout_is_sent_nets_to_zero(self):
+        sale = self.completed(self.first)
+        compute_payouts(*self.first)
+        sale.status = 'refunded'
+        sale.save(update_fields=['status'])
+
+        compute_payouts(*self.first)
+
+        payout = self.payout(self.first)
+        self.assertEqual(payout.net_amount, Decimal('0.00'))
+        create = self.send()
+        create.assert_not_called()
+
+
+class SubscriptionRenewalTests(TestCase):
+    def setUp(self):
+        self.agent = make_agent(make_user('dev', user_type='developer'), pricing_model='monthly', price=20)
+        self.buyer = make_user('buyer')
+
+    def subscribe(self, started_at, billing_period='monthly'):
+        subscription = start_subscription(self.agent, self.buyer)
+        Subscription.objects.filter(pk=subscription.pk).update(
+            billing_period=billing_period,
+            started_at=started_at,
+            next_renewal_at=add_period(started_at, billing_period),
+        )
+        subscription.refresh_from_db()
+        return subscription
+
+    def renewals(self):
+        return Transaction.objects.filter(transaction_type='subscription_renewal').count()
+
+    def test_add_period_clamps_to_the_end_of_the_month(self):
+        jan_31 = datetime(2025, 1, 31, 9, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(add_period(jan_31, 'monthly'), datetime(2025, 2, 28, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_period(jan_31, 'monthly', 13), datetime(2026, 2, 28, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_period(datetime(2024, 2, 29, tzinfo=dt_timezone.utc), 'annual'),
+                         datetime(2025, 2, 28, tzinfo=dt_timezone.utc))
+
+    def test_renewals_stay_anchored_to_the_start_date(self):
+        subscription = self.subscribe(datetime(2025, 1, 31, 9, tzinfo=dt_timezone.utc))
+
+        dates = []
+        for _ in range(3):
+            subscription.next_renewal_at = next_renewal(subscription)
+            dates.append(subscription.next_renewal_at.date().isoformat())
+
+        self.assertEqual(dates, ['2025-03-31', '2025-04-30', '2025-05-31'])
+
+    def test_due_subscription_renews_once_per_period(self):
+        started = timezone.now() - timedelta(days=75)
+        subscription = self.subscribe(started)
+
+        renewed = renew_due_subscriptions(now=timezone.now())
+
+        # Two periods have passed since the start, so two renewals are due
+        self.assertEqual(renewed, 2)
+        self.assertEqual(self.renewals(), 2)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.next_renewal_at, add_period(started, 'monthly', 3))
+        self.assertGreater(subscription.next_renewal_at, timezone.now())
+
+    def test_running_renewals_twice_does_not_charge_twice(self):
+        self.subscribe(timezone.now() - timedelta(days=40))
+        now = timezone.now()
+
+        renew_due_subscriptions(now=now)
+        renew_due_subscriptions(now=now)
+
+        self.assertEqual(self.renewals(), 1)
+
+    def test_cancelled_subscriptions_are_not_renewed(self):
+        subscription = self.subscribe(timezone.now() - timedelta(days=40))
+        Subscription.objects.filter(pk=subscription.pk).update(status='cancelled')
+
+        self.assertEqual(renew_due_subscriptions(), 0)
+
+
+class UsageBillingTests(TestCase):
+    def setUp(self):
+        self.agent = make_agent(
+            make_user('dev', user_type='developer'),
+            pricing_model='usage',
+            price=0,
+            usage_price=Decimal('0.0125'),
+            free_tier_limit=100,
+        )
+        self.buyer = make_user('buyer')
+        self.january = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+    def usage_charges(self):
+        return list(
+            Transaction.objects.filter(transaction_type='usage')
+            .order_by('created_at', 'id')
+            .values_list('amount', flat=True)
+        )
+
+    def test_calls_within_the_free_tier_are_not_billed(self):
+        record_usage(self.agent.pk, self.buyer.pk, calls=100, occurred_at=self.january + timedelta(days=3))
+
+        run = close_usage_period(self.january)
+
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(self.usage_charges(), [])
+
+    def test_charge_is_rounded_to_the_penny_once(self):
+        # 101 billable calls at 1.25p each: 126.25p, billed as 126p
+        record_usage(self.agent.pk, self.buyer.pk, calls=150, occurred_at=self.january + timedelta(days=3))
+        record_usage(self.agent.pk, self.buyer.pk, calls=51, occurred_at=self.january + timedelta(days=20))
+
+        close_usage_period(self.january)
+
+        self.assertEqual(self.usage_charges(), [Decimal('1.26')])
+
+    def test_closing_a_period_again_bills_nothing_more(self):
+        record_usage(self.agent.pk, self.buyer.pk, calls=300, occurred_at=self.january + timedelta(days=3))
+
+        close_usage_period(self.january)
+        run = close_usage_period(self.january)
+
+        self.assertEqual(self.usage_charges(), [Decimal('2.50')])
+        self.assertEqual(run.transaction_count, 1)
+
+    def test_every_unclosed_month_is_closed_after_downtime(self):
+        for month in range(3):
+            occurred_at = datetime(2025, month + 1, 10, tzinfo=dt_timezone.utc)
+            record_usage(self.agent.pk, self.buyer.pk, calls=200, occurred_at=occurred_at)
+        close_usage_period(self.january)
+
+        runs = close_due_usage_periods(now=datetime(2025, 4, 2, tzinfo=dt_timezone.utc))
+
+        self.assertEqual([run.period_start.month for run in runs], [2, 3])
+        self.assertEqual(len(self.usage_charges()), 3)
+        self.assertEqual(UsageBillingRun.objects.filter(status='completed').count(), 3)
+
+
+class HelpfulVoteTests(TestCase):
+    def test_folding_votes_moves_review_updated_at(self):
+        agent = make_agent(make_user('dev', user_type='developer'))
+        review = Review.objects.create(
+            agent=agent, reviewer=make_user('buyer'), rating=5, title='Great', comment='Works well'
+        )
+        earlier = timezone.now() - timedelta(days=1)
+        Review.objects.filter(pk=review.pk).update(updated_at=earlier)
+        record_helpful_vote(review, make_user('reader'))
+
+        self.assertEqual(fold_helpful_votes(), 1)
+
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_count, 1)
+        self.assertGreater(review.updated_at, earlier)
+
+
+class AuditLogTests(TransactionTestCase):
+    def setUp(self):
+        flush_audit_log()
+        developer = make_user('dev', user_type='developer')
+        self.agents = [
+            Agent.objects.get(pk=make_agent(developer, name=f'Helper Bot {number}').pk) for number in range(3)
+        ]
+
+    def test_autocommit_saves_wait_for_the_next_flush(self):
+        for agent in self.agents:
+            agent.price = 25
+            agent.save()
+        self.assertFalse(AuditEntry.objects.exists())
+
+        self.assertEqual(flush_audit_log(), 3)
+        self.assertEqual(
+            [entry.changes for entry in AuditEntry.objects.order_by('id')],
+            [{'price': ['10.00', '25']}] * 3,
+        )
+
+    def test_commit_writes_its_entries(self):
+        with transaction.atomic():
+            for agent in self.agents:
+                agent.is_verified = True
+                agent.save()
+        self.assertEqual(AuditEntry.objects.count(), 3)
+
+
+TEMPLATE_REVIEW = (
+    'This agent saved our support team hours every single week and the setup '
+    'took only minutes, highly recommended for any growing business'
+)
+UNRELATED_REVIEW = (
+    'Latency spikes during peak traffic made the integration unreliable, and '
+    'the documentation skips several required authentication steps'
+)
+
+
+@override_settings(REVIEW_DUPLICATE_CLUSTER_SIZE=3)
+class ReviewSpamTests(TestCase):
+    def setUp(self):
+        self.agent = make_agent(make_user('dev', user_type='developer'))
+        self.reviews = [self.write_review(f'buyer{number}', TEMPLATE_REVIEW) for number in range(3)]
+
+    def write_review(self, username, comment):
+        return Review.objects.create(
+            agent=self.agent, reviewer=make_user(username), rating=5, title='Great', comment=comment
+        )
+
+    def flags(self):
+        return {
+            fingerprint.pk: (fingerprint.cluster, fingerprint.duplicate)
+            for fingerprint in ReviewFingerprint.objects.all()
+        }
+
+    def test_templated_reviews_share_a_band(self):
+        swapped = fingerprint_fields('Great', TEMPLATE_REVIEW.replace('hours', 'days'))
+        original = fingerprint_fields('Great', TEMPLATE_REVIEW)
+        self.assertLessEqual(distance(swapped['simhash'], original['simhash']), MAX_DISTANCE)
+        self.assertTrue(any(swapped[f'band_{band}'] == original[f'band_{band}'] for band in range(BANDS)))
+
+        review = self.write_review('templater', TEMPLATE_REVIEW.replace('hours', 'days'))
+
+        fingerprint = ReviewFingerprint.objects.get(pk=review.pk)
+        self.assertEqual(fingerprint.cluster, self.reviews[0].pk)
+        self.assertTrue(fingerprint.duplicate)
+
+    def test_near_duplicates_are_flagged(self):
+        root = self.reviews[0].pk
+        self.assertEqual(self.flags(), {review.pk: (root, True) for review in self.reviews})
+
+    def test_editing_out_of_a_cluster_clears_the_rest(self):
+        edited = self.reviews[0]
+        edited.comment = UNRELATED_REVIEW
+        edited.save()
+
+        remaining = self.reviews[1].pk
+        self.assertEqual(self.flags(), {
+            edited.pk: (None, False),
+            remaining: (remaining, False),
+            self.reviews[2].pk: (remaining, False),
+        })
+
+    def test_rebuild_matches_inline_checks(self):
+        self.write_review('outsider', UNRELATED_REVIEW)
+        expected = self.flags()
+        ReviewFingerprint.objects.all().delete()
+
+        self.assertEqual(rebuild_fingerprints(), (4, 3, 0))
+        self.assertEqual(self.flags(), expected)
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        # Two caches over the same shared tier stand in for two processes
+        self.first, self.second = (
+            TwoTierCache('', {'OPTIONS': {'SHARED_ALIAS': 'shared', 'JITTER': 0}}) for _ in range(2)
+        )
+        self.first.shared.clear()
+        self.addCleanup(self.first.shared.clear)
+
+    def later(self, seconds):
+        now = time.monotonic() + seconds
+        return mock.patch('autra.cache.time.monotonic', return_value=now)
+
+    def test_other_processes_see_a_deleted_key_after_version_ttl(self):
+        self.first.set('greeting', 'hello')
+        self.assertEqual(self.second.get('greeting'), 'hello')
+        self.first.delete('greeting')
+
+        with self.later(self.second.version_ttl + 0.1):
+            self.assertIsNone(self.second.get('greeting'))
+
+    def test_namespace_bump_reaches_other_processes(self):
+        self.assertEqual(self.second.get_or_compute('page', lambda: 'old', namespace='catalog'), 'old')
+        self.first.bump_namespace('catalog')
+
+        with self.later(self.second.version_ttl + 0.1):
+            self.assertEqual(self.second.get_or_compute('page', lambda: 'new', namespace='catalog'), 'new')
+
+    def test_namespaced_keys_stay_local_for_local_timeout(self):
+        self.second.get_or_compute('page', lambda: 'cached', namespace='catalog')
+        self.first.shared.delete(self.first.make_key(self.first.namespaced_key('catalog', 'page')))
+
+        with self.later(self.second.local_timeout - 1):
+            self.assertEqual(self.second.get_or_compute('page', lambda: 'recomputed', namespace='catalog'), 'cached')
+
+    def test_concurrent_async_misses_compute_once(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def race():
+            return await asyncio.gather(*(self.first.aget_or_compute('slow', compute) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(race()), ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_miss_waits_for_a_lock_held_elsewhere(self):
+        self.first.shared.add('lock:slow', 1, 10)
+
+        async def compute():
+            return 'mine'
+
+        async def race():
+            waiting = asyncio.create_task(self.first.aget_or_compute('slow', compute))
+            await asyncio.sleep(0.1)
+            self.second.set('slow', {'value': 'theirs', 'delta': 0, 'expires_at': time.time() + 60})
+            return await waiting
+
+        self.assertEqual(asyncio.run(race()), 'theirs')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'], REPLICA_ROUTED_MODELS=['marketplace.Agent'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        # The test connection may predate the router module's signal receiver
+        watch_primary_writes(sender=None, connection=connection)
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, view, method='get'):
+        request = getattr(self.factory, method)('/agents/')
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_request_reads_from_a_single_replica(self):
+        chosen = []
+
+        def view(request):
+            chosen.extend(self.router.db_for_read(Agent) for _ in range(20))
+            return HttpResponse()
+
+        self.run_request(view)
+        self.assertEqual(len(set(chosen)), 1)
+        self.assertIn(chosen[0], ['replica_a', 'replica_b'])
+
+    def test_asking_for_write_database_does_not_pin(self):
+        def view(request):
+            self.router.db_for_write(Agent)
+            Agent.objects.using('default').exists()
+            return HttpResponse()
+
+        response = self.run_request(view)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_later_reads_to_primary(self):
+        reads = []
+
+        def view(request):
+            make_user('writer')
+            reads.append(self.router.db_for_read(Agent))
+            return HttpResponse()
+
+        response = self.run_request(view)
+        self.assertEqual(reads, ['default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_post_without_write_sets_no_cookie(self):
+        response = self.run_request(lambda request: HttpResponse(), method='post')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,190 @@
+"""
+Trending agents: an exponentially time-decayed activity score per agent.
+
+Every completed purchase, subscription and usage charge, and every review,
+adds a weight (TRENDING_WEIGHTS) to its agent's score, and that weight
+halves every TRENDING_HALF_LIFE_HOURS. Instead of decaying every score on
+each refresh, weights are scaled forward to a fixed epoch: an event at
+time t adds w * e^((t - TRENDING_EPOCH) / tau). All scores then decay at the same rate,
+so their order only changes when new events arrive, and the score at any
+moment is the stored value times e^(-(now - TRENDING_EPOCH) / tau). The
+forward-scaled sums grow without bound, so AgentTrend keeps their natural
+log and new weights are added with logaddexp().
+
+refresh_trending() folds in only the events since the previous run, summed
+per agent and hour by GROUP BY queries; history is never rescanned.
+Transactions are created pending and can complete much later, so they are
+placed by completed_at (transaction_completed_idx) and count once they
+complete; reviews are placed by created_at. rebuild_trending() starts over
+from a window of recent events, e.g. after changing the weights or the
+half-life.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from autra.cache import bump_namespace
+
+from .models import Agent, AgentTrend, Review, Transaction, TrendingCheckpoint
+from .utils import TRENDING_CACHE_NAMESPACE, batched
+
+# Scores are relative to this moment; changing it needs a rebuild
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# Rows can commit a little after their created_at, so stay this far behind now
+SETTLE_DELAY = timedelta(minutes=1)
+# Catching up after downtime aggregates at most this much time per query
+MAX_WINDOW = timedelta(days=1)
+# Scores that decayed this far below TRENDING_MIN_SCORE are deleted
+PRUNE_FACTOR = 1000
+
+
+def decay_seconds():
+    """tau: event weights shrink by a factor of e every tau seconds"""
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def log_offset(moment):
+    """Subtract from a log_score to get the log of the score at that moment"""
+    return (moment - TRENDING_EPOCH).total_seconds() / decay_seconds()
+
+
+def logaddexp(a, b):
+    """log(e^a + e^b) without overflow; a may be None for an empty sum"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def window_weights(start, end):
+    """{agent_id: {hour: summed weight}} for transactions completed and reviews created in [start, end)"""
+    weights = settings.TRENDING_WEIGHTS
+    buckets = defaultdict(lambda: defaultdict(float))
+
+    transactions = (
+        Transaction.objects.filter(
+            status='completed',
+            completed_at__gte=start,
+            completed_at__lt=end,
+            transaction_type__in=[kind for kind, weight in weights.items() if weight],
+        )
+        .annotate(hour=TruncHour('completed_at'))
+        .order_by()
+        .values('agent_id', 'hour', 'transaction_type')
+        .annotate(events=Count('id'))
+    )
+    for row in transactions:
+        buckets[row['agent_id']][row['hour']] += row['events'] * weights[row['transaction_type']]
+
+    # Reviews count in proportion to their rating
+    if weights.get('review'):
+        reviews = (
+            Review.objects.filter(created_at__gte=start, created_at__lt=end, reported=False)
+            .annotate(hour=TruncHour('created_at'))
+            .order_by()
+            .values('agent_id', 'hour', 'rating')
+            .annotate(events=Count('id'))
+        )
+        for row in reviews:
+            buckets[row['agent_id']][row['hour']] += row['events'] * weights['review'] * row['rating'] / 5
+    return buckets
+
+
+def window_contributions(start, end):
+    """{agent_id: (log of the forward-scaled weight, latest event time)} for [start, end)"""
+    tau = decay_seconds()
+    contributions = {}
+    for agent_id, hours in window_weights(start, end).items():
+        log_total = latest = None
+        for hour, weight in hours.items():
+            # Date the hour's events at the middle of its overlap with the window
+            first = max(hour, start)
+            moment = first + (min(hour + timedelta(hours=1), end) - first) / 2
+            log_total = logaddexp(log_total, math.log(weight) + (moment - TRENDING_EPOCH).total_seconds() / tau)
+            latest = max(latest or moment, moment)
+        contributions[agent_id] = (log_total, latest)
+    return contributions
+
+
+def fold_window(start, end, batch_size=1000):
+    """Add the events in [start, end) to the stored scores; returns the agent ids"""
+    contributions = window_contributions(start, end)
+    updated = []
+    for agent_ids in batched(sorted(contributions), batch_size):
+        current = dict(
+            AgentTrend.objects.filter(agent_id__in=agent_ids).values_list('agent_id', 'log_score')
+        )
+        # Agents deleted since their events were written have nothing to score
+        live = Agent.objects.filter(pk__in=agent_ids).values_list('pk', flat=True)
+        trends = [
+            AgentTrend(
+                agent_id=agent_id,
+                log_score=logaddexp(current.get(agent_id), contributions[agent_id][0]),
+                last_event_at=contributions[agent_id][1],
+            )
+            for agent_id in live
+        ]
+        AgentTrend.objects.bulk_create(
+            trends,
+            update_conflicts=True,
+            unique_fields=['agent'],
+            update_fields=['log_score', 'last_event_at', 'updated_at'],
+        )
+        updated.extend(trend.agent_id for trend in trends)
+    return updated
+
+
+def _catch_up(checkpoint, until):
+    updated = set()
+    start = checkpoint.processed_until
+    while start < until:
+        end = min(start + MAX_WINDOW, until)
+        updated.update(fold_window(start, end))
+        start = end
+    if until > checkpoint.processed_until:
+        checkpoint.processed_until = until
+        checkpoint.save()
+
+    floor = log_offset(until) + math.log(settings.TRENDING_MIN_SCORE / PRUNE_FACTOR)
+    pruned, _ = AgentTrend.objects.filter(log_score__lt=floor).delete()
+    if updated or pruned:
+        transaction.on_commit(lambda: bump_namespace(TRENDING_CACHE_NAMESPACE))
+    return len(updated)
+
+
+def _locked_checkpoint(default):
+    TrendingCheckpoint.objects.get_or_create(pk=1, defaults={'processed_until': default})
+    return TrendingCheckpoint.objects.select_for_update().get(pk=1)
+
+
+def refresh_trending(now=None):
+    """
+    Fold transactions and reviews created since the last refresh into the scores.
+
+    The checkpoint row is locked for the whole run, so overlapping refreshes
+    queue up instead of counting a window twice. The first run starts
+    TRENDING_LOOKBACK_DAYS back. Returns the number of agents updated.
+    """
+    until = (now or timezone.now()) - SETTLE_DELAY
+    with transaction.atomic():
+        checkpoint = _locked_checkpoint(until - timedelta(days=settings.TRENDING_LOOKBACK_DAYS))
+        return _catch_up(checkpoint, until)
+
+
+def rebuild_trending(days=None, now=None):
+    """Recompute every score from the last `days` days (TRENDING_LOOKBACK_DAYS) of events"""
+    until = (now or timezone.now()) - SETTLE_DELAY
+    start = until - timedelta(days=days or settings.TRENDING_LOOKBACK_DAYS)
+    with transaction.atomic():
+        checkpoint = _locked_checkpoint(start)
+        AgentTrend.objects.all().delete()
+        transaction.on_commit(lambda: bump_namespace(TRENDING_CACHE_NAMESPACE))
+        checkpoint.processed_until = start
+        return _catch_up(checkpoint, until)
@@ -0,0 +1,176 @@
+"""
+Usage-based billing for pay-per-use agents.
+
+Calls are recorded as UsageEvent rows. Closing a month bills every
+(buyer, agent) pair that went over the agent's free tier:
+
+    charge = (calls - free_tier_limit) * usage_price, rounded to the penny
+
+The summing and free-tier netting happen in one GROUP BY query (with a
+HAVING clause that drops pairs inside the free tier), streamed in
+(buyer, agent) order, so Python only prices the billable pairs. Prices are
+Decimals throughout, so charges are exact before the single rounding step.
+Each batch of transactions commits together with the run's resume point,
+so every pair is billed exactly once even if a close is interrupted and
+rerun.
+
+A month is priced with the agent's usage_price and free_tier_limit when
+it closes, not at the time of each call: a price change applies to the
+whole open month. That is intended (and documented in the README): events
+stay a bare counter with no price lookup when calls are recorded.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Transaction, UsageBillingRun, UsageEvent
+from .subscriptions import add_period
+from .utils import batched
+
+CENT = Decimal('0.01')
+
+
+def record_usage(agent_id, buyer_id, calls=1, occurred_at=None):
+    """Record metered calls; they are billed when their month closes"""
+    return UsageEvent.objects.create(
+        agent_id=agent_id,
+        buyer_id=buyer_id,
+        calls=calls,
+        occurred_at=occurred_at or timezone.now(),
+    )
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def billable_usage(period_start, period_end, after=None):
+    """
+    Billable calls per (buyer, agent) for usage in the period.
+
+    Rows come in (buyer_id, agent_id) order, starting after the pair
+    `after` if given, and only for pairs above the agent's free tier.
+    """
+    queryset = UsageEvent.objects.filter(
+        occurred_at__gte=period_start,
+        occurred_at__lt=period_end,
+        agent__pricing_model='usage',
+        agent__usage_price__gt=0,
+    )
+    if after:
+        buyer_id, agent_id = after
+        queryset = queryset.filter(Q(buyer_id__gt=buyer_id) | Q(buyer_id=buyer_id, agent_id__gt=agent_id))
+    return (
+        queryset.values(
+            'buyer_id',
+            'agent_id',
+            'agent__developer_id',
+            'agent__usage_price',
+            'agent__free_tier_limit',
+        )
+        .annotate(calls=Sum('calls'))
+        .annotate(billable=F('calls') - F('agent__free_tier_limit'))
+        .filter(billable__gt=0)
+        .order_by('buyer_id', 'agent_id')
+    )
+
+
+def usage_charge(billable_calls, usage_price):
+    """Exact charge for the calls, rounded to the penny like the platform fee"""
+    return (Decimal(billable_calls) * usage_price).quantize(CENT)
+
+
+def usage_transactions(rows):
+    transactions = []
+    for row in rows:
+        amount = usage_charge(row['billable'], row['agent__usage_price'])
+        if not amount:
+            continue
+        txn = Transaction(
+            agent_id=row['agent_id'],
+            buyer_id=row['buyer_id'],
+            seller_id=row['agent__developer_id'],
+            amount=amount,
+            transaction_type='usage',
+        )
+        txn.calculate_fees()
+        transactions.append(txn)
+    return transactions
+
+
+def close_usage_period(period_start, batch_size=None):
+    """
+    Bill one month of usage; period_start is the first moment of the month.
+
+    Creates one 'usage' transaction per (buyer, agent) pair over its free
+    tier, in batches. Each batch is checked against the run row's resume
+    point under a lock: if another worker has moved it, this one stops and
+    leaves the period to it. Returns the UsageBillingRun.
+    """
+    batch_size = batch_size or settings.USAGE_BILLING_BATCH_SIZE
+    period_start = month_start(period_start)
+    period_end = add_period(period_start, 'monthly')
+    run, _ = UsageBillingRun.objects.get_or_create(
+        period_start=period_start,
+        defaults={'period_end': period_end},
+    )
+    if run.status == 'completed':
+        return run
+
+    position = (run.last_buyer_id, run.last_agent_id)
+    rows = billable_usage(period_start, period_end, after=position if run.last_buyer_id else None)
+    for batch in batched(rows.iterator(chunk_size=batch_size), batch_size):
+        transactions = usage_transactions(batch)
+        with transaction.atomic():
+            run = UsageBillingRun.objects.select_for_update().get(pk=run.pk)
+            if run.status == 'completed' or (run.last_buyer_id, run.last_agent_id) != position:
+                return run
+            Transaction.objects.bulk_create(transactions)
+            position = (batch[-1]['buyer_id'], batch[-1]['agent_id'])
+            run.last_buyer_id, run.last_agent_id = position
+            run.transaction_count += len(transactions)
+            run.amount_billed += sum(txn.amount for txn in transactions)
+            run.save()
+
+    with transaction.atomic():
+        run = UsageBillingRun.objects.select_for_update().get(pk=run.pk)
+        if run.status != 'completed' and (run.last_buyer_id, run.last_agent_id) == position:
+            run.status = 'completed'
+            run.completed_at = timezone.now()
+            run.save()
+    return run
+
+
+def close_due_usage_periods(now=None):
+    """
+    Close every month whose grace period for late events has passed and
+    that isn't closed yet, oldest first, and finish any close that was
+    interrupted. After downtime this catches up from the last closed
+    month (or the first recorded event). Returns the runs completed.
+    """
+    now = now or timezone.now()
+    due = month_start(now - timedelta(hours=settings.USAGE_BILLING_GRACE_HOURS))
+    periods = set(
+        UsageBillingRun.objects.filter(status='running').values_list('period_start', flat=True)
+    )
+    last_closed = (
+        UsageBillingRun.objects.filter(status='completed')
+        .order_by('-period_start')
+        .values_list('period_start', flat=True)
+        .first()
+    )
+    if last_closed is not None:
+        period = add_period(last_closed, 'monthly')
+    else:
+        first_event = UsageEvent.objects.aggregate(first=Min('occurred_at'))['first']
+        period = month_start(first_event) if first_event else due
+    while period < due:
+        periods.add(period)
+        period = add_period(period, 'monthly')
+    runs = [close_usage_period(period) for period in sorted(periods)]
+    return [run for run in runs if run.status == 'completed']
@@ -0,0 +1,123 @@
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from autra.cache import bump_namespace, shared_cache
+
+# Cache namespaces (see autra/cache.py); bumping one invalidates all its keys
+CATALOG_CACHE_NAMESPACE = 'catalog'
+RANKINGS_CACHE_NAMESPACE = 'rankings'
+FACETS_CACHE_NAMESPACE = 'facets'
+TRENDING_CACHE_NAMESPACE = 'trending'
+
+
+def batched(iterable, size):
+    """Yield lists of at most `size` items without materialising the input"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def allocate_unique_slugs(names, model=None, max_length=255):
+    """
+    Return one unique slug per name using at most two queries.
+
+    Names that slugify to the same base (inside the batch or against existing
+    rows) get a numeric suffix: "my-agent", "my-agent-2", "my-agent-3", ...
+    """
+    if model is None:
+        from .models import Agent
+        model = Agent
+
+    bases = [slugify(name)[:max_length - 8] or 'agent' for name in names]
+    wanted = defaultdict(int)
+    for base in bases:
+        wanted[base] += 1
+
+    # One query for exact matches, one for the suffixed variants of clashes
+    taken = set(
+        model.objects.filter(slug__in=list(wanted)).values_list('slug', flat=True)
+    )
+    clashing = [base for base, count in wanted.items() if base in taken or count > 1]
+    if clashing:
+        prefix_filter = Q()
+        for base in clashing:
+            prefix_filter |= Q(slug__startswith=f'{base}-')
+        taken.update(model.objects.filter(prefix_filter).values_list('slug', flat=True))
+
+    next_suffix = defaultdict(lambda: 2)
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken:
+            slug = f'{base}-{next_suffix[base]}'
+            next_suffix[base] += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def category_stamp(category=None):
+    """
+    Cheap change stamp for the catalog listing of one category (or all).
+
+    The stamp is a nanosecond timestamp kept in the cache; it only moves
+    when an agent in that category changes, so listings can be validated
+    without touching the database. It lives in the shared tier only: a
+    per-process copy would keep validating old listings after a change.
+    """
+    cache = shared_cache()
+    key = f'catalog-stamp:{category or "all"}'
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = time.time_ns()
+        if not cache.add(key, stamp, None):
+            stamp = cache.get(key, stamp)
+    return stamp
+
+
+async def acategory_stamp(category=None):
+    """Async category_stamp(), for views running on the event loop"""
+    cache = shared_cache()
+    key = f'catalog-stamp:{category or "all"}'
+    stamp = await cache.aget(key)
+    if stamp is None:
+        stamp = time.time_ns()
+        if not await cache.aadd(key, stamp, None):
+            stamp = await cache.aget(key, stamp)
+    return stamp
+
+
+def touch_categories(*categories):
+    """Move the change stamp of the given categories and of the whole catalog"""
+    stamp = time.time_ns()
+    shared_cache().set_many(
+        {f'catalog-stamp:{category or "all"}': stamp for category in {*categories, None}},
+        None
+    )
+
+
+def invalidate_agents(*categories):
+    """
+    Once the transaction commits, invalidate everything rendered from agent
+    rows: listings, facet counts, rankings, trending lists and the change
+    stamps of the given categories. For saves and for QuerySet.update()s alike.
+    """
+    def bump():
+        for namespace in (
+            CATALOG_CACHE_NAMESPACE,
+            FACETS_CACHE_NAMESPACE,
+            RANKINGS_CACHE_NAMESPACE,
+            TRENDING_CACHE_NAMESPACE,
+        ):
+            bump_namespace(namespace)
+        touch_categories(*categories)
+    transaction.on_commit(bump)
@@ -0,0 +1,105 @@
+"""
+Semantic version keys for AgentVersion.
+
+version_number is free-form, so each version also stores sort_key: major,
+minor and patch zero-padded to ten digits each, then 1 for a release or 0
+for a pre-release ("2.10.0" -> "0000000002" "0000000010" "0000000000" "1").
+Comparing keys as strings compares versions, so ordering and range filters
+such as sort_key__gte=version_key('2.0')[0] run in SQL on an index. Keys are
+all digits, so every database collation orders them the same way.
+
+Pre-releases sort below their release ("2.0.0-rc.1" < "2.0.0") but are not
+ordered among themselves, and build metadata is ignored, as in semver.
+Numbers that don't parse get no key and are never picked as the latest.
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from .utils import batched
+
+VERSION_RE = re.compile(
+    r'^[vV]?(\d{1,10})(?:\.(\d{1,10}))?(?:\.(\d{1,10}))?'
+    r'(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$'
+)
+
+
+def parse_version(number):
+    """(major, minor, patch, prerelease) for a version number, or None if it isn't semver-like"""
+    match = VERSION_RE.match(number.strip())
+    if match is None:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return int(major), int(minor or 0), int(patch or 0), prerelease or ''
+
+
+def version_key(number):
+    """(sort_key, is_prerelease) for a version number; sort_key is None if it doesn't parse"""
+    parsed = parse_version(number)
+    if parsed is None:
+        return None, False
+    major, minor, patch, prerelease = parsed
+    return f'{major:010d}{minor:010d}{patch:010d}{0 if prerelease else 1}', bool(prerelease)
+
+
+def with_version_at_least(queryset, number, stable_only=False):
+    """Filter an Agent queryset to agents with a version >= number (e.g. "2.0")"""
+    from .models import AgentVersion
+
+    key, _ = version_key(number)
+    if key is None:
+        raise ValueError(f'Not a version number: {number}')
+    versions = AgentVersion.objects.filter(agent=OuterRef('pk'), sort_key__gte=key)
+    if stable_only:
+        versions = versions.filter(is_stable=True, is_prerelease=False)
+    return queryset.filter(Exists(versions))
+
+
+def latest_stable_version():
+    """Subquery for the id of an agent's highest stable, non-pre-release version"""
+    from .models import AgentVersion
+
+    return Subquery(
+        AgentVersion.objects.filter(
+            agent=OuterRef('pk'),
+            is_stable=True,
+            is_prerelease=False,
+            sort_key__isnull=False,
+        ).order_by('-sort_key', '-release_date').values('pk')[:1]
+    )
+
+
+def update_latest_version(agent_id):
+    """
+    Re-point an agent at its latest stable version after a version write.
+
+    Runs in the caller's transaction. The agent row is locked first, so
+    concurrent version writes for the same agent re-point one at a time,
+    each seeing the versions the previous one committed.
+    """
+    from .models import Agent
+
+    with transaction.atomic():
+        if not list(Agent.objects.select_for_update().filter(pk=agent_id).values_list('pk')):
+            return
+        Agent.objects.filter(pk=agent_id).update(latest_stable_version=latest_stable_version())
+
+
+def refresh_latest_versions(agent_ids=None, batch_size=1000):
+    """
+    Recompute latest-version pointers with one UPDATE per batch of agents.
+
+    For bulk inserts, which skip the signals, and for backfills. Returns
+    the number of agents updated.
+    """
+    from .models import Agent
+
+    if agent_ids is None:
+        agent_ids = Agent.objects.order_by('pk').values_list('pk', flat=True).iterator()
+    updated = 0
+    for batch in batched(agent_ids, batch_size):
+        with transaction.atomic():
+            updated += Agent.objects.filter(pk__in=batch).update(latest_stable_version=latest_stable_version())
+    return updated
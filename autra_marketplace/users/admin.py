@@ -3,10 +3,12 @@ from django.contrib import admin
 # Register your models here.
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
+
+from autra.audit import AuditActorAdminMixin
 from .models import User, DeveloperProfile, BusinessProfile
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(AuditActorAdminMixin, UserAdmin):
     list_display = [
         'username', 
         'email', 
@@ -5,9 +5,23 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
 
-class User(AbstractUser):
+from autra.audit import AuditedModel
+
+class User(AuditedModel, AbstractUser):
     """Custom user model for both developers and businesses"""
     
+    # Verification and permission changes are kept in the audit log
+    AUDIT_FIELDS = (
+        'user_type',
+        'verified',
+        'is_active',
+        'is_staff',
+        'is_superuser',
+    )
+    
+    # Agent listings show the developer's display name, built from these
+    DISPLAY_NAME_FIELDS = ('company_name', 'first_name', 'last_name', 'username')
+    
     # User Type
     USER_TYPE_CHOICES = (
         ('developer', 'Developer'),
@@ -146,6 +160,19 @@ class User(AbstractUser):
     def is_business(self):
         return self.user_type == 'business'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded display name so renames can invalidate the developer's agents"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_display_name = instance.loaded_display_name()
+        return instance
+    
+    def loaded_display_name(self):
+        """display_name, or None if any field it is built from is deferred"""
+        if all(name in self.__dict__ for name in self.DISPLAY_NAME_FIELDS):
+            return self.display_name
+        return None
+    
     @property
     def display_name(self):
         """Returns the best name to display for this user"""